@@ -11,16 +11,27 @@ from livekit.plugins import (
     silero,
 )
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
+from agent.phrases import ESCALATION, STATUS_UPDATE, greeting, phrase_cache, say_phrase
 from agent.tools import search_knowledge_base
-from core_service.api.services.customer import create_customer_for_session
+from core_service.api.services.customer import caller_phone_from_attributes, customer_id_for_session
+from core_service.api.services.kb_snapshot import kb_snapshot
+from core_service.api.services.locations import get_location_profile, location_id_from_metadata
+from core_service.api.services.reranker import reranker
+from core_service.observability.metrics import start_metrics_server
+from core_service.observability.profiling import install_signal_handlers
 
 import logging
 logger = logging.getLogger("agent")
 
+TTS_MODEL = "sonic-2"
+TTS_VOICE = "f786b574-daa5-4673-aa0c-cbe3e8534c02"
+# Cached phrase audio is only valid for the voice that spoke it
+TTS_VOICE_KEY = f"cartesia:{TTS_MODEL}:{TTS_VOICE}"
+
 class Assistant(Agent):
-    def __init__(self) -> None:
-        super().__init__(instructions="""
-                        You are a helpful voice AI assistant for a Salon. Your Salon's name is Beauty Palace. You are located in New York City. You will be asked questions by customers. 
+    def __init__(self, location: dict) -> None:
+        super().__init__(instructions=f"""
+                        You are a helpful voice AI assistant for a Salon. Your Salon's name is {location["name"]}. You are located in {location["city"] or "the city"}. You will be asked questions by customers. 
                          
                          You have access to a search_knowledge_base tool to find answers to customer questions. When you use this tool:
                          - If the tool returns information, use it to formulate a natural, conversational response
@@ -34,30 +45,49 @@ class Assistant(Agent):
                          )
 
 
+def prewarm(proc: agents.JobProcess):
+    # Load the KB reranker before the first call so its latency budget is not spent loading the model
+    reranker.warm_up()
+    # Map the shared KB snapshot (if published) so the first search does not wait for it
+    kb_snapshot.current()
+    # kill -USR1 <pid> dumps tasks and stacks, kill -USR2 <pid> takes a CPU profile (PROFILE_DUMP_DIR)
+    install_signal_handlers()
+    # Fixed phrases synthesized by earlier workers play without a TTS round trip
+    phrase_cache.load(TTS_VOICE_KEY, (STATUS_UPDATE, ESCALATION))
+
+
 async def entrypoint(ctx: agents.JobContext):
     await ctx.connect()
+
+    # The room is created for one location's number; its profile is cached per worker process
+    location = get_location_profile(location_id_from_metadata(ctx.room.metadata))
     
-    # Create a customer record for this session
-    customer = create_customer_for_session(
-        display_name="Voice Chat Customer"  # Default display name
-        # In production, you might extract phone number from SIP trunk or other metadata
+    # Repeat callers (identified by their SIP caller number) keep one customer record per location
+    participant = await ctx.wait_for_participant()
+    customer_id = customer_id_for_session(
+        display_name="Voice Chat Customer",  # Default display name
+        phone_e164=caller_phone_from_attributes(participant.attributes),
+        location_id=location["id"],
     )
     
     
     session = AgentSession(
         stt=deepgram.STT(model="nova-3", language="multi"),
         llm=openai.LLM(model="gpt-4o-mini"),
-        tts=cartesia.TTS(model="sonic-2", voice="f786b574-daa5-4673-aa0c-cbe3e8534c02"),
+        tts=cartesia.TTS(model=TTS_MODEL, voice=TTS_VOICE),
         vad=silero.VAD.load(),
         turn_detection=MultilingualModel(),
     )
     
-    # Store customer_id on the session for tool access
-    setattr(session, "_app_ctx", {"customer_id": customer.id})
+    # Store customer_id and location (and the room name for trace correlation) on the session for tool access
+    setattr(session, "_app_ctx", {"customer_id": customer_id, "location_id": location["id"], "room_name": ctx.room.name,
+                                  "tts_voice_key": TTS_VOICE_KEY})
+    phrases = (greeting(location), STATUS_UPDATE, ESCALATION)
+    phrase_cache.load(TTS_VOICE_KEY, phrases)
 
     await session.start(
         room=ctx.room,
-        agent=Assistant(),
+        agent=Assistant(location),
         room_input_options=RoomInputOptions(
             # LiveKit Cloud enhanced noise cancellation
             # - If self-hosting, omit this parameter
@@ -66,10 +96,14 @@ async def entrypoint(ctx: agents.JobContext):
         ),
     )
 
-    await session.generate_reply(
-        instructions="Greet the user and offer your assistance."
-    )
+    # Synthesize (and save) the phrases no worker has cached yet, without delaying the greeting
+    phrase_cache.synthesize_missing(session.tts, TTS_VOICE_KEY, phrases)
+
+    await say_phrase(session, phrases[0], add_to_chat_ctx=True)
 
 
 if __name__ == "__main__":
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
+    # Serve kb_search_* metrics when AGENT_METRICS_PORT is set
+    start_metrics_server()
+    install_signal_handlers()
+    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
@@ -0,0 +1,146 @@
+"""
+Phrase audio cache - fixed agent utterances synthesized once per voice, not once per call
+
+The status update, the escalation message and each location's greeting are
+always the same text, so their TTS audio is cached as WAV files under
+AGENT_PHRASE_CACHE_DIR (one file per voice and text). Worker processes load the
+files at prewarm; whatever is missing is synthesized in the background during
+the first call that needs it and saved for every later process. Cached phrases
+are played directly, without a TTS round trip; uncached ones fall back to
+normal synthesis.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import wave
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from livekit import rtc
+
+logger = logging.getLogger("agent.phrases")
+
+AGENT_PHRASE_CACHE_DIR = os.getenv(
+    "AGENT_PHRASE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "salon-agent-phrases")
+)
+FRAME_MS = 20
+
+STATUS_UPDATE = "Let me check that for you… one moment."
+ESCALATION = "Let me check with my supervisor and get back to you."
+
+
+def greeting(location: dict) -> str:
+    """Fixed greeting for a location"""
+    return f"Hi, thanks for calling {location['name']}! How can I help you today?"
+
+
+class PhraseCache:
+    """Decoded PCM of fixed phrases, keyed by (voice key, text), backed by WAV files"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        # (voice key, text) -> (pcm bytes, sample rate, channels)
+        self._audio: Dict[Tuple[str, str], Tuple[bytes, int, int]] = {}
+        self._synthesizing: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    def _path(self, voice_key: str, text: str) -> str:
+        digest = hashlib.sha1(f"{voice_key}\n{text}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.wav")
+
+    def load(self, voice_key: str, texts: Iterable[str]) -> int:
+        """Load the phrases already on disk; returns how many were loaded"""
+        loaded = 0
+        for text in texts:
+            path = self._path(voice_key, text)
+            if (voice_key, text) in self._audio or not os.path.exists(path):
+                continue
+            try:
+                with wave.open(path, "rb") as wav:
+                    self._audio[(voice_key, text)] = (
+                        wav.readframes(wav.getnframes()), wav.getframerate(), wav.getnchannels()
+                    )
+                loaded += 1
+            except (OSError, EOFError, wave.Error) as e:
+                logger.warning(f"Ignoring unreadable phrase audio {path}: {e}")
+        return loaded
+
+    def _save(self, voice_key: str, text: str, pcm: bytes, sample_rate: int, num_channels: int) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(voice_key, text)
+        # Write then rename, so concurrent worker processes never read a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with wave.open(tmp_path, "wb") as wav:
+            wav.setnchannels(num_channels)
+            wav.setsampwidth(2)  # 16-bit PCM, as produced by LiveKit TTS plugins
+            wav.setframerate(sample_rate)
+            wav.writeframes(pcm)
+        os.replace(tmp_path, path)
+
+    async def _synthesize(self, tts, voice_key: str, text: str) -> None:
+        frames: List[rtc.AudioFrame] = []
+        stream = tts.synthesize(text)
+        try:
+            async for event in stream:
+                frames.append(event.frame)
+        finally:
+            await stream.aclose()
+        if not frames:
+            return
+        pcm = b"".join(bytes(frame.data) for frame in frames)
+        audio = (pcm, frames[0].sample_rate, frames[0].num_channels)
+        self._audio[(voice_key, text)] = audio
+        try:
+            await asyncio.to_thread(self._save, voice_key, text, *audio)
+        except OSError as e:
+            logger.warning(f"Could not save phrase audio for {text!r}: {e}")
+
+    def synthesize_missing(self, tts, voice_key: str, texts: Iterable[str]) -> None:
+        """Synthesize uncached phrases in the background (call from within a job)"""
+        for text in texts:
+            key = (voice_key, text)
+            if key in self._audio or key in self._synthesizing:
+                continue
+            task = asyncio.create_task(self._synthesize(tts, voice_key, text))
+            self._synthesizing[key] = task
+
+            def _done(task: asyncio.Task, key=key) -> None:
+                self._synthesizing.pop(key, None)
+                if not task.cancelled() and task.exception() is not None:
+                    logger.warning(f"Could not synthesize phrase {key[1]!r}: {task.exception()}")
+
+            task.add_done_callback(_done)
+
+    def audio(self, voice_key: str, text: str) -> Optional[AsyncIterator[rtc.AudioFrame]]:
+        """Cached audio of a phrase as 20 ms frames, or None if it is not cached"""
+        cached = self._audio.get((voice_key, text))
+        if cached is None:
+            return None
+        pcm, sample_rate, num_channels = cached
+        samples_per_frame = sample_rate * FRAME_MS // 1000
+        frame_bytes = samples_per_frame * num_channels * 2
+
+        async def _frames() -> AsyncIterator[rtc.AudioFrame]:
+            for start in range(0, len(pcm), frame_bytes):
+                chunk = pcm[start:start + frame_bytes]
+                yield rtc.AudioFrame(
+                    data=chunk,
+                    sample_rate=sample_rate,
+                    num_channels=num_channels,
+                    samples_per_channel=len(chunk) // (2 * num_channels),
+                )
+
+        return _frames()
+
+
+phrase_cache = PhraseCache(AGENT_PHRASE_CACHE_DIR)
+
+
+async def say_phrase(session, text: str, **kwargs):
+    """session.say() that plays the cached audio of a fixed phrase when available"""
+    app_ctx = getattr(session, "_app_ctx", None)
+    voice_key = app_ctx.get("tts_voice_key") if isinstance(app_ctx, dict) else None
+    audio = phrase_cache.audio(voice_key, text) if voice_key else None
+    if audio is not None:
+        kwargs["audio"] = audio
+    return await session.say(text, **kwargs)
@@ -1,13 +1,33 @@
 import asyncio
 import json
+import os
 from livekit.agents import function_tool, RunContext
+from agent.phrases import ESCALATION, STATUS_UPDATE, say_phrase
 from core_service.api.services.knowledge_base import search_knowledge_base_by_question
 from core_service.api.services.help_requests import create_help_request_for_escalation
 from core_service.api.services.customer import create_customer_for_session
+from core_service.api.services.resolutions import resolution_listener
+from core_service.database.models import DEFAULT_LOCATION_ID
+from core_service.observability.metrics import ESCALATION_IN_CALL_ANSWERS, KB_SEARCH_LOOKUPS, KB_SEARCH_STATUS_UPDATES
+from core_service.observability.tracing import stage
 
 import logging
 logger = logging.getLogger("agent.tools")
 
+# Tunables for the search hot path; see the kb_search_* metrics when adjusting them
+KB_MIN_SIMILARITY = float(os.getenv("KB_MIN_SIMILARITY", "0.5"))
+KB_STATUS_UPDATE_TIMEOUT_S = float(os.getenv("KB_STATUS_UPDATE_TIMEOUT_S", "1.5"))
+
+# Calls waiting for a supervisor's answer (referenced so the tasks are not garbage collected)
+_answer_waits: set = set()
+
+
+def _get_app_ctx(context: RunContext) -> dict:
+    """Return the session-scoped app context set up in agent.main"""
+    app_ctx = getattr(context.session, "_app_ctx", None)
+    return app_ctx if isinstance(app_ctx, dict) else {}
+
+
 @function_tool()
 async def search_knowledge_base(context: RunContext, query: str) -> str:
     """Look up information in the knowledge base.
@@ -15,27 +35,45 @@ async def search_knowledge_base(context: RunContext, query: str) -> str:
         Args:
             query: The question to look up in the knowledge base. Most likely a question from a customer. Output of this should be the answer to the question.
         """
+    app_ctx = _get_app_ctx(context)
+    span_attrs = {"room": app_ctx.get("room_name"), "call_id": app_ctx.get("call_id"), "location": app_ctx.get("location_id")}
+
+    with stage("tool_total", **span_attrs) as span:
+        answer = await _search_knowledge_base(context, query, span_attrs)
+        span.set_attribute("result", "hit" if answer else "miss")
+    KB_SEARCH_LOOKUPS.labels(result="hit" if answer else "miss").inc()
+    return answer
+
+
+async def _search_knowledge_base(context: RunContext, query: str, span_attrs: dict):
+    location_id = _get_app_ctx(context).get("location_id") or DEFAULT_LOCATION_ID
 
     # Gate the status update so it does not trigger another LLM planning cycle
     search_done = asyncio.Event()
 
-    async def _speak_status_update(timeout_s: float = 1.5) -> None:
+    async def _speak_status_update(timeout_s: float = KB_STATUS_UPDATE_TIMEOUT_S) -> None:
         try:
             # If the search finishes before the timeout, do nothing
             await asyncio.wait_for(search_done.wait(), timeout=timeout_s)
             return
         except asyncio.TimeoutError:
             # Speak a brief status update directly without involving the LLM
-            await context.session.say(
-                "Let me check that for you… one moment.",
-                allow_interruptions=True,
-                add_to_chat_ctx=False,
-            )
+            KB_SEARCH_STATUS_UPDATES.inc()
+            with stage("say_status_update", **span_attrs):
+                await say_phrase(
+                    context.session,
+                    STATUS_UPDATE,
+                    allow_interruptions=True,
+                    add_to_chat_ctx=False,
+                )
 
-    status_update_task = asyncio.create_task(_speak_status_update(1.5))
+    status_update_task = asyncio.create_task(_speak_status_update(KB_STATUS_UPDATE_TIMEOUT_S))
 
     # Perform search off the event loop
-    result = await asyncio.to_thread(search_knowledge_base_by_question, query, 1, 0.5)
+    with stage("search", **span_attrs):
+        result = await asyncio.to_thread(
+            search_knowledge_base_by_question, query, 1, KB_MIN_SIMILARITY, location_id=location_id
+        )
 
     # Signal completion to cancel any pending status update
     search_done.set()
@@ -48,20 +86,27 @@ async def search_knowledge_base(context: RunContext, query: str) -> str:
             customer_id = app_ctx.get("customer_id")
         
         # Create help request for escalation
-        help_request = await asyncio.to_thread(
-            create_help_request_for_escalation,
-            query,
-            customer_id=customer_id
-            # TODO: In practice, also pass call_id from context when available
-            # call_id=context.call_id
-        )
+        with stage("escalation_insert", **span_attrs):
+            help_request = await asyncio.to_thread(
+                create_help_request_for_escalation,
+                query,
+                customer_id=customer_id,
+                location_id=location_id,
+                # TODO: In practice, also pass call_id from context when available
+                # call_id=context.call_id
+            )
         
         # Inform the user directly; do not add to chat context to avoid extra LLM replies
-        await context.session.say(
-            "Let me check with my supervisor and get back to you.",
-            allow_interruptions=False,
-            add_to_chat_ctx=False,
-        )
+        with stage("say_escalation", **span_attrs):
+            await say_phrase(
+                context.session,
+                ESCALATION,
+                allow_interruptions=False,
+                add_to_chat_ctx=False,
+            )
+
+        if help_request:
+            _wait_for_answer_in_call(context, help_request.id, span_attrs)
 
         # Log customer escalation notification
         logger.info("\n" + "="*60 +
@@ -79,4 +124,33 @@ async def search_knowledge_base(context: RunContext, query: str) -> str:
     # Cancel status update if search completed before timeout
     status_update_task.cancel()
     
-    return result[0]["answer_text"]
\ No newline at end of file
+    return result[0]["answer_text"]
+
+
+def _wait_for_answer_in_call(context: RunContext, help_request_id, span_attrs: dict) -> None:
+    """Speak the supervisor's answer if it comes while the caller is still on the line"""
+    task = asyncio.create_task(_speak_answer_when_resolved(context, help_request_id, span_attrs))
+    _answer_waits.add(task)
+    task.add_done_callback(_answer_waits.discard)
+    # Stop waiting when the caller hangs up; the answer then only goes out by text
+    context.session.once("close", lambda _event: task.cancel())
+
+
+async def _speak_answer_when_resolved(context: RunContext, help_request_id, span_attrs: dict) -> None:
+    answer = await resolution_listener.wait_for_answer(help_request_id)
+    if answer is None:
+        ESCALATION_IN_CALL_ANSWERS.labels(outcome="not_answered").inc()
+        return
+    try:
+        with stage("say_supervisor_answer", **span_attrs):
+            await context.session.say(
+                f"I just heard back from my supervisor about your question. {answer}",
+                allow_interruptions=True,
+                add_to_chat_ctx=True,  # The LLM can field follow-up questions about the answer
+            )
+    except Exception as e:
+        ESCALATION_IN_CALL_ANSWERS.labels(outcome="call_ended").inc()
+        logger.info(f"Could not speak the answer to help request {help_request_id}: {e}")
+        return
+    ESCALATION_IN_CALL_ANSWERS.labels(outcome="spoken").inc()
+    logger.info(f"Spoke the supervisor's answer to help request {help_request_id} in-call")
@@ -0,0 +1,210 @@
+"""
+Admission control - bound the work the core service takes on, shed the rest fast
+
+Sync routes run in a shared threadpool and hold a database connection, so
+past a few dozen concurrent requests extra requests only wait on the pool
+and everything times out together. AdmissionMiddleware admits at most
+ADMISSION_MAX_CONCURRENCY requests at once (and fewer for routes with their
+own limit, such as exports). Further requests wait in a bounded queue that
+is served by priority class, then arrival order. A request that cannot be
+queued, or waits longer than ADMISSION_QUEUE_TIMEOUT_S, gets an immediate
+503 with Retry-After instead of a slow timeout.
+
+Priority classes:
+    critical     supervisor actions that unblock callers (resolve, claim, cancel...)
+    interactive  dashboard listings and single-item reads/writes (default)
+    bulk         exports, imports and clustering
+
+Health checks, metrics and the (token-guarded) /api/admin/ diagnostics bypass
+admission: they are needed most while the service is saturated, and a CPU
+profile would hold a slot for its whole capture.
+"""
+import asyncio
+import itertools
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from core_service.observability.metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_QUEUE_WAIT_SECONDS,
+    ADMISSION_SHED,
+)
+
+# 0 disables admission control
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "16"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_QUEUE_TIMEOUT_S = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "2"))
+ADMISSION_RETRY_AFTER_S = int(os.getenv("ADMISSION_RETRY_AFTER_S", "1"))
+
+PRIORITY_CRITICAL = "critical"
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+PRIORITIES = (PRIORITY_CRITICAL, PRIORITY_INTERACTIVE, PRIORITY_BULK)
+_RANK = {priority: rank for rank, priority in enumerate(PRIORITIES)}
+
+# (method, path pattern, priority, concurrency limit of the route or None); first match wins,
+# anything else is interactive with no route limit
+ADMISSION_ROUTES = (
+    ("POST", re.compile(r"^/api/help-requests/(claim|batch-resolve|[^/]+/(resolve|cancel|heartbeat|release))/?$"),
+     PRIORITY_CRITICAL, None),
+    ("GET", re.compile(r"^/api/help-requests/export/?$"), PRIORITY_BULK, 2),
+    ("GET", re.compile(r"^/api/knowledge-base/export/?$"), PRIORITY_BULK, 2),
+    ("POST", re.compile(r"^/api/knowledge-base/import/?$"), PRIORITY_BULK, 1),
+    ("GET", re.compile(r"^/api/help-requests/clusters/?$"), PRIORITY_BULK, 2),
+)
+
+SHED_QUEUE_FULL = "queue_full"
+SHED_TIMEOUT = "timeout"
+SHED_EVICTED = "evicted"  # Displaced from a full queue by a higher-priority request
+
+
+def classify(method: str, path: str) -> Tuple[str, Optional[str], Optional[int]]:
+    """(priority, route key, route concurrency limit) of a request"""
+    for route_method, pattern, priority, limit in ADMISSION_ROUTES:
+        if method == route_method and pattern.match(path):
+            return priority, f"{route_method} {pattern.pattern}", limit
+    return PRIORITY_INTERACTIVE, None, None
+
+
+class _Waiter:
+    __slots__ = ("priority", "rank", "seq", "route", "limit", "future")
+
+    def __init__(self, priority: str, seq: int, route: Optional[str], limit: Optional[int], future: asyncio.Future):
+        self.priority = priority
+        self.rank = _RANK[priority]
+        self.seq = seq
+        self.route = route
+        self.limit = limit
+        self.future = future
+
+
+class AdmissionController:
+    """Concurrency slots with a bounded priority wait queue (one per event loop/process)"""
+
+    def __init__(self, max_concurrency: int = ADMISSION_MAX_CONCURRENCY, max_queue: int = ADMISSION_QUEUE_SIZE,
+                 queue_timeout_s: float = ADMISSION_QUEUE_TIMEOUT_S):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.in_flight = 0
+        self._route_in_flight: Dict[str, int] = {}
+        # Kept sorted by (rank, seq): the next request to admit comes first
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrency > 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _route_has_room(self, route: Optional[str], limit: Optional[int]) -> bool:
+        return route is None or limit is None or self._route_in_flight.get(route, 0) < limit
+
+    def _take(self, priority: str, route: Optional[str]) -> None:
+        self.in_flight += 1
+        if route is not None:
+            self._route_in_flight[route] = self._route_in_flight.get(route, 0) + 1
+        ADMISSION_IN_FLIGHT.labels(priority=priority).inc()
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        self._waiters.remove(waiter)
+        ADMISSION_QUEUE_DEPTH.labels(priority=waiter.priority).dec()
+
+    async def acquire(self, priority: str, route: Optional[str] = None, limit: Optional[int] = None) -> Optional[str]:
+        """
+        Wait for a slot.
+
+        Returns:
+            None once admitted (call release() when done), otherwise why the request was shed
+        """
+        rank = _RANK[priority]
+        ahead = any(w.rank <= rank and self._route_has_room(w.route, w.limit) for w in self._waiters)
+        if not ahead and self.in_flight < self.max_concurrency and self._route_has_room(route, limit):
+            self._take(priority, route)
+            return None
+
+        if len(self._waiters) >= self.max_queue:
+            lowest = self._waiters[-1] if self._waiters else None
+            if lowest is None or lowest.rank <= rank:
+                return SHED_QUEUE_FULL
+            self._dequeue(lowest)
+            lowest.future.set_result(SHED_EVICTED)
+
+        waiter = _Waiter(priority, next(self._seq), route, limit, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._waiters.sort(key=lambda w: (w.rank, w.seq))
+        ADMISSION_QUEUE_DEPTH.labels(priority=priority).inc()
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(waiter.future, timeout=self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                return waiter.future.result()  # Admitted (or evicted) just as the wait timed out
+            return SHED_TIMEOUT
+        except asyncio.CancelledError:
+            # The client went away; give back a slot granted in the meantime
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.result() is None:
+                self.release(priority, route)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._dequeue(waiter)
+            ADMISSION_QUEUE_WAIT_SECONDS.labels(priority=priority).observe(time.perf_counter() - start)
+
+    def release(self, priority: str, route: Optional[str] = None) -> None:
+        """Free an admitted request's slot and admit the best waiters that now fit"""
+        self.in_flight -= 1
+        if route is not None:
+            self._route_in_flight[route] -= 1
+        ADMISSION_IN_FLIGHT.labels(priority=priority).dec()
+        for waiter in list(self._waiters):
+            if self.in_flight >= self.max_concurrency:
+                break
+            if waiter.future.done() or not self._route_has_room(waiter.route, waiter.limit):
+                continue
+            self._dequeue(waiter)
+            self._take(waiter.priority, waiter.route)
+            waiter.future.set_result(None)
+
+
+class AdmissionMiddleware:
+    """Admit, queue or shed (503 + Retry-After) each request via an AdmissionController"""
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None,
+                 excluded_paths=("/healthz", "/metrics"), excluded_prefixes=("/api/admin/",)):
+        self.app = app
+        self.controller = controller or AdmissionController()
+        self.excluded_paths = set(excluded_paths)
+        self.excluded_prefixes = tuple(excluded_prefixes)
+
+    def _excluded(self, path: str) -> bool:
+        return path in self.excluded_paths or path.startswith(self.excluded_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.controller.enabled or self._excluded(scope.get("path", "")):
+            await self.app(scope, receive, send)
+            return
+
+        priority, route, limit = classify(scope["method"], scope.get("path", ""))
+        shed = await self.controller.acquire(priority, route, limit)
+        if shed is not None:
+            ADMISSION_SHED.labels(priority=priority, reason=shed).inc()
+            response = JSONResponse(
+                {"detail": "Service overloaded, retry shortly"},
+                status_code=503,
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER_S)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(priority, route)
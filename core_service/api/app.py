@@ -1,10 +1,14 @@
 import os
 import logging
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv, find_dotenv
 
-from api.routes import help_requests, knowledge_base
+from api.routes import admin, help_requests, knowledge_base, locations
+from api.admission import AdmissionMiddleware
+from api.middleware import CompressionMiddleware, MetricsMiddleware
+from api.responses import ORJSONResponse
+from core_service.observability.metrics import render_latest
 
 # Load environment variables from repo root
 load_dotenv(find_dotenv())
@@ -16,7 +20,10 @@ logging.basicConfig(
 )
 
 # Create FastAPI app
-app = FastAPI(title="Core Service")
+app = FastAPI(title="Core Service", default_response_class=ORJSONResponse)
+
+# Innermost: shed overload before any route work, with CORS headers still added to 503s
+app.add_middleware(AdmissionMiddleware)
 
 # Configure CORS
 cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:5173").split(",")
@@ -30,11 +37,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large bodies (listings, exports) after CORS headers are added
+app.add_middleware(CompressionMiddleware)
+
+# Outermost middleware so latency includes CORS handling
+app.add_middleware(MetricsMiddleware)
+
 # Health check endpoint
 @app.get("/healthz")
 def health_check():
     return {"status": "ok"}
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
 # Include routers with /api prefix
 app.include_router(help_requests.router, prefix="/api/help-requests", tags=["help-requests"])
-app.include_router(knowledge_base.router, prefix="/api/knowledge-base", tags=["knowledge-base"]) 
\ No newline at end of file
+app.include_router(knowledge_base.router, prefix="/api/knowledge-base", tags=["knowledge-base"])
+app.include_router(locations.router, prefix="/api/locations", tags=["locations"]) 
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"]) 
\ No newline at end of file
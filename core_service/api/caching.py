@@ -0,0 +1,85 @@
+"""
+Conditional GETs for listings and details
+
+ETags are derived from per-table change counters (see
+crud.get_table_versions), so checking If-None-Match costs one primary-key
+lookup and no rows of the resource are loaded. Responses carry
+`Cache-Control: private, no-cache`: browsers keep the body but revalidate
+on every view, and an idle dashboard gets 304s with empty bodies.
+"""
+import hashlib
+from typing import Optional, Sequence
+
+from fastapi import Request, Response
+
+from core_service.database import crud
+from core_service.database.session import pin_read_engine
+
+CACHE_CONTROL = "private, no-cache"
+# Codings CompressionMiddleware may apply (see encoded_etag)
+CONTENT_CODINGS = ("br", "gzip")
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag over the given parts"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:24]}"'
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    ETag of a compressed representation: strong ETags must differ between byte
+    representations, so CompressionMiddleware appends the content coding ("abc" -> "abc-gzip").
+    """
+    if etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _matching_tag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """The client's tag that matches `etag` (in any content coding), without its W/ prefix"""
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+    for tag in (tag.strip() for tag in if_none_match.split(",")):
+        tag = tag[2:] if tag.startswith("W/") else tag
+        if tag == etag or any(tag == encoded_etag(etag, encoding) for encoding in CONTENT_CODINGS):
+            return tag
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so a W/ prefix on the client's tag is ignored"""
+    return _matching_tag(if_none_match, etag) is not None
+
+
+def listing_etag(request: Request, tables: Sequence[str], *extra) -> Optional[str]:
+    """
+    ETag for the representation at the request URL, or None when the
+    change counters are unavailable (the response is then not cacheable).
+
+    Args:
+        tables: Tables whose writes can change the response
+        extra: Anything else the response depends on (e.g. the next expiry time)
+    """
+    # The rows read after this must come from the database the versions were read from
+    pin_read_engine()
+    versions = crud.get_table_versions(tables)
+    if versions is None:
+        return None
+    return make_etag(request.url.path, request.url.query, *(f"{t}={versions[t]}" for t in sorted(versions)), *extra)
+
+
+def not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    """A 304 response if the client already holds `etag`, echoing the tag of the representation it holds"""
+    held = _matching_tag(request.headers.get("if-none-match"), etag) if etag is not None else None
+    if held is None:
+        return None
+    return Response(status_code=304, headers={"ETag": held, "Cache-Control": CACHE_CONTROL})
+
+
+def set_cache_headers(response: Response, etag: Optional[str]) -> None:
+    if etag is not None:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
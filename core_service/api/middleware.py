@@ -0,0 +1,201 @@
+"""
+ASGI middleware for the core service
+"""
+import os
+import time
+import zlib
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from core_service.observability.db import start_request_stats
+from core_service.observability.metrics import (
+    DB_QUERIES_PER_REQUEST,
+    DB_TIME_PER_REQUEST_SECONDS,
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUESTS_IN_FLIGHT,
+)
+from .caching import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # Optional; without it responses are gzip-compressed only
+    brotli = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Larger chunks are compressed in a worker thread so they don't stall the event loop
+COMPRESSION_THREAD_MIN_BYTES = 128 * 1024
+
+# Already compressed, or must reach the client unbuffered
+_UNCOMPRESSED_TYPE_PREFIXES = ("image/", "audio/", "video/", "text/event-stream", "application/gzip", "application/zip")
+
+
+def _route_template(scope) -> str:
+    """Use the matched route template (e.g. /api/help-requests/{request_id}) to keep labels bounded"""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # FastAPI >= 0.140 leaves included routes unprefixed and records the mounted path here
+    effective = scope.get("fastapi", {}).get("effective_route_context")
+    return effective.path if effective is not None else route.path
+
+
+class MetricsMiddleware:
+    """
+    Record per-route latency, status codes, in-flight requests and the number/duration
+    of SQL statements executed while serving each request.
+    """
+
+    def __init__(self, app, excluded_paths=("/metrics",)):
+        self.app = app
+        self.excluded_paths = set(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        db_stats = start_request_stats()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method=method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            route = _route_template(scope)
+            HTTP_REQUEST_SECONDS.labels(method=method, route=route, status=str(status_code)).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(method=method, route=route).observe(db_stats.query_count)
+            DB_TIME_PER_REQUEST_SECONDS.labels(method=method, route=route).observe(db_stats.total_seconds)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick "br" or "gzip" from an Accept-Encoding header, or None for identity"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    """Streaming brotli/gzip compressor; `finish` ends the stream"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    async def compress_async(self, data: bytes, finish: bool) -> bytes:
+        if len(data) >= COMPRESSION_THREAD_MIN_BYTES:
+            return await run_in_threadpool(self.compress, data, finish)
+        return self.compress(data, finish)
+
+    def compress(self, data: bytes, finish: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if finish else self._brotli.flush())
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    Compress large responses with brotli (if installed) or gzip, per Accept-Encoding.
+
+    Small, already-encoded and media responses pass through untouched. Streaming
+    responses (e.g. NDJSON exports) are compressed chunk by chunk, flushing after
+    each chunk so clients can decode rows as they arrive.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES,
+                 gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                if start_message is not None:
+                    await send(start_message)
+                    start_message = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                content_type = headers.get("content-type", "").lower()
+                if ("content-encoding" in headers
+                        or start_message["status"] in (204, 206, 304)
+                        or content_type.startswith(_UNCOMPRESSED_TYPE_PREFIXES)
+                        or (not more_body and len(body) < self.minimum_size)):
+                    passthrough = True
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                body = await compressor.compress_async(body, finish=not more_body)
+                headers["Content-Encoding"] = encoding
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+                await send(start_message)
+                start_message = None
+            else:
+                body = await compressor.compress_async(body, finish=not more_body)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,49 @@
+"""
+JSON rendering for API responses
+
+Routes return plain Python values (dicts/lists, datetimes, UUIDs) or
+Pydantic models. orjson renders them several times faster than the stdlib
+encoder FastAPI uses by default, and handles datetime/UUID natively.
+
+Listings skip FastAPI's per-item re-validation: rows are validated once, in
+bulk, through a TypeAdapter for the declared list schema and the resulting
+response is returned directly (the route's response_model still documents
+the shape).
+"""
+from typing import Any, Iterable, List
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+from .schemas.help_request import HelpRequestOut
+from .schemas.knowledge_base import KnowledgeBaseOut
+
+HELP_REQUEST_LIST = TypeAdapter(List[HelpRequestOut])
+KB_ENTRY_LIST = TypeAdapter(List[KnowledgeBaseOut])
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; also accepts (lists of) Pydantic models"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def list_response(adapter: TypeAdapter, rows: Iterable[dict]) -> ORJSONResponse:
+    """
+    Validate `rows` against a list schema in one call and render them.
+
+    Args:
+        adapter: TypeAdapter for the list schema, e.g. HELP_REQUEST_LIST
+        rows: Field dicts, one per item
+    """
+    models = adapter.validate_python(list(rows))
+    # JSON mode keeps Pydantic's wire format (e.g. "Z" for UTC) identical to single-item routes
+    return ORJSONResponse(adapter.dump_python(models, mode="json"))
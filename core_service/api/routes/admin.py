@@ -0,0 +1,114 @@
+import asyncio
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
+
+from core_service.observability import db as db_observability
+from core_service.observability import profiling
+
+# Bearer token for the admin endpoints; unset disables them (404)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+KEY_TYPES = "^(lineno|filename|traceback)$"
+
+
+def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """Only requests bearing ADMIN_TOKEN get through"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Admin token required", headers={"WWW-Authenticate": "Bearer"})
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiling/cpu", response_class=PlainTextResponse)
+async def profile_cpu(
+    seconds: float = Query(10, gt=0, le=profiling.PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    include_idle: bool = Query(False, description="Keep samples of threads waiting for work"),
+):
+    """Sample every thread's stack for a while; folded stacks for flamegraph.pl/speedscope"""
+    try:
+        return await asyncio.to_thread(profiling.sample_stacks, seconds, interval_ms / 1000, include_idle)
+    except profiling.ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/profiling/tasks")
+async def dump_asyncio_tasks():
+    """Pending asyncio tasks of the server's event loop and where each is suspended"""
+    return profiling.dump_tasks()
+
+
+@router.get("/profiling/threads")
+def dump_thread_stacks():
+    """Current stack of every thread"""
+    return profiling.dump_threads()
+
+
+@router.post("/profiling/memory/start")
+def start_memory_tracing(frames: int = Query(25, ge=1, le=100)):
+    """Start tracing allocations (slows allocation-heavy code while on)"""
+    return {"started": profiling.start_tracemalloc(frames)}
+
+
+@router.post("/profiling/memory/stop", status_code=204)
+def stop_memory_tracing():
+    profiling.stop_tracemalloc()
+    return Response(status_code=204)
+
+
+@router.get("/profiling/memory/top")
+def top_allocations(limit: int = Query(25, ge=1, le=500), key_type: str = Query("lineno", pattern=KEY_TYPES)):
+    """Largest live allocation sites"""
+    try:
+        return profiling.top_allocations(limit, key_type)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/profiling/memory/baseline", status_code=204)
+def take_memory_baseline():
+    """Snapshot allocations for later diffs"""
+    try:
+        profiling.set_baseline()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(status_code=204)
+
+
+@router.get("/profiling/memory/diff")
+def diff_allocations(limit: int = Query(25, ge=1, le=500), key_type: str = Query("lineno", pattern=KEY_TYPES)):
+    """Allocation sites that grew the most since the baseline"""
+    try:
+        return profiling.diff_allocations(limit, key_type)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/queries")
+def query_stats(
+    limit: int = Query(50, ge=1, le=1000),
+    order_by: str = Query("total", pattern="^(total|mean|max|calls)$"),
+):
+    """SQL statements of this process grouped by fingerprint, most expensive first"""
+    return db_observability.query_stats(limit, order_by)
+
+
+@router.get("/queries/slow")
+def slow_queries():
+    """Recent statements over DB_SLOW_QUERY_MS with their EXPLAIN (ANALYZE, BUFFERS) plans, newest first"""
+    return db_observability.slow_queries()
+
+
+@router.delete("/queries", status_code=204)
+def reset_query_stats():
+    """Start fingerprint statistics and plan captures afresh (e.g. before a load test)"""
+    db_observability.reset_query_stats()
+    return Response(status_code=204)
@@ -1,36 +1,81 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from datetime import datetime
 from typing import List, Optional
-from ..schemas.help_request import HelpRequestOut, HelpRequestCreate, HelpRequestResolve, HelpRequestCancel
+from ..schemas.help_request import (
+    HelpRequestOut,
+    HelpRequestCreate,
+    HelpRequestResolve,
+    HelpRequestCancel,
+    HelpRequestCluster,
+    HelpRequestBatchResolve,
+    HelpRequestBatchResolveResult,
+    HelpRequestClaim,
+    HelpRequestClaimOut,
+    HelpRequestLease,
+)
 from core_service.database import crud
 from core_service.database.models import SupervisorResponse
-from ..services.help_requests import resolve_hr_and_create_kb
+from core_service.database.session import pin_read_engine
+from ..services.help_requests import HELP_REQUEST_CLAIM_LEASE_S, resolve_hr_and_create_kb, export_help_request_history
+from ..services.help_request_clusters import HELP_REQUEST_CLUSTER_THRESHOLD, batch_resolve, cluster_pending_help_requests
+from ..responses import HELP_REQUEST_LIST, list_response
+from ..caching import listing_etag, not_modified, set_cache_headers
 import logging
 
 router = APIRouter()
 logger = logging.getLogger("routes.help_requests")
 
+# Tables whose writes can change a help request representation (answer_text comes from supervisor_responses)
+HELP_REQUEST_TABLES = ("help_requests", "supervisor_responses")
+
+
+def _help_request_fields(help_request, supervisor_response: Optional[SupervisorResponse] = None) -> dict:
+    """Output schema fields of a database model"""
+    return {
+        "id": help_request.id,
+        "location_id": help_request.location_id,
+        "customer_id": help_request.customer_id,
+        "question_text": help_request.question_text,
+        "status": help_request.status,
+        "created_at": help_request.created_at,
+        "expires_at": help_request.expires_at,
+        "resolved_at": help_request.resolved_at,
+        "answer_text": supervisor_response.answer_text if supervisor_response else None,
+    }
+
 
 def _help_request_to_out(help_request, supervisor_response: Optional[SupervisorResponse] = None) -> HelpRequestOut:
     """Convert database model to output schema"""
-    return HelpRequestOut(
-        id=help_request.id,
-        customer_id=help_request.customer_id,
-        question_text=help_request.question_text,
-        status=help_request.status,
-        created_at=help_request.created_at,
-        expires_at=help_request.expires_at,
-        resolved_at=help_request.resolved_at,
-        answer_text=supervisor_response.answer_text if supervisor_response else None
+    return HelpRequestOut(**_help_request_fields(help_request, supervisor_response))
+
+
+def _help_request_to_claim_out(help_request) -> HelpRequestClaimOut:
+    """Convert a claimed database model to output schema"""
+    return HelpRequestClaimOut(
+        **_help_request_fields(help_request),
+        claimed_by=help_request.claimed_by,
+        claim_expires_at=help_request.claim_expires_at,
     )
 
 
 @router.get("/", response_model=List[HelpRequestOut])
 def list_help_requests(
-    status: Optional[str] = Query(None, description="Filter by status: pending, in_progress, resolved")
+    request: Request,
+    status: Optional[str] = Query(None, description="Filter by status: pending, in_progress, resolved"),
+    location_id: Optional[str] = Query(None, description="Only this location's requests (default: all locations)"),
 ):
-    """List help requests, optionally filtered by status"""
+    """List help requests, optionally filtered by status and location"""
     try:
-        help_requests = crud.list_help_requests(status=status)
+        # Pending requests drop out of the listing when they expire, without any write
+        pin_read_engine()
+        next_expiry = crud.get_next_pending_expiry(location_id=location_id) if status == "pending" else None
+        etag = listing_etag(request, HELP_REQUEST_TABLES, next_expiry)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+
+        help_requests = crud.list_help_requests(status=status, location_id=location_id)
         
         # Get supervisor responses for resolved requests to include answer_text
         results = []
@@ -42,22 +87,114 @@ def list_help_requests(
                 if result and result["supervisor_response"]:
                     supervisor_response = result["supervisor_response"]
             
-            results.append(_help_request_to_out(hr, supervisor_response))
+            results.append(_help_request_fields(hr, supervisor_response))
         
-        return results
+        response = list_response(HELP_REQUEST_LIST, results)
+        set_cache_headers(response, etag)
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/clusters", response_model=List[HelpRequestCluster])
+def list_help_request_clusters(
+    location_id: Optional[str] = Query(None, description="Only this location's requests (default: all locations)"),
+    threshold: float = Query(HELP_REQUEST_CLUSTER_THRESHOLD, ge=0, le=1,
+                             description="Average cosine similarity needed to group questions"),
+):
+    """Group pending help requests that ask the same question, largest group first"""
+    try:
+        clusters = cluster_pending_help_requests(location_id=location_id, threshold=threshold)
+        return [
+            HelpRequestCluster(
+                location_id=cluster["location_id"],
+                size=cluster["size"],
+                representative_question=cluster["representative_question"],
+                help_requests=[_help_request_to_out(hr) for hr in cluster["help_requests"]],
+            )
+            for cluster in clusters
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/batch-resolve", response_model=HelpRequestBatchResolveResult)
+def batch_resolve_help_requests(resolve_data: HelpRequestBatchResolve):
+    """Resolve several help requests (e.g. a cluster) with one answer and one KB entry"""
+    try:
+        result = batch_resolve(
+            resolve_data.help_request_ids,
+            answer_text=resolve_data.answer_text,
+            responder_id=resolve_data.responder_id,
+            notification_logger=logger,
+            question_text=resolve_data.question_text,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        logger.error(f"Error batch-resolving help requests: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    kb_entry = result["knowledge_base_entry"]
+    return HelpRequestBatchResolveResult(
+        resolved=[_help_request_to_out(hr, SupervisorResponse(answer_text=resolve_data.answer_text))
+                  for hr in result["resolved"]],
+        skipped_ids=result["skipped_ids"],
+        knowledge_base_entry_id=kb_entry.id if kb_entry else None,
+    )
+
+
+@router.post("/claim", response_model=HelpRequestClaimOut,
+             responses={204: {"description": "No pending help request to claim"}})
+def claim_help_request(claim_data: HelpRequestClaim):
+    """
+    Claim the most urgent pending help request for a supervisor.
+
+    Concurrent supervisors each get a different request. The claim lapses after
+    HELP_REQUEST_CLAIM_LEASE_S unless renewed with /{request_id}/heartbeat.
+    """
+    try:
+        claimed = crud.claim_next_help_request(
+            claim_data.supervisor_id, HELP_REQUEST_CLAIM_LEASE_S, location_id=claim_data.location_id
+        )
+    except Exception as e:
+        logger.error(f"Error claiming a help request for {claim_data.supervisor_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if claimed is None:
+        return Response(status_code=204)
+    logger.info(f"Help request {claimed.id} claimed by {claim_data.supervisor_id}")
+    return _help_request_to_claim_out(claimed)
+
+
+@router.post("/{request_id}/heartbeat", response_model=HelpRequestClaimOut)
+def heartbeat_help_request_claim(request_id: str, lease_data: HelpRequestLease):
+    """Renew a supervisor's claim on a help request"""
+    renewed = crud.heartbeat_claim(request_id, lease_data.supervisor_id, HELP_REQUEST_CLAIM_LEASE_S)
+    if renewed is None:
+        raise HTTPException(status_code=409, detail="Claim lost: help request is no longer pending or claimed by another supervisor")
+    return _help_request_to_claim_out(renewed)
+
+
+@router.post("/{request_id}/release", status_code=204)
+def release_help_request_claim(request_id: str, lease_data: HelpRequestLease):
+    """Give a claimed help request back to the queue"""
+    if not crud.release_claim(request_id, lease_data.supervisor_id):
+        raise HTTPException(status_code=409, detail="Help request is not claimed by this supervisor")
+    return Response(status_code=204)
+
 
 @router.post("/{request_id}/resolve", response_model=HelpRequestOut)
 def resolve_help_request(request_id: str, resolve_data: HelpRequestResolve):
     """Resolve a help request and notify the customer"""
-    resolved, supervisor_response = resolve_hr_and_create_kb(
-        request_id=request_id,
-        answer_text=resolve_data.answer_text,
-        responder_id=resolve_data.responder_id,
-        notification_logger=logger,
-    )
+    try:
+        resolved, supervisor_response = resolve_hr_and_create_kb(
+            request_id=request_id,
+            answer_text=resolve_data.answer_text,
+            responder_id=resolve_data.responder_id,
+            notification_logger=logger,
+        )
+    except crud.HelpRequestConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if not resolved:
         raise HTTPException(status_code=404, detail="Help request not found")
     return _help_request_to_out(resolved, supervisor_response)
@@ -82,10 +219,31 @@ def cancel_help_request(request_id: str, cancel_data: HelpRequestCancel):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/export")
+def export_help_requests(
+    created_from: Optional[datetime] = Query(None, description="Include requests created at or after this time (ISO 8601)"),
+    created_to: Optional[datetime] = Query(None, description="Include requests created before this time (ISO 8601)"),
+    status: Optional[List[str]] = Query(None, description="Filter by status; repeat for several"),
+    location_id: Optional[str] = Query(None, description="Only this location's requests (default: all locations)"),
+):
+    """Stream help request history (with answers and followups) as NDJSON for analytics"""
+    return StreamingResponse(
+        export_help_request_history(created_from=created_from, created_to=created_to, statuses=status,
+                                    location_id=location_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="help_requests.ndjson"'},
+    )
+
+
 @router.get("/{request_id}", response_model=HelpRequestOut)
-def get_help_request(request_id: str):
+def get_help_request(request_id: str, request: Request, response: Response):
     """Get a specific help request by ID"""
     try:
+        etag = listing_etag(request, HELP_REQUEST_TABLES)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+
         result = crud.get_help_request_with_answer(request_id)
         if not result:
             raise HTTPException(status_code=404, detail="Help request not found")
@@ -93,6 +251,7 @@ def get_help_request(request_id: str):
         help_request = result["help_request"]
         supervisor_response = result["supervisor_response"]
         
+        set_cache_headers(response, etag)
         return _help_request_to_out(help_request, supervisor_response)
     except HTTPException:
         raise
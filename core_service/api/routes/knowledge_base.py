@@ -1,34 +1,60 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-from ..schemas.knowledge_base import KnowledgeBaseOut, KnowledgeBaseCreate, KnowledgeBaseUpdate
+from ..schemas.knowledge_base import KnowledgeBaseOut, KnowledgeBaseCreate, KnowledgeBaseUpdate, KnowledgeBaseImportResult
 from core_service.database import crud
+from core_service.database.models import DEFAULT_LOCATION_ID
 from ..services.knowledge_base import create_knowledge_base_from_text, update_knowledge_base_from_text
+from ..services.knowledge_base_bulk import KBImportError, export_entries, import_entries, parse_import
+from ..responses import KB_ENTRY_LIST, list_response
+from ..caching import listing_etag, not_modified, set_cache_headers
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+# Tables whose writes can change a knowledge base representation
+KB_TABLES = ("knowledge_base",)
 
 router = APIRouter()
 
 
-def _kb_entry_to_out(kb_entry) -> KnowledgeBaseOut:
-    """Convert database model to output schema"""
+def _kb_entry_fields(kb_entry) -> dict:
+    """Output schema fields of a database model"""
     # For now, return empty categories list as we haven't implemented 
     # the categories field in the database model yet (keeping it simple)
-    return KnowledgeBaseOut(
-        id=kb_entry.id,
-        question_text_example=kb_entry.question_text_example,
-        answer_text=kb_entry.answer_text,
-        categories=[],  # TODO: implement categories field when needed
-        created_at=kb_entry.created_at,
-        updated_at=kb_entry.updated_at
-    )
+    return {
+        "id": kb_entry.id,
+        "location_id": kb_entry.location_id,
+        "question_text_example": kb_entry.question_text_example,
+        "answer_text": kb_entry.answer_text,
+        "categories": [],  # TODO: implement categories field when needed
+        "created_at": kb_entry.created_at,
+        "updated_at": kb_entry.updated_at,
+    }
+
+
+def _kb_entry_to_out(kb_entry) -> KnowledgeBaseOut:
+    """Convert database model to output schema"""
+    return KnowledgeBaseOut(**_kb_entry_fields(kb_entry))
 
 
 @router.get("/", response_model=List[KnowledgeBaseOut])
 def list_knowledge_base(
-    q: Optional[str] = Query(None, description="Search term for LIKE query on question_text_example")
+    request: Request,
+    q: Optional[str] = Query(None, description="Search term for LIKE query on question_text_example"),
+    location_id: Optional[str] = Query(None, description="Only this location's entries (default: all locations)"),
 ):
-    """List knowledge base entries, optionally filtered by search query"""
+    """List knowledge base entries, optionally filtered by search query and location"""
     try:
-        kb_entries = crud.list_kb(q=q)
-        return [_kb_entry_to_out(entry) for entry in kb_entries]
+        etag = listing_etag(request, KB_TABLES)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+
+        kb_entries = crud.list_kb(q=q, location_id=location_id)
+        response = list_response(KB_ENTRY_LIST, [_kb_entry_fields(entry) for entry in kb_entries])
+        set_cache_headers(response, etag)
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -42,12 +68,49 @@ def create_knowledge_base_entry(kb_entry: KnowledgeBaseCreate):
             question=kb_entry.question_text_example,
             answer=kb_entry.answer_text,
             source_help_request_id=kb_entry.source_help_request_id,
+            location_id=kb_entry.location_id,
+            normalized_key=kb_entry.normalized_key,
         )
         return _kb_entry_to_out(created_entry)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/import", response_model=KnowledgeBaseImportResult)
+async def import_knowledge_base(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$", description="Defaults from Content-Type (text/csv, else JSONL)"),
+    on_conflict: str = Query("skip", pattern="^(skip|update)$", description="What to do with entries whose normalized_key exists"),
+    location_id: str = Query(DEFAULT_LOCATION_ID, description="Location whose knowledge base receives the entries"),
+):
+    """Bulk-import knowledge base entries from a CSV or JSONL request body"""
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "jsonl")
+    try:
+        body = (await request.body()).decode("utf-8-sig")
+        records = parse_import(body.splitlines(), fmt)
+    except (KBImportError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        # Embedding and inserting block, so keep them off the event loop
+        return await run_in_threadpool(import_entries, records, on_conflict, location_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/export")
+def export_knowledge_base(
+    format: str = Query("jsonl", pattern="^(csv|jsonl)$"),
+    include_embeddings: bool = Query(False, description="Include stored vectors so an import can skip re-embedding"),
+    location_id: Optional[str] = Query(None, description="Only this location's entries (default: all locations)"),
+):
+    """Stream the whole knowledge base as CSV or JSONL"""
+    return StreamingResponse(
+        export_entries(format, include_embeddings, location_id),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="knowledge_base.{format}"'},
+    )
+
+
 @router.put("/{entry_id}", response_model=KnowledgeBaseOut)
 def update_knowledge_base_entry(entry_id: str, kb_update: KnowledgeBaseUpdate):
     """Update a knowledge base entry with automatic embedding updates"""
@@ -69,9 +132,14 @@ def update_knowledge_base_entry(entry_id: str, kb_update: KnowledgeBaseUpdate):
 
 
 @router.get("/{entry_id}", response_model=KnowledgeBaseOut)
-def get_knowledge_base_entry(entry_id: str):
+def get_knowledge_base_entry(entry_id: str, request: Request, response: Response):
     """Get a specific knowledge base entry by ID"""
     try:
+        etag = listing_etag(request, KB_TABLES)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+
         # For now, implemented with list query
         # In production, a dedicated get_by_id function
         entries = crud.list_kb()
@@ -80,6 +148,7 @@ def get_knowledge_base_entry(entry_id: str):
         if not entry:
             raise HTTPException(status_code=404, detail="Knowledge base entry not found")
         
+        set_cache_headers(response, etag)
         return _kb_entry_to_out(entry)
     except HTTPException:
         raise
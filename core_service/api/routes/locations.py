@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException
+from typing import List
+from sqlalchemy.exc import IntegrityError
+from ..schemas.location import LocationOut, LocationCreate
+from core_service.database import crud
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[LocationOut])
+def list_locations():
+    """List locations"""
+    try:
+        return crud.list_locations()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/", response_model=LocationOut, status_code=201)
+def create_location(location: LocationCreate):
+    """Create a location; its knowledge base partition is created with it"""
+    try:
+        return crud.create_location(location.model_dump())
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail=f"Location {location.id} already exists")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,11 +1,14 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 import uuid
 
+from core_service.database.models import DEFAULT_LOCATION_ID
+
 
 class HelpRequestOut(BaseModel):
     id: uuid.UUID
+    location_id: str
     customer_id: uuid.UUID
     question_text: str
     status: str
@@ -18,7 +21,22 @@ class HelpRequestOut(BaseModel):
         from_attributes = True
 
 
+class HelpRequestClaimOut(HelpRequestOut):
+    claimed_by: str
+    claim_expires_at: datetime
+
+
+class HelpRequestClaim(BaseModel):
+    supervisor_id: str = Field(min_length=1)
+    location_id: Optional[str] = None  # Only claim this location's requests (default: any location)
+
+
+class HelpRequestLease(BaseModel):
+    supervisor_id: str = Field(min_length=1)
+
+
 class HelpRequestCreate(BaseModel):
+    location_id: str = DEFAULT_LOCATION_ID
     customer_id: uuid.UUID
     question_text: str
     expires_at: datetime
@@ -32,4 +50,24 @@ class HelpRequestResolve(BaseModel):
 
 
 class HelpRequestCancel(BaseModel):
-    cancel_reason: Optional[str] = None 
\ No newline at end of file
+    cancel_reason: Optional[str] = None
+
+
+class HelpRequestCluster(BaseModel):
+    location_id: str
+    size: int
+    representative_question: str
+    help_requests: List[HelpRequestOut]
+
+
+class HelpRequestBatchResolve(BaseModel):
+    help_request_ids: List[uuid.UUID] = Field(min_length=1, max_length=500)
+    answer_text: str
+    responder_id: Optional[str] = None
+    question_text: Optional[str] = None  # Question stored in the KB entry; defaults to the oldest request's
+
+
+class HelpRequestBatchResolveResult(BaseModel):
+    resolved: List[HelpRequestOut]
+    skipped_ids: List[uuid.UUID]
+    knowledge_base_entry_id: Optional[uuid.UUID] = None
@@ -3,9 +3,12 @@ from datetime import datetime
 from typing import List, Optional
 import uuid
 
+from core_service.database.models import DEFAULT_LOCATION_ID
+
 
 class KnowledgeBaseOut(BaseModel):
     id: uuid.UUID
+    location_id: str
     question_text_example: str
     answer_text: str
     categories: List[str] = []  # Will be parsed from comma-separated string
@@ -17,6 +20,7 @@ class KnowledgeBaseOut(BaseModel):
 
 
 class KnowledgeBaseCreate(BaseModel):
+    location_id: str = DEFAULT_LOCATION_ID
     question_text_example: str
     answer_text: str
     categories: List[str] = []
@@ -28,4 +32,13 @@ class KnowledgeBaseUpdate(BaseModel):
     question_text_example: Optional[str] = None
     answer_text: Optional[str] = None
     categories: Optional[List[str]] = None
-    normalized_key: Optional[str] = None 
\ No newline at end of file
+    normalized_key: Optional[str] = None 
+
+class KnowledgeBaseImportResult(BaseModel):
+    received: int
+    duplicates_in_file: int
+    skipped_existing: int
+    inserted: int
+    updated: int
+    embedded: int
+    reused_embeddings: int
@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+
+
+class LocationOut(BaseModel):
+    id: str
+    name: str
+    city: Optional[str] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class LocationCreate(BaseModel):
+    id: str = Field(pattern="^[a-z0-9_]{1,40}$", description="Slug; set as location_id in the LiveKit room metadata")
+    name: str
+    city: Optional[str] = None
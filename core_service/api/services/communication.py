@@ -7,6 +7,33 @@ from core_service.database.models import Customer
 
 logger = logging.getLogger("services.supervisor_response")
 
+
+def customer_notification_followup(help_request_id, help_request, customer: Optional[Customer], answer_text: str,
+                                   responder_id: Optional[str]) -> Dict[str, Any]:
+    """Followup row (customer_sms channel) that texts a customer the answer to their help request"""
+    customer_id = help_request.customer_id
+    customer_name = customer.display_name if customer and customer.display_name else f"Customer {customer_id}"
+    customer_phone = customer.phone_e164 if customer and customer.phone_e164 else "No phone on file"
+    customer_question = help_request.question_text
+    
+    # Create notification message content
+    text_message = f"Hi {customer_name}! We've got an answer to your question: '{customer_question}'. Here's the response: {answer_text}. Thanks for your patience!"
+    
+    return {
+        "help_request_id": help_request_id,
+        "customer_id": customer_id,
+        "channel": "customer_sms",
+        "payload": {
+            "message": text_message,
+            "customer_name": customer_name,
+            "customer_phone": customer_phone,
+            "original_question": customer_question,
+            "answer_text": answer_text,
+            "responder_id": responder_id,
+            "help_request_id": str(help_request_id),
+        },
+    }
+
 def create_customer_notification(
     help_request_id: str, 
     answer_text: str, 
@@ -46,31 +73,15 @@ def create_customer_notification(
         session = SessionLocal()
         try:
             customer = session.query(Customer).filter(Customer.id == customer_id).first()
-            customer_name = customer.display_name if customer and customer.display_name else f"Customer {customer_id}"
-            customer_phone = customer.phone_e164 if customer and customer.phone_e164 else "No phone on file"
         finally:
             session.close()
         
-        # Create notification message content
-        text_message = f"Hi {customer_name}! We've got an answer to your question: '{customer_question}'. Here's the response: {answer_text}. Thanks for your patience!"
-        
         # Create followup record for customer notification tracking
-        notification_payload = {
-            "message": text_message,
-            "customer_name": customer_name,
-            "customer_phone": customer_phone,
-            "original_question": customer_question,
-            "answer_text": answer_text,
-            "responder_id": responder_id,
-            "help_request_id": help_request_id
-        }
-        
-        followup_data = {
-            "help_request_id": help_request_id,
-            "customer_id": customer_id,
-            "channel": "customer_sms",
-            "payload": notification_payload,
-        }
+        followup_data = customer_notification_followup(help_request_id, help_request, customer, answer_text, responder_id)
+        notification_payload = followup_data["payload"]
+        customer_name = notification_payload["customer_name"]
+        customer_phone = notification_payload["customer_phone"]
+        text_message = notification_payload["message"]
         
         followup = crud.create_followup(followup_data)
         
@@ -1,19 +1,58 @@
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Mapping, Optional
+
 from core_service.database import crud
+from core_service.database.models import DEFAULT_LOCATION_ID
+
+# (location id, phone) -> customer id, per agent worker process; customers are never deleted
+CUSTOMER_CACHE_SIZE = int(os.getenv("CUSTOMER_CACHE_SIZE", "10000"))
+
+# LiveKit SIP participant attribute holding the caller's number
+SIP_PHONE_ATTRIBUTE = "sip.phoneNumber"
+
+_E164 = re.compile(r"^\+[1-9]\d{7,14}$")
+
+_cache_lock = threading.Lock()
+_customer_ids: "OrderedDict[tuple, uuid.UUID]" = OrderedDict()
 
 
-def create_customer_for_session(display_name: str = None, phone_e164: str = None):
+def normalize_phone_e164(raw: Optional[str]) -> Optional[str]:
+    """A phone number as E.164 (+ and 8-15 digits), or None if it does not look like one"""
+    if not raw:
+        return None
+    phone = re.sub(r"[\s().-]", "", raw.strip())
+    for prefix in ("tel:", "sip:"):
+        if phone.lower().startswith(prefix):
+            phone = phone[len(prefix):].split("@", 1)[0]
+    if not phone.startswith("+"):
+        phone = f"+{phone}"
+    return phone if _E164.match(phone) else None
+
+
+def caller_phone_from_attributes(attributes: Optional[Mapping[str, str]]) -> Optional[str]:
+    """E.164 caller number of a SIP participant, or None (web calls, withheld numbers)"""
+    return normalize_phone_e164((attributes or {}).get(SIP_PHONE_ATTRIBUTE))
+
+
+def create_customer_for_session(display_name: str = None, phone_e164: str = None,
+                                location_id: str = DEFAULT_LOCATION_ID):
     """
     Create a customer record for a new session.
     
     Args:
         display_name: Optional display name for the customer
         phone_e164: Optional phone number in E164 format
+        location_id: Location the customer called
     
     Returns:
         Created customer object or None if creation fails
     """
     try:
-        customer_data = {}
+        customer_data = {"location_id": location_id}
         
         if display_name:
             customer_data["display_name"] = display_name
@@ -23,4 +62,38 @@ def create_customer_for_session(display_name: str = None, phone_e164: str = None
         return crud.create_customer(customer_data)
     except Exception as e:
         print(f"Error creating customer: {e}")
-        return None 
\ No newline at end of file
+        return None
+
+
+def customer_id_for_session(display_name: str = None, phone_e164: str = None,
+                            location_id: str = DEFAULT_LOCATION_ID) -> Optional[uuid.UUID]:
+    """
+    Customer id for a call.
+
+    A known caller number maps to the location's one customer with that number
+    (upserted, then cached per process so recent repeat callers skip the
+    database). Anonymous callers get a new customer, as before.
+
+    Returns:
+        The customer id, or None if the customer could not be created
+    """
+    if not phone_e164:
+        customer = create_customer_for_session(display_name=display_name, location_id=location_id)
+        return customer.id if customer else None
+
+    key = (location_id, phone_e164)
+    with _cache_lock:
+        customer_id = _customer_ids.get(key)
+        if customer_id is not None:
+            _customer_ids.move_to_end(key)
+            return customer_id
+    try:
+        customer_id = crud.upsert_customer_by_phone(phone_e164, location_id, display_name=display_name)
+    except Exception as e:
+        print(f"Error upserting customer: {e}")
+        return None
+    with _cache_lock:
+        _customer_ids[key] = customer_id
+        while len(_customer_ids) > CUSTOMER_CACHE_SIZE:
+            _customer_ids.popitem(last=False)
+    return customer_id
@@ -0,0 +1,181 @@
+"""
+Embedding Providers - Pluggable backends that turn text into vectors
+
+Every provider exposes a `tag` ("<provider>:<model>") that is stored next to
+each knowledge base embedding, so vectors produced by different providers are
+never compared with each other. Reduced-dimension vectors (EMBEDDING_DIMENSIONS
+below the model's native width) are tagged "<provider>:<model>@<dimensions>".
+"""
+import hashlib
+import math
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from core_service.database.vector_storage import EMBEDDING_DIMENSIONS
+
+NATIVE_DIMENSIONS = 1536
+
+
+def truncate_embedding(vector: List[float], dimensions: int) -> List[float]:
+    """
+    Shorten an embedding to its first `dimensions` components and re-normalize.
+
+    text-embedding-3 models are trained so that prefixes remain useful
+    embeddings; this is what the API's `dimensions` parameter does server-side.
+    """
+    head = list(vector[:dimensions])
+    norm = math.sqrt(sum(v * v for v in head))
+    if norm == 0.0:
+        return head
+    return [v / norm for v in head]
+
+
+class EmbeddingProvider(ABC):
+    """Base class for embedding backends"""
+
+    name: str = "base"
+    native_dimensions: int = NATIVE_DIMENSIONS
+
+    def __init__(self, model: str, dimensions: int = EMBEDDING_DIMENSIONS):
+        if not 0 < dimensions <= self.native_dimensions:
+            raise ValueError(f"dimensions must be between 1 and {self.native_dimensions}, got {dimensions}")
+        self.model = model
+        self.dimensions = dimensions
+
+    @property
+    def tag(self) -> str:
+        """Identifier stored with every embedding produced by this provider"""
+        if self.dimensions != self.native_dimensions:
+            return f"{self.name}:{self.model}@{self.dimensions}"
+        return f"{self.name}:{self.model}"
+
+    @abstractmethod
+    def embed(self, text: str) -> List[float]:
+        """Embed a single text"""
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts; providers with a batch API should override this"""
+        return [self.embed(text) for text in texts]
+
+
+# Models whose full output is wider than NATIVE_DIMENSIONS
+_OPENAI_NATIVE_DIMENSIONS = {"text-embedding-3-large": 3072}
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI embeddings API (text-embedding-3-small by default)"""
+
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "text-embedding-3-small",
+                 timeout_s: Optional[float] = None, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.native_dimensions = _OPENAI_NATIVE_DIMENSIONS.get(model, NATIVE_DIMENSIONS)
+        super().__init__(model=model, dimensions=dimensions)
+        self._api_key = api_key
+        self._timeout_s = timeout_s
+        self._client = None
+
+    @property
+    def client(self):
+        # Created lazily so importing the service layer never requires credentials
+        if self._client is None:
+            from openai import OpenAI
+            # Retries and deadlines are handled by LLMClient (hedging + circuit breaker)
+            self._client = OpenAI(api_key=self._api_key, timeout=self._timeout_s, max_retries=0)
+        return self._client
+
+    def _create(self, input):
+        # Reduced dimensions are shortened server-side, which also shrinks the response payload
+        if self.dimensions != self.native_dimensions:
+            return self.client.embeddings.create(input=input, model=self.model, dimensions=self.dimensions)
+        return self.client.embeddings.create(input=input, model=self.model)
+
+    def embed(self, text: str) -> List[float]:
+        response = self._create(text)
+        return response.data[0].embedding
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        response = self._create(texts)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Local CPU embedder using signed feature hashing.
+
+    Word unigrams, word bigrams and character trigrams are hashed into a fixed
+    number of buckets with a sign bit, weighted sublinearly and L2-normalized.
+    Reduced dimensions keep a prefix of the full-width vector, so stored
+    vectors can be shortened in place the same way as OpenAI ones.
+    Paraphrases that share vocabulary score high cosine similarity, the output
+    is fully deterministic across processes and no network or model download
+    is needed, which makes it suitable for benchmarks and degraded mode.
+    """
+
+    name = "local"
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        super().__init__(model=f"feature-hash-v1-{self.native_dimensions}", dimensions=dimensions)
+
+    @staticmethod
+    def _features(text: str) -> List[str]:
+        tokens = _TOKEN_RE.findall(text.lower())
+        features = [f"w:{token}" for token in tokens]
+        features.extend(f"b:{a}_{b}" for a, b in zip(tokens, tokens[1:]))
+        for token in tokens:
+            padded = f"#{token}#"
+            features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, text: str) -> List[float]:
+        counts = {}
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "big")
+            bucket = value % self.native_dimensions
+            sign = 1.0 if (value >> 63) & 1 else -1.0
+            counts[bucket] = counts.get(bucket, 0.0) + sign
+
+        vector = [0.0] * self.native_dimensions
+        for bucket, count in counts.items():
+            # Sublinear weighting keeps repeated tokens from dominating
+            vector[bucket] = math.copysign(1.0 + math.log(abs(count)), count) if count else 0.0
+
+        return truncate_embedding(vector, self.dimensions)
+
+
+def create_provider(name: Optional[str], api_key: Optional[str] = None,
+                    dimensions: int = EMBEDDING_DIMENSIONS, model: Optional[str] = None) -> Optional[EmbeddingProvider]:
+    """
+    Build a provider from its config name.
+
+    Args:
+        name: "openai", "local", or empty/None/"none" for no provider
+        api_key: API key for remote providers. If None, the environment is used.
+        dimensions: Output vector width (defaults to EMBEDDING_DIMENSIONS)
+        model: Remote model name (defaults to OPENAI_EMBEDDING_MODEL); ignored by "local"
+
+    Returns:
+        The provider instance, or None when no provider is configured
+
+    Raises:
+        ValueError: If the provider name is unknown
+    """
+    if not name or name.lower() == "none":
+        return None
+    name = name.lower()
+    if name == "openai":
+        return OpenAIEmbeddingProvider(
+            api_key=api_key,
+            model=model or os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small"),
+            timeout_s=float(os.getenv("EMBEDDING_TIMEOUT_S", "2.0")),
+            dimensions=dimensions,
+        )
+    if name == "local":
+        return HashingEmbeddingProvider(dimensions=dimensions)
+    raise ValueError(f"Unknown embedding provider: {name}")
@@ -1,8 +1,8 @@
 """
 Embeddings Service - Handles text embedding operations
 """
-from typing import List
-from .llm_client import llm_client
+from typing import List, Optional, Tuple
+from .llm_client import Embedding, llm_client
 
 
 def embed_question(text: str) -> List[float]:
@@ -16,9 +16,32 @@ def embed_question(text: str) -> List[float]:
         text: The text/question to embed
         
     Returns:
-        List of floats representing the embedding vector
+        List of floats representing the embedding vector. The returned list is an
+        Embedding whose `model_tag` must be stored (or matched) alongside the vector
+        so results from different providers are never compared.
         
     Raises:
         Exception: If embedding generation fails
     """
-    return llm_client.get_embedding(text) 
\ No newline at end of file
+    return llm_client.get_embedding(text)
+
+
+def embed_question_fallback(text: str) -> Optional[Embedding]:
+    """Embed with the degraded-mode provider only, or None if none is configured"""
+    return llm_client.embed_fallback(text)
+
+
+def embed_questions(texts: List[str]) -> List[Embedding]:
+    """Embed many questions in one provider request (see `embed_question`)"""
+    return llm_client.embed_batch(texts)
+
+
+def embed_questions_fallback(texts: List[str]) -> List[Embedding]:
+    """Batch `embed_question_fallback`; empty if no fallback provider is configured"""
+    return llm_client.embed_fallback_batch(texts)
+
+
+def embedding_tags() -> Tuple[str, Optional[str]]:
+    """Tags of the configured primary and fallback providers (fallback is None if not configured)"""
+    fallback = llm_client.fallback_provider
+    return llm_client.provider.tag, fallback.tag if fallback is not None else None
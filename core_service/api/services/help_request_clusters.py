@@ -0,0 +1,193 @@
+"""
+Help Request Clusters - group pending questions so one answer can resolve many
+
+Pending questions are embedded (cached per help request, since question text
+never changes) and grouped per location by average-linkage agglomerative
+clustering over the cosine similarity matrix: the two most similar clusters
+are merged until no pair is at least HELP_REQUEST_CLUSTER_THRESHOLD similar
+on average. Vectors from different providers are never compared.
+
+`batch_resolve` then answers a cluster in one transaction: one supervisor
+response per request, one knowledge base entry and one customer followup per
+request.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core_service.database import crud
+from core_service.database.session import primary_reads
+from .communication import customer_notification_followup
+from .embeddings import embed_questions
+from .knowledge_base import knowledge_base_payload
+from .knowledge_base_bulk import _embed_in_batches
+
+logger = logging.getLogger("services.help_request_clusters")
+
+HELP_REQUEST_CLUSTER_THRESHOLD = float(os.getenv("HELP_REQUEST_CLUSTER_THRESHOLD", "0.85"))
+# Newest pending requests considered per call (the similarity matrix is n x n)
+HELP_REQUEST_CLUSTER_MAX = int(os.getenv("HELP_REQUEST_CLUSTER_MAX", "500"))
+HELP_REQUEST_EMBEDDING_CACHE_SIZE = 5000
+
+_cache_lock = threading.Lock()
+# help request id -> Embedding
+_embeddings: "OrderedDict[Any, Any]" = OrderedDict()
+
+
+def cluster_vectors(vectors: np.ndarray, threshold: float) -> List[List[int]]:
+    """
+    Average-linkage agglomerative clustering with a cosine similarity stopping threshold.
+
+    Args:
+        vectors: (n, d) matrix, one row per item
+        threshold: Minimum average pairwise similarity between two clusters to merge them
+
+    Returns:
+        Clusters as lists of row indices, largest first (ties keep input order)
+    """
+    n = len(vectors)
+    if n == 0:
+        return []
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms == 0, 1, norms)
+    # sim[i, j] = average similarity between clusters i and j (Lance-Williams update on merge)
+    sim = unit @ unit.T
+    np.fill_diagonal(sim, -np.inf)
+    sizes = np.ones(n)
+    members: Dict[int, List[int]] = {i: [i] for i in range(n)}
+
+    while len(members) > 1:
+        i, j = np.unravel_index(np.argmax(sim), sim.shape)
+        if sim[i, j] < threshold:
+            break
+        i, j = min(i, j), max(i, j)
+        merged = (sizes[i] * sim[i] + sizes[j] * sim[j]) / (sizes[i] + sizes[j])
+        sim[i, :] = merged
+        sim[:, i] = merged
+        sim[i, i] = -np.inf
+        sim[j, :] = -np.inf
+        sim[:, j] = -np.inf
+        sizes[i] += sizes[j]
+        members[i].extend(members.pop(j))
+
+    return sorted((sorted(m) for m in members.values()), key=lambda m: (-len(m), m[0]))
+
+
+def _embed_help_requests(help_requests: Sequence[Any]) -> List[Any]:
+    """Embedding per help request, embedding only those not cached yet (in provider batches)"""
+    with _cache_lock:
+        cached = {hr.id: _embeddings.get(hr.id) for hr in help_requests}
+    missing = [hr for hr in help_requests if cached[hr.id] is None]
+    if missing:
+        for hr, embedding in zip(missing, _embed_in_batches([hr.question_text for hr in missing], embed_questions)):
+            cached[hr.id] = embedding
+        with _cache_lock:
+            for hr in missing:
+                _embeddings[hr.id] = cached[hr.id]
+            while len(_embeddings) > HELP_REQUEST_EMBEDDING_CACHE_SIZE:
+                _embeddings.popitem(last=False)
+    with _cache_lock:
+        for hr in help_requests:
+            if hr.id in _embeddings:
+                _embeddings.move_to_end(hr.id)
+    return [cached[hr.id] for hr in help_requests]
+
+
+def cluster_pending_help_requests(location_id: Optional[str] = None,
+                                  threshold: float = HELP_REQUEST_CLUSTER_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Group pending (unexpired) help requests by question similarity, within each location.
+
+    Returns:
+        Clusters, largest first: location_id, size, representative_question (the oldest
+        request's question) and help_requests (oldest first)
+    """
+    pending = crud.list_help_requests(status="pending", location_id=location_id)[:HELP_REQUEST_CLUSTER_MAX]
+    if not pending:
+        return []
+    embeddings = _embed_help_requests(pending)
+
+    groups: Dict[tuple, List[int]] = {}
+    for index, (hr, embedding) in enumerate(zip(pending, embeddings)):
+        groups.setdefault((hr.location_id, embedding.model_tag), []).append(index)
+
+    clusters = []
+    for (group_location, _), indices in groups.items():
+        matrix = np.asarray([embeddings[i] for i in indices], dtype=np.float32)
+        for cluster in cluster_vectors(matrix, threshold):
+            members = sorted((pending[indices[i]] for i in cluster), key=lambda hr: (hr.created_at, str(hr.id)))
+            clusters.append({
+                "location_id": group_location,
+                "size": len(members),
+                "representative_question": members[0].question_text,
+                "help_requests": members,
+            })
+    clusters.sort(key=lambda c: (-c["size"], c["help_requests"][0].created_at))
+    return clusters
+
+
+def batch_resolve(
+    request_ids: Sequence[Any],
+    answer_text: str,
+    responder_id: Optional[str],
+    notification_logger: logging.Logger,
+    question_text: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Resolve many help requests with one answer in a single transaction.
+
+    Args:
+        request_ids: Help requests to resolve (all of one location)
+        answer_text: The supervisor's answer
+        responder_id: Who answered
+        notification_logger: Logger for the simulated customer texts
+        question_text: Question stored in the KB entry; defaults to the oldest request's question
+
+    Returns:
+        dict: resolved (HelpRequest list), skipped_ids (already resolved/cancelled) and
+        knowledge_base_entry (None if every request was skipped)
+
+    Raises:
+        ValueError: If a request does not exist or the requests span several locations
+    """
+    request_ids = list(dict.fromkeys(request_ids))
+    # From the primary: this is a read-modify-write of the same rows
+    with primary_reads():
+        help_requests = crud.get_help_requests_with_customers(request_ids)
+    found = {hr.id for hr in help_requests}
+    unknown = [str(i) for i in request_ids if i not in found]
+    if unknown:
+        raise ValueError(f"Help requests not found: {', '.join(unknown)}")
+    locations = {hr.location_id for hr in help_requests}
+    if len(locations) > 1:
+        raise ValueError("Help requests of different locations cannot share an answer")
+
+    help_requests.sort(key=lambda hr: (hr.created_at or datetime.min.replace(tzinfo=timezone.utc), str(hr.id)))
+    pending = [hr for hr in help_requests if hr.status == "pending"]
+    skipped_ids = [hr.id for hr in help_requests if hr.status != "pending"]
+    if not pending:
+        return {"resolved": [], "skipped_ids": skipped_ids, "knowledge_base_entry": None}
+
+    question = question_text or pending[0].question_text
+    # Embed before the transaction so row locks are not held across a provider call
+    kb_entry = knowledge_base_payload(question, answer_text, pending[0].id, location_id=pending[0].location_id)
+    followups = [
+        customer_notification_followup(hr.id, hr, hr.customer, answer_text, responder_id) for hr in pending
+    ]
+
+    resolved, kb_row = crud.batch_resolve_help_requests(
+        [hr.id for hr in pending], answer_text, responder_id, kb_entry, followups
+    )
+    resolved_ids = {hr.id for hr in resolved}
+    skipped_ids += [hr.id for hr in pending if hr.id not in resolved_ids]
+
+    notification_logger.info(
+        f"Resolved {len(resolved)} help requests with one answer by {responder_id} "
+        f"(KB entry {kb_row.id if kb_row else 'not created'}); queued {len(resolved)} customer texts"
+    )
+    return {"resolved": resolved, "skipped_ids": skipped_ids, "knowledge_base_entry": kb_row}
@@ -1,10 +1,20 @@
 from core_service.database import crud
+from core_service.database.models import DEFAULT_LOCATION_ID
+from core_service.database.session import primary_reads
 from .knowledge_base import create_knowledge_base_from_text
 from .communication import create_supervisor_notification, create_customer_notification
 from datetime import datetime, timezone, timedelta
+from typing import Iterator, List, Optional
+import json
+import os
 import uuid
 import logging
 
+# NDJSON export lines are flushed to the client in chunks of about this size
+EXPORT_CHUNK_BYTES = 64 * 1024
+# A supervisor's claim on a help request lapses unless renewed (heartbeat) within this many seconds
+HELP_REQUEST_CLAIM_LEASE_S = float(os.getenv("HELP_REQUEST_CLAIM_LEASE_S", "120"))
+
 def resolve_hr_and_create_kb(
     request_id: str, 
     answer_text: str, 
@@ -13,13 +23,16 @@ def resolve_hr_and_create_kb(
 ):
     """
     Resolve help request with proper flow:
-    1. Create supervisor response record
+    1. Create supervisor response record (raises crud.HelpRequestConflictError if the
+       request was already answered or is claimed by another supervisor, before any
+       embedding is paid for)
     2. Use response data to create KB entry
     3. Update help request status to resolved
     4. Notify customer of resolution
     """
-    # 1) Fetch help request to get question text
-    help_request_with_answer = crud.get_help_request_with_answer(request_id)
+    # 1) Fetch help request to get question text (from the primary: a replica may not have it yet)
+    with primary_reads():
+        help_request_with_answer = crud.get_help_request_with_answer(request_id)
     if not help_request_with_answer or not help_request_with_answer.get("help_request"):
         return None, None
 
@@ -41,6 +54,7 @@ def resolve_hr_and_create_kb(
         question=question_text,
         answer=supervisor_response.answer_text,  # Use data from supervisor response
         source_help_request_id=request_id,
+        location_id=help_request.location_id,  # Learned answers only serve the location that was asked
     )
 
     # 4) Update help request status to resolved
@@ -63,7 +77,8 @@ def resolve_hr_and_create_kb(
     return resolved, supervisor_response
 
 
-def create_help_request_for_escalation(question_text: str, customer_id: str = None, call_id: str = None):
+def create_help_request_for_escalation(question_text: str, customer_id: str = None, call_id: str = None,
+                                       location_id: str = DEFAULT_LOCATION_ID):
     """
     Create a help request for escalation when knowledge base search fails.
     
@@ -71,6 +86,7 @@ def create_help_request_for_escalation(question_text: str, customer_id: str = No
         question_text: The customer's question that needs escalation
         customer_id: Optional customer ID (defaults to a placeholder if not available)
         call_id: Optional call ID for the current call
+        location_id: Location the call is for
     
     Returns:
         Created help request object or None if creation fails
@@ -85,6 +101,7 @@ def create_help_request_for_escalation(question_text: str, customer_id: str = No
             return None
     
     help_request_data = {
+        "location_id": location_id,
         "customer_id": customer_id,
         "question_text": question_text,
         "status": "pending"
@@ -110,3 +127,38 @@ def create_help_request_for_escalation(question_text: str, customer_id: str = No
     
     return help_request
 
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def export_help_request_history(
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    statuses: Optional[List[str]] = None,
+    location_id: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Stream help request history as NDJSON (one request per line, with its answer and followup).
+
+    Rows are read through a server-side cursor and written out in ~64KB chunks,
+    so memory use stays constant regardless of the date range.
+    """
+    chunk: List[str] = []
+    size = 0
+    for row in crud.iter_help_request_history(
+        created_from=created_from, created_to=created_to, statuses=statuses, location_id=location_id
+    ):
+        line = json.dumps(row, default=_json_default) + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
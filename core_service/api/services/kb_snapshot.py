@@ -0,0 +1,319 @@
+"""
+KB Snapshot - an immutable, memory-mapped copy of the knowledge base for agent workers
+
+LiveKit runs every job in its own process, so a per-process copy of the
+embedding matrix would be loaded (and held) once per process. Instead the
+publisher job (core_service/jobs/publish_kb_snapshot.py) writes the knowledge
+base to a versioned file whenever its table version changes, and every agent
+process maps the same file read-only: the page cache holds one copy no matter
+how many workers run, and a new process can search as soon as it has mapped it.
+
+File layout (little-endian), kb-<version>.snap in KB_SNAPSHOT_DIR:
+
+    magic "KBSNAP01" | header length (u32) | JSON header
+    padding to 64 bytes, then (each section 64-byte aligned):
+    vectors   float32[rows, dim]  unit-normalized, so cosine similarity is a dot product
+    valid_to  float64[rows]       epoch seconds, inf for entries that do not expire
+    offsets   uint64[rows + 1]    into the record blob
+    blob      one JSON record (id, question_text_example, answer_text) per row
+
+Rows are grouped by (location_id, embedding_model); the header maps each group
+to its row range. The CURRENT file names the published snapshot and is
+replaced atomically; readers check it every KB_SNAPSHOT_CHECK_S and swap to
+the new mapping, while searches already running finish on the old one.
+
+The publisher touches CURRENT whenever it finds the published snapshot still
+current. A snapshot neither written nor confirmed within KB_SNAPSHOT_MAX_AGE_S
+(the publisher stopped or cannot reach the database) is not searched, so
+agents fall back to Postgres instead of answering from an old knowledge base.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from core_service.database import crud
+from core_service.database.session import primary_reads
+
+logger = logging.getLogger("services.kb_snapshot")
+
+# Unset: no snapshot is published or read, agents search Postgres
+KB_SNAPSHOT_DIR = os.getenv("KB_SNAPSHOT_DIR", "")
+KB_SNAPSHOT_CHECK_S = float(os.getenv("KB_SNAPSHOT_CHECK_S", "1"))
+# A snapshot the publisher has not written or confirmed for this long is ignored; 0 never expires it
+KB_SNAPSHOT_MAX_AGE_S = float(os.getenv("KB_SNAPSHOT_MAX_AGE_S", "60"))
+# Snapshots kept on disk (older ones are deleted; processes still mapping them are unaffected)
+KB_SNAPSHOT_KEEP = 3
+
+MAGIC = b"KBSNAP01"
+_PREFIX = struct.Struct("<8sI")
+ALIGN = 64
+POINTER_FILE = "CURRENT"
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _snapshot_name(version: int) -> str:
+    return f"kb-{version:012d}.snap"
+
+
+def write_snapshot(directory: str, version: int, rows: Iterable[Dict[str, Any]]) -> str:
+    """
+    Write a snapshot file (without publishing it).
+
+    Args:
+        directory: Snapshot directory
+        version: knowledge_base table version the rows were read at
+        rows: Entries with id, location_id, question_text_example, answer_text, valid_to,
+            embedding and embedding_model, grouped by (location_id, embedding_model)
+
+    Returns:
+        Path of the written file
+    """
+    vectors, valid_to, records, groups = [], [], [], []
+    for row in rows:
+        group = [row["location_id"], row["embedding_model"]]
+        if not groups or groups[-1][:2] != group:
+            groups.append(group + [len(records), len(records)])
+        groups[-1][3] += 1
+        embedding = row["embedding"]
+        vectors.append(np.asarray(embedding.to_list() if hasattr(embedding, "to_list") else embedding, dtype=np.float32))
+        valid_to.append(row["valid_to"].timestamp() if row["valid_to"] else np.inf)
+        records.append(json.dumps({
+            "id": str(row["id"]),
+            "question_text_example": row["question_text_example"],
+            "answer_text": row["answer_text"],
+        }).encode("utf-8"))
+
+    count = len(records)
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = (matrix / np.where(norms == 0, 1, norms)).astype(np.float32)
+    offsets = np.zeros(count + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(r) for r in records], dtype=np.uint64)
+
+    # Section offsets are relative to the end of the (padded) header
+    sections = {}
+    position = 0
+    for name, data in (("vectors", matrix), ("valid_to", np.asarray(valid_to, dtype=np.float64)), ("offsets", offsets)):
+        sections[name] = position
+        position = _align(position + data.nbytes)
+    sections["blob"] = position
+    header = json.dumps({
+        "version": version,
+        "rows": count,
+        "dim": matrix.shape[1],
+        "created_at": time.time(),
+        "groups": groups,
+        "sections": sections,
+    }).encode("utf-8")
+    data_start = _align(_PREFIX.size + len(header))
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, _snapshot_name(version))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, len(header)))
+        f.write(header)
+        for name, data in (("vectors", matrix), ("valid_to", np.asarray(valid_to, dtype=np.float64)),
+                           ("offsets", offsets)):
+            f.seek(data_start + sections[name])
+            f.write(data.tobytes())
+        f.seek(data_start + sections["blob"])
+        f.write(b"".join(records))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+
+def _current_name(directory: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, POINTER_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _point_to(directory: str, name: str) -> None:
+    pointer = os.path.join(directory, POINTER_FILE)
+    tmp_path = f"{pointer}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(name)
+    os.replace(tmp_path, pointer)
+
+
+def _remove_old(directory: str, keep: int) -> None:
+    current = _current_name(directory)
+    snapshots = sorted(
+        (n for n in os.listdir(directory) if n.startswith("kb-") and n.endswith(".snap") and n != current),
+        key=lambda n: os.path.getmtime(os.path.join(directory, n)),
+    )
+    for name in snapshots[:max(len(snapshots) - (keep - 1), 0)]:
+        os.remove(os.path.join(directory, name))
+
+
+def publish_snapshot(directory: str = KB_SNAPSHOT_DIR, keep: int = KB_SNAPSHOT_KEEP) -> Optional[str]:
+    """
+    Write and publish a snapshot unless the published one is already current.
+
+    Returns:
+        Path of the new snapshot, or None if nothing changed
+    """
+    # From the primary: a lagging replica would publish (and label) an old knowledge base
+    with primary_reads():
+        versions = crud.get_table_versions(["knowledge_base"])
+        if versions is None:
+            # Without change counters (db/init/006_table_versions.sql) every call republishes
+            version = int(time.time() * 1000)
+        else:
+            version = versions.get("knowledge_base", 0)
+            if _current_name(directory) == _snapshot_name(version):
+                # Confirm it for readers checking KB_SNAPSHOT_MAX_AGE_S
+                os.utime(os.path.join(directory, POINTER_FILE))
+                return None
+        path = write_snapshot(directory, version, crud.iter_kb_snapshot_rows())
+    _point_to(directory, os.path.basename(path))
+    _remove_old(directory, keep)
+    return path
+
+
+class KBSnapshot:
+    """A read-only mapping of one snapshot file"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_len = _PREFIX.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a KB snapshot")
+        header = json.loads(self._mmap[_PREFIX.size:_PREFIX.size + header_len])
+        data_start = _align(_PREFIX.size + header_len)
+        sections = header["sections"]
+        self.version = header["version"]
+        self.created_at = header["created_at"]
+        self.rows = header["rows"]
+        self.dim = header["dim"]
+        self.groups = {(location, model): (start, end) for location, model, start, end in header["groups"]}
+        # Zero-copy views: pages are shared with every other process mapping the file
+        self.vectors = np.frombuffer(
+            self._mmap, dtype=np.float32, count=self.rows * self.dim, offset=data_start + sections["vectors"]
+        ).reshape(self.rows, self.dim)
+        self.valid_to = np.frombuffer(self._mmap, dtype=np.float64, count=self.rows,
+                                      offset=data_start + sections["valid_to"])
+        self._offsets = np.frombuffer(self._mmap, dtype=np.uint64, count=self.rows + 1,
+                                      offset=data_start + sections["offsets"])
+        self._blob_start = data_start + sections["blob"]
+
+    def record(self, row: int) -> Dict[str, Any]:
+        start = self._blob_start + int(self._offsets[row])
+        end = self._blob_start + int(self._offsets[row + 1])
+        record = json.loads(self._mmap[start:end])
+        record["id"] = uuid.UUID(record["id"])
+        return record
+
+    def search(self, query_vec: Sequence[float], k: int, embedding_model: Optional[str],
+               location_id: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Exact cosine KNN within a location's entries embedded by embedding_model.
+
+        Returns:
+            Rows like crud.search_kb_by_embedding (best first), or None if the snapshot
+            has no entries for that location and model (the caller should ask Postgres)
+        """
+        span = self.groups.get((location_id, embedding_model))
+        if span is None or len(query_vec) != self.dim:
+            return None
+        start, end = span
+        query = np.asarray(query_vec, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        sims = self.vectors[start:end] @ (query / (norm or 1))
+        sims = np.where(self.valid_to[start:end] > time.time(), sims, -np.inf)
+        k = min(k, end - start)
+        if k <= 0:
+            return []
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return [{**self.record(start + int(i)), "sim": float(sims[i])} for i in top if np.isfinite(sims[i])]
+
+
+class SnapshotReader:
+    """Follows the published snapshot of a directory, swapping mappings when it changes"""
+
+    def __init__(self, directory: str, check_s: float = KB_SNAPSHOT_CHECK_S,
+                 max_age_s: float = KB_SNAPSHOT_MAX_AGE_S):
+        self.directory = directory
+        self.check_s = check_s
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        self._snapshot: Optional[KBSnapshot] = None
+        self._name: Optional[str] = None
+        self._checked_at = float("-inf")
+        # Epoch seconds the mapped snapshot was last written or confirmed by the publisher
+        self._confirmed_at = float("-inf")
+        self._stale = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def _refresh(self) -> None:
+        name = _current_name(self.directory)
+        if name is None:
+            return
+        if name != self._name:
+            try:
+                snapshot = KBSnapshot(os.path.join(self.directory, name))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not map KB snapshot {name}: {e}")
+                return
+            # A plain reference swap: searches holding the old snapshot keep its mapping alive
+            self._snapshot, self._name = snapshot, name
+            self._confirmed_at = snapshot.created_at
+            logger.info(f"Mapped KB snapshot {name} ({snapshot.rows} entries)")
+        try:
+            self._confirmed_at = max(self._confirmed_at, os.path.getmtime(os.path.join(self.directory, POINTER_FILE)))
+        except OSError:
+            pass
+
+    def current(self) -> Optional[KBSnapshot]:
+        """The published snapshot, or None if there is none (yet) or it is older than max_age_s"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_s:
+            with self._lock:
+                if now - self._checked_at >= self.check_s:
+                    self._checked_at = now
+                    self._refresh()
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        stale = self.max_age_s > 0 and time.time() - self._confirmed_at > self.max_age_s
+        if stale != self._stale:
+            self._stale = stale
+            if stale:
+                logger.warning(f"KB snapshot {self._name} not confirmed for over {self.max_age_s:g}s; searching Postgres")
+            else:
+                logger.info(f"KB snapshot {self._name} is current again")
+        return None if stale else snapshot
+
+    def search(self, query_vec: Sequence[float], k: int, embedding_model: Optional[str],
+               location_id: str) -> Optional[List[Dict[str, Any]]]:
+        """KBSnapshot.search on the current snapshot, or None without a current one"""
+        snapshot = self.current()
+        if snapshot is None:
+            return None
+        return snapshot.search(query_vec, k, embedding_model, location_id)
+
+
+kb_snapshot = SnapshotReader(KB_SNAPSHOT_DIR)
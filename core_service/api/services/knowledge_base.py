@@ -1,7 +1,32 @@
-from ..services.embeddings import embed_question
+import logging
+import os
+import re
+from ..services.embeddings import embed_question, embed_question_fallback
+from ..services.kb_snapshot import kb_snapshot
+from ..services.llm_client import EmbeddingUnavailableError
+from ..services.reranker import reranker
 from core_service.database import crud
+from core_service.database.models import DEFAULT_LOCATION_ID
+from core_service.observability.metrics import KB_SEARCH_TOP_SIMILARITY
+from core_service.observability.tracing import stage
 from typing import List, Sequence, Union, Optional, Dict, Any
 
+logger = logging.getLogger("services.knowledge_base")
+
+# Retrieval mode: "vector" (pgvector KNN), "hybrid" (vector + full-text fused with RRF)
+# or "lexical" (full-text/trigram only, no embedding call)
+SEARCH_MODES = ("vector", "hybrid", "lexical")
+KB_SEARCH_MODE = os.getenv("KB_SEARCH_MODE", "vector")
+# Trigram similarity cutoff for lexical results (not comparable with cosine similarity)
+KB_LEXICAL_MIN_SIM = float(os.getenv("KB_LEXICAL_MIN_SIM", "0.5"))
+
+_KEY_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_question_key(question: str) -> str:
+    """Dedup key for a question; must match the backfill in db/init/004_kb_normalized_key.sql"""
+    return _KEY_RE.sub(" ", question.lower()).strip()
+
 
 def _normalize_embedding_vector(vector: Union[Sequence[float], Sequence[int], Sequence[Union[float, int]]]) -> List[float]:
     """Ensure the embedding is a 1D list[float].
@@ -26,15 +51,49 @@ def _normalize_embedding_vector(vector: Union[Sequence[float], Sequence[int], Se
     return normalized
 
 
-def create_knowledge_base_from_text(question: str, answer: str, source_help_request_id=None):
-    vector_embedding = _normalize_embedding_vector(embed_question(question))
-    payload = {
+def _embedding_fields(question: str) -> Dict[str, Any]:
+    """Embed a question with the primary provider (and the fallback, if configured) as KB columns"""
+    embedding = embed_question(question)
+    tag = getattr(embedding, "model_tag", None)
+    vector_column, tag_column = crud.embedding_columns_for_tag(tag)
+    if vector_column == "embedding":
+        fields: Dict[str, Any] = {
+            "embedding": _normalize_embedding_vector(embedding),
+            "embedding_model": tag,
+            # Invalidate any shadow vector for the old text; the re-embed job's catch-up refills it
+            "embedding_next": None,
+            "embedding_next_model": None,
+        }
+    else:
+        # This process still runs the model of the shadow slot (not restarted after a cutover).
+        # Write that slot; the live slot needs a value but must not match live-model searches,
+        # so it gets the same vector untagged until the re-embed job's repair run replaces it.
+        vector = _normalize_embedding_vector(embedding)
+        fields = {vector_column: vector, tag_column: tag, "embedding": vector, "embedding_model": None}
+    # Keep degraded-mode vectors current so the fallback provider can answer during outages
+    fallback = embedding if getattr(embedding, "is_fallback", False) else embed_question_fallback(question)
+    if fallback is not None:
+        fields["fallback_embedding"] = _normalize_embedding_vector(fallback)
+        fields["fallback_embedding_model"] = fallback.model_tag
+    return fields
+
+
+def knowledge_base_payload(question: str, answer: str, source_help_request_id=None,
+                           location_id: str = DEFAULT_LOCATION_ID, normalized_key: Optional[str] = None) -> Dict[str, Any]:
+    """Column values of a new KB entry: embeddings and the import dedup key included"""
+    return {
+        "location_id": location_id,
         "question_text_example": question,
         "answer_text": answer,
         "source_help_request_id": source_help_request_id,
-        "embedding": vector_embedding,
+        "normalized_key": normalized_key or normalize_question_key(question) or None,
+        **_embedding_fields(question),
     }
-    return crud.create_kb(payload)
+
+
+def create_knowledge_base_from_text(question: str, answer: str, source_help_request_id=None,
+                                    location_id: str = DEFAULT_LOCATION_ID, normalized_key: Optional[str] = None):
+    return crud.create_kb(knowledge_base_payload(question, answer, source_help_request_id, location_id, normalized_key))
 
 
 def update_knowledge_base_from_text(entry_id: str, update_data: Dict[str, Any]) -> Optional[Any]:
@@ -63,14 +122,100 @@ def update_knowledge_base_from_text(entry_id: str, update_data: Dict[str, Any])
     if "question_text_example" in processed_update_data:
         new_question = processed_update_data["question_text_example"]
         if new_question:  # Only if the new question is not empty
-            vector_embedding = _normalize_embedding_vector(embed_question(new_question))
-            processed_update_data["embedding"] = vector_embedding
+            processed_update_data.update(_embedding_fields(new_question))
+            # Imports deduplicate on the key, so it follows the question
+            processed_update_data.setdefault("normalized_key", normalize_question_key(new_question) or None)
     
     # Update the knowledge base entry with all data (including embedding if applicable)
     return crud.update_kb(entry_id, processed_update_data)
 
 
-def search_knowledge_base_by_question(question: str, k: int = 5, min_sim: float = 0.70):
-    q_vec = _normalize_embedding_vector(embed_question(question))
-    rows = crud.search_kb_by_embedding(q_vec, k=k)
-    return [r for r in rows if r["sim"] >= min_sim]
\ No newline at end of file
+def _search_lexical(question: str, k: int, location_id: str) -> List[Dict[str, Any]]:
+    """Lexical-only search; scores are trigram similarities, so KB_LEXICAL_MIN_SIM applies"""
+    with stage("lexical_search") as span:
+        rows = crud.search_kb_lexical(question, k=k, location_id=location_id)
+        span.set_attribute("candidates", len(rows))
+    return [r for r in rows if r["sim"] >= KB_LEXICAL_MIN_SIM]
+
+
+def _rerank_gray_zone(question: str, rows: List[Dict[str, Any]], k: int) -> Optional[List[Dict[str, Any]]]:
+    """Cross-encoder decision for a borderline top match, or None to keep the similarity cutoff"""
+    with stage("rerank") as span:
+        ranked = reranker.rerank(question, rows)
+        span.set_attribute("candidates", len(rows))
+        span.set_attribute("budget_exceeded", ranked is None)
+    return None if ranked is None else ranked[:k]
+
+
+def search_knowledge_base_by_question(question: str, k: int = 5, min_sim: float = 0.70, mode: Optional[str] = None,
+                                      location_id: str = DEFAULT_LOCATION_ID):
+    """
+    Find KB entries answering a question.
+
+    Args:
+        question: The customer's question
+        k: Maximum number of entries to return
+        min_sim: Cosine similarity cutoff for vector/hybrid results
+        mode: "vector", "hybrid" or "lexical"; defaults to KB_SEARCH_MODE
+        location_id: Location whose knowledge base is searched
+
+    Returns:
+        Rows (best first) with id, question_text_example, answer_text and sim.
+        If no embedding can be produced, falls back to lexical search.
+        When the top similarity is in the rerank gray zone, the reranker's
+        choice replaces the cutoff (rows then also carry rerank_score).
+    """
+    mode = mode or KB_SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown KB search mode: {mode}")
+    if mode == "lexical":
+        return _search_lexical(question, k, location_id)
+
+    embedding = None
+    with stage("embedding") as span:
+        try:
+            embedding = embed_question(question)
+        except EmbeddingUnavailableError as e:
+            # Degrade to lexical search instead of failing the caller's turn
+            logger.warning(f"Embedding unavailable, using lexical KB search: {e}")
+            span.set_attribute("degraded", True)
+    if embedding is None:
+        return _search_lexical(question, k, location_id)
+
+    q_vec = _normalize_embedding_vector(embedding)
+    model_tag = getattr(embedding, "model_tag", None)
+    use_fallback = getattr(embedding, "is_fallback", False)
+    # Retrieve enough candidates for a gray-zone rerank up front rather than with a second query
+    candidates = max(k, reranker.candidates) if reranker.enabled else k
+
+    if mode == "hybrid":
+        with stage("hybrid_search") as span:
+            # Fetch a few fused rows so a top row under the cutoff does not hide a passing one
+            rows = crud.search_kb_hybrid(
+                question, q_vec, k=max(candidates, 5), embedding_model=model_tag, use_fallback=use_fallback,
+                location_id=location_id,
+            )
+            span.set_attribute("candidates", len(rows))
+    else:
+        rows = None
+        if kb_snapshot.enabled and not use_fallback:
+            # Exact search over the shared memory-mapped snapshot; Postgres only when it cannot answer
+            with stage("snapshot_search") as span:
+                rows = kb_snapshot.search(q_vec, candidates, model_tag, location_id)
+                span.set_attribute("hit", rows is not None)
+        if rows is None:
+            with stage("vector_search") as span:
+                rows = crud.search_kb_by_embedding(
+                    q_vec, k=candidates, embedding_model=model_tag, use_fallback=use_fallback,
+                    location_id=location_id,
+                )
+                span.set_attribute("candidates", len(rows))
+
+    sims = [r["sim"] for r in rows if r["sim"] is not None]
+    if sims:
+        KB_SEARCH_TOP_SIMILARITY.observe(max(sims))
+        if reranker.in_gray_zone(max(sims)):
+            ranked = _rerank_gray_zone(question, rows, k)
+            if ranked is not None:
+                return ranked
+    return [r for r in rows if r["sim"] is not None and r["sim"] >= min_sim][:k]
@@ -0,0 +1,214 @@
+"""
+Knowledge Base Bulk Service - CSV/JSONL import and streaming export
+
+Imports embed questions in provider batches (KB_IMPORT_BATCH_SIZE texts per
+request, KB_IMPORT_CONCURRENCY requests in flight) and write all rows in one
+transaction, deduplicated on normalized_key. Exports can carry the stored
+embeddings; an import reuses them when they were produced by the configured
+provider, so one location's KB can seed another without re-embedding.
+"""
+import csv
+import io
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from core_service.database import crud
+from core_service.database.models import DEFAULT_LOCATION_ID
+from .embeddings import embed_questions, embed_questions_fallback, embedding_tags
+from .knowledge_base import _normalize_embedding_vector, normalize_question_key
+
+logger = logging.getLogger("services.knowledge_base_bulk")
+
+FORMATS = ("csv", "jsonl")
+CONFLICT_MODES = ("skip", "update")
+KB_IMPORT_BATCH_SIZE = int(os.getenv("KB_IMPORT_BATCH_SIZE", "100"))
+KB_IMPORT_CONCURRENCY = int(os.getenv("KB_IMPORT_CONCURRENCY", "4"))
+
+EXPORT_FIELDS = ("id", "question_text_example", "answer_text", "normalized_key", "valid_to", "created_at", "updated_at")
+EMBEDDING_FIELDS = ("embedding", "embedding_model", "fallback_embedding", "fallback_embedding_model")
+
+
+class KBImportError(ValueError):
+    """Raised for malformed import input; the message names the offending line"""
+
+
+def _parse_vector(value: Any) -> Optional[List[float]]:
+    """Vectors arrive as lists (JSONL) or JSON-encoded strings (CSV)"""
+    if value in (None, ""):
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    return _normalize_embedding_vector(value)
+
+
+def _parse_records(rows: Iterable[Dict[str, Any]], first_line: int) -> List[Dict[str, Any]]:
+    records = []
+    for line_number, row in enumerate(rows, start=first_line):
+        if row is None:
+            continue
+        question = (row.get("question_text_example") or "").strip()
+        answer = (row.get("answer_text") or "").strip()
+        if not question or not answer:
+            raise KBImportError(f"line {line_number}: question_text_example and answer_text are required")
+        try:
+            record = {
+                "question_text_example": question,
+                "answer_text": answer,
+                "normalized_key": (row.get("normalized_key") or "").strip() or normalize_question_key(question),
+                "embedding": _parse_vector(row.get("embedding")),
+                "embedding_model": row.get("embedding_model") or None,
+                "fallback_embedding": _parse_vector(row.get("fallback_embedding")),
+                "fallback_embedding_model": row.get("fallback_embedding_model") or None,
+            }
+        except ValueError as e:
+            raise KBImportError(f"line {line_number}: invalid embedding ({e})") from e
+        records.append(record)
+    return records
+
+
+def parse_import(lines: Iterable[str], fmt: str) -> List[Dict[str, Any]]:
+    """
+    Parse CSV (with a header row) or JSONL import lines into KB records.
+
+    Required fields: question_text_example, answer_text. Optional: normalized_key,
+    and the embedding fields written by `export_entries(include_embeddings=True)`.
+    Any other fields (id, timestamps) are ignored.
+
+    Raises:
+        KBImportError: If a row is malformed
+    """
+    if fmt == "csv":
+        return _parse_records(csv.DictReader(lines), first_line=2)
+    if fmt == "jsonl":
+        def objects():
+            for line_number, line in enumerate(lines, start=1):
+                if not line.strip():
+                    yield None
+                    continue
+                try:
+                    obj = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise KBImportError(f"line {line_number}: invalid JSON ({e.msg})") from e
+                if not isinstance(obj, dict):
+                    raise KBImportError(f"line {line_number}: expected a JSON object")
+                yield obj
+        return _parse_records(objects(), first_line=1)
+    raise KBImportError(f"Unsupported format: {fmt}")
+
+
+def _embed_in_batches(texts: List[str], embed_fn) -> List[Any]:
+    """Run embed_fn over batches of texts, with at most KB_IMPORT_CONCURRENCY batches in flight"""
+    batches = [texts[i:i + KB_IMPORT_BATCH_SIZE] for i in range(0, len(texts), KB_IMPORT_BATCH_SIZE)]
+    if len(batches) <= 1:
+        return [vector for batch in batches for vector in embed_fn(batch)]
+    with ThreadPoolExecutor(max_workers=max(1, KB_IMPORT_CONCURRENCY), thread_name_prefix="kb-import") as pool:
+        return [vector for result in pool.map(embed_fn, batches) for vector in result]
+
+
+def _attach_embeddings(records: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Fill embedding columns, reusing imported vectors that match the configured providers"""
+    primary_tag, fallback_tag = embedding_tags()
+    stats = {"embedded": 0, "reused_embeddings": 0}
+
+    missing = [r for r in records if not (r["embedding"] and r["embedding_model"] == primary_tag)]
+    stats["reused_embeddings"] = len(records) - len(missing)
+    for record, embedding in zip(missing, _embed_in_batches([r["question_text_example"] for r in missing], embed_questions)):
+        record["embedding"] = _normalize_embedding_vector(embedding)
+        record["embedding_model"] = embedding.model_tag
+        if embedding.is_fallback:
+            record["fallback_embedding"] = record["embedding"]
+            record["fallback_embedding_model"] = embedding.model_tag
+    stats["embedded"] = len(missing)
+
+    if fallback_tag is not None:
+        missing = [r for r in records if not (r["fallback_embedding"] and r["fallback_embedding_model"] == fallback_tag)]
+        texts = [r["question_text_example"] for r in missing]
+        for record, embedding in zip(missing, _embed_in_batches(texts, embed_questions_fallback)):
+            record["fallback_embedding"] = _normalize_embedding_vector(embedding)
+            record["fallback_embedding_model"] = embedding.model_tag
+    return stats
+
+
+def import_entries(records: List[Dict[str, Any]], on_conflict: str = "skip",
+                   location_id: str = DEFAULT_LOCATION_ID) -> Dict[str, int]:
+    """
+    Import parsed KB records (see `parse_import`) into a location's knowledge base.
+
+    Duplicate keys within the input keep the last occurrence. With on_conflict="skip",
+    keys that already exist are dropped before any embedding call is made; with
+    "update", existing entries get the imported question, answer and embeddings.
+
+    Returns:
+        dict: received, duplicates_in_file, skipped_existing, inserted, updated,
+        embedded and reused_embeddings counts
+    """
+    if on_conflict not in CONFLICT_MODES:
+        raise ValueError(f"on_conflict must be one of {CONFLICT_MODES}")
+
+    by_key: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        by_key[record["normalized_key"]] = record
+    stats = {"received": len(records), "duplicates_in_file": len(records) - len(by_key), "skipped_existing": 0}
+
+    if on_conflict == "skip":
+        existing = crud.get_existing_kb_keys(list(by_key), location_id=location_id)
+        stats["skipped_existing"] = len(existing)
+        for key in existing:
+            del by_key[key]
+
+    rows = list(by_key.values())
+    stats.update(_attach_embeddings(rows))
+    result = (
+        crud.bulk_upsert_kb(rows, update_existing=on_conflict == "update", location_id=location_id)
+        if rows else {"inserted": 0, "updated": 0, "skipped": 0}
+    )
+    # Keys created concurrently since the pre-check are skipped by ON CONFLICT
+    stats["skipped_existing"] += result["skipped"]
+    stats["inserted"] = result["inserted"]
+    stats["updated"] = result["updated"]
+    logger.info(f"KB import: {stats}")
+    return stats
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "tolist"):  # pgvector returns numpy arrays for vector columns
+        return value.tolist()
+    if hasattr(value, "to_list"):  # ...and HalfVector objects for halfvec columns
+        return value.to_list()
+    if value is not None and not isinstance(value, (str, int, float, bool)):
+        return str(value)
+    return value
+
+
+def export_entries(fmt: str = "jsonl", include_embeddings: bool = False,
+                   location_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Stream the whole knowledge base (or one location's) as CSV or JSONL text chunks.
+
+    In CSV, embedding vectors are JSON-encoded strings so the file round-trips through `parse_import`.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    fields = EXPORT_FIELDS + (EMBEDDING_FIELDS if include_embeddings else ())
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields)
+        writer.writeheader()
+        yield buffer.getvalue()
+
+    for entry in crud.iter_kb_export(include_embeddings=include_embeddings, location_id=location_id):
+        row = {field: _export_value(entry.get(field)) for field in fields}
+        if fmt == "jsonl":
+            yield json.dumps(row) + "\n"
+            continue
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow({k: json.dumps(v) if isinstance(v, list) else v for k, v in row.items()})
+        yield buffer.getvalue()
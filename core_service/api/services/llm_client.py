@@ -1,8 +1,40 @@
 """
 LLM Client Service - Abstracts LLM operations for modularity
 """
+import logging
+import os
+import time
 from typing import List, Optional
-from openai import OpenAI
+
+from core_service.observability.metrics import (
+    EMBEDDING_BREAKER_REJECTIONS,
+    EMBEDDING_BREAKER_STATE,
+    EMBEDDING_FALLBACKS,
+    EMBEDDING_HEDGED_REQUESTS,
+    EMBEDDING_REQUEST_SECONDS,
+)
+from .embedding_providers import EmbeddingProvider, create_provider
+from .resilience import CircuitBreaker, CircuitOpenError, DeadlineExceededError, LatencyTracker, hedged_call
+
+logger = logging.getLogger("services.llm_client")
+
+_BREAKER_STATE_VALUES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+
+class EmbeddingUnavailableError(Exception):
+    """Raised when no provider could produce an embedding in time; callers should degrade, not crash"""
+
+
+class Embedding(list):
+    """
+    An embedding vector (a plain list of floats) tagged with the provider that produced it.
+    Callers that only need the vector can keep treating it as List[float].
+    """
+
+    def __init__(self, vector: List[float], model_tag: str, is_fallback: bool = False):
+        super().__init__(vector)
+        self.model_tag = model_tag
+        self.is_fallback = is_fallback
 
 
 class LLMClient:
@@ -11,16 +43,110 @@ class LLMClient:
     Makes it easy to swap out different LLM providers or models.
     """
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        provider: Optional[EmbeddingProvider] = None,
+        fallback_provider: Optional[EmbeddingProvider] = None,
+    ):
         """
         Initialize the LLM client.
         
         Args:
             api_key: OpenAI API key. If None, will use environment variable.
+            provider: Primary embedding provider. If None, EMBEDDING_PROVIDER selects it (default "openai").
+            fallback_provider: Provider used when the primary fails. If None, EMBEDDING_FALLBACK_PROVIDER
+                selects it (default: no fallback).
         """
-        self.client = OpenAI(api_key=api_key)
-        self.embedding_model = "text-embedding-3-small"
-    
+        self.provider = provider or create_provider(os.getenv("EMBEDDING_PROVIDER", "openai"), api_key=api_key)
+        if self.provider is None:
+            raise ValueError("EMBEDDING_PROVIDER must name an embedding provider")
+        if fallback_provider is None:
+            fallback_provider = create_provider(os.getenv("EMBEDDING_FALLBACK_PROVIDER"), api_key=api_key)
+        self.fallback_provider = fallback_provider
+        self.embedding_model = self.provider.model
+
+        # Deadline / hedging / circuit breaker settings for the primary provider
+        self.deadline_s = float(os.getenv("EMBEDDING_TIMEOUT_S", "2.0"))
+        self.max_attempts = int(os.getenv("EMBEDDING_MAX_ATTEMPTS", "2"))
+        self.hedge_percentile = float(os.getenv("EMBEDDING_HEDGE_PERCENTILE", "95"))
+        self.hedge_default_delay_s = float(os.getenv("EMBEDDING_HEDGE_DEFAULT_DELAY_S", "0.5"))
+        # Batch calls (bulk import) carry many inputs, so they get their own, longer deadline
+        self.batch_deadline_s = float(os.getenv("EMBEDDING_BATCH_TIMEOUT_S", "30"))
+        self.latency = LatencyTracker()
+        primary_tag = self.provider.tag
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("EMBEDDING_BREAKER_FAILURES", "5")),
+            reset_timeout_s=float(os.getenv("EMBEDDING_BREAKER_RESET_S", "30")),
+            on_state_change=lambda state: EMBEDDING_BREAKER_STATE.labels(provider=primary_tag).set(
+                _BREAKER_STATE_VALUES[state]
+            ),
+        )
+        EMBEDDING_BREAKER_STATE.labels(provider=primary_tag).set(0)
+
+    def embed(self, text: str) -> Embedding:
+        """
+        Get a provider-tagged embedding, falling back to the fallback provider on failure.
+        
+        The primary provider is called with a deadline, a hedged duplicate request after
+        the recent p95 latency, and behind a circuit breaker that fails fast while the
+        provider is unhealthy.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Embedding with the vector and the tag of the provider that produced it
+            
+        Raises:
+            EmbeddingUnavailableError: If the primary call fails and no fallback is configured
+        """
+        try:
+            return Embedding(self._embed_primary(text), self.provider.tag)
+        except Exception as e:
+            reason = "circuit_open" if isinstance(e, CircuitOpenError) else "timeout" if isinstance(e, DeadlineExceededError) else "error"
+            EMBEDDING_FALLBACKS.labels(reason=reason).inc()
+            if self.fallback_provider is None:
+                raise EmbeddingUnavailableError(f"Failed to get embedding: {str(e)}") from e
+            logger.warning(f"Primary embedding provider {self.provider.tag} unavailable ({reason}), using {self.fallback_provider.tag}: {e}")
+            return Embedding(self._embed_with(self.fallback_provider, text), self.fallback_provider.tag, is_fallback=True)
+
+    def embed_fallback(self, text: str) -> Optional[Embedding]:
+        """Embed with the fallback provider only (used to keep degraded-mode vectors up to date)"""
+        if self.fallback_provider is None:
+            return None
+        return Embedding(self._embed_with(self.fallback_provider, text), self.fallback_provider.tag, is_fallback=True)
+
+    def embed_batch(self, texts: List[str]) -> List[Embedding]:
+        """
+        Embed several texts in one provider request (bulk import).
+
+        Uses the same circuit breaker as `embed` and falls back to the fallback
+        provider for the whole batch on failure.
+
+        Raises:
+            EmbeddingUnavailableError: If the primary call fails and no fallback is configured
+        """
+        if not texts:
+            return []
+        try:
+            vectors = self._embed_primary_batch(texts)
+            return [Embedding(vector, self.provider.tag) for vector in vectors]
+        except Exception as e:
+            reason = "circuit_open" if isinstance(e, CircuitOpenError) else "timeout" if isinstance(e, DeadlineExceededError) else "error"
+            EMBEDDING_FALLBACKS.labels(reason=reason).inc()
+            if self.fallback_provider is None:
+                raise EmbeddingUnavailableError(f"Failed to get embeddings: {str(e)}") from e
+            logger.warning(f"Primary embedding provider {self.provider.tag} unavailable ({reason}) for a batch of {len(texts)}, using {self.fallback_provider.tag}: {e}")
+            return self.embed_fallback_batch(texts)
+
+    def embed_fallback_batch(self, texts: List[str]) -> List[Embedding]:
+        """Batch version of `embed_fallback`; empty when no fallback provider is configured"""
+        if self.fallback_provider is None:
+            return []
+        vectors = self._embed_batch_with(self.fallback_provider, texts)
+        return [Embedding(vector, self.fallback_provider.tag, is_fallback=True) for vector in vectors]
+
     def get_embedding(self, text: str) -> List[float]:
         """
         Get embedding vector for the given text.
@@ -29,20 +155,74 @@ class LLMClient:
             text: Text to embed
             
         Returns:
-            List of floats representing the embedding vector
+            List of floats representing the embedding vector (an Embedding carrying its provider tag)
             
         Raises:
             Exception: If the API call fails
         """
+        return self.embed(text)
+
+    def _embed_primary(self, text: str) -> List[float]:
+        """Call the primary provider with breaker, deadline and hedging"""
+        if not self.breaker.allow_request():
+            EMBEDDING_BREAKER_REJECTIONS.labels(provider=self.provider.tag).inc()
+            raise CircuitOpenError(f"Circuit open for {self.provider.tag}")
+
+        hedge_delay_s = self.latency.percentile(self.hedge_percentile, default=self.hedge_default_delay_s)
+        start = time.perf_counter()
         try:
-            response = self.client.embeddings.create(
-                input=text,
-                model=self.embedding_model
+            vector = hedged_call(
+                lambda: self._embed_with(self.provider, text),
+                deadline_s=self.deadline_s,
+                hedge_delay_s=hedge_delay_s,
+                max_attempts=self.max_attempts,
+                on_hedge=EMBEDDING_HEDGED_REQUESTS.labels(provider=self.provider.tag).inc,
             )
-            return response.data[0].embedding
-        except Exception as e:
-            raise Exception(f"Failed to get embedding: {str(e)}")
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        self.latency.record(time.perf_counter() - start)
+        return vector
+
+    def _embed_primary_batch(self, texts: List[str]) -> List[List[float]]:
+        """Call the primary provider's batch API with breaker and deadline (no hedging: batches are large)"""
+        if not self.breaker.allow_request():
+            EMBEDDING_BREAKER_REJECTIONS.labels(provider=self.provider.tag).inc()
+            raise CircuitOpenError(f"Circuit open for {self.provider.tag}")
+        try:
+            vectors = hedged_call(
+                lambda: self._embed_batch_with(self.provider, texts),
+                deadline_s=self.batch_deadline_s,
+                hedge_delay_s=self.batch_deadline_s,
+                max_attempts=self.max_attempts,
+            )
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return vectors
+
+    def _embed_batch_with(self, provider: EmbeddingProvider, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        try:
+            vectors = provider.embed_batch(texts)
+        except Exception:
+            EMBEDDING_REQUEST_SECONDS.labels(model=provider.tag, outcome="error").observe(time.perf_counter() - start)
+            raise
+        EMBEDDING_REQUEST_SECONDS.labels(model=provider.tag, outcome="success").observe(time.perf_counter() - start)
+        return vectors
+
+    def _embed_with(self, provider: EmbeddingProvider, text: str) -> List[float]:
+        start = time.perf_counter()
+        try:
+            vector = provider.embed(text)
+        except Exception:
+            EMBEDDING_REQUEST_SECONDS.labels(model=provider.tag, outcome="error").observe(time.perf_counter() - start)
+            raise
+        EMBEDDING_REQUEST_SECONDS.labels(model=provider.tag, outcome="success").observe(time.perf_counter() - start)
+        return vector
 
 
 # Global instance - can be configured with dependency injection if needed
-llm_client = LLMClient() 
\ No newline at end of file
+llm_client = LLMClient()
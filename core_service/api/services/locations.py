@@ -0,0 +1,80 @@
+"""
+Locations - which salon a call, customer or knowledge base entry belongs to
+
+Agent workers serve every location; a call's location comes from the LiveKit
+room metadata (JSON with a "location_id" key, set when the room is created
+for the dialled number). Location profiles are cached per worker process for
+LOCATION_CACHE_TTL_S, so call setup does not wait on the database and a
+database blip keeps serving the last known profile.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from core_service.database import crud
+from core_service.database.models import DEFAULT_LOCATION_ID
+
+logger = logging.getLogger("services.locations")
+
+LOCATION_CACHE_TTL_S = float(os.getenv("LOCATION_CACHE_TTL_S", "300"))
+
+# Used when the default location cannot be read (matches the row seeded by db/init/009_locations.sql)
+DEFAULT_PROFILE = {"id": DEFAULT_LOCATION_ID, "name": "Beauty Palace", "city": "New York City"}
+
+_cache_lock = threading.Lock()
+# location id -> (expires at, profile or None if the location does not exist)
+_profiles: Dict[str, tuple] = {}
+
+
+def location_id_from_metadata(metadata: Optional[str]) -> str:
+    """Location id in LiveKit room/participant metadata, or the default location"""
+    if metadata:
+        try:
+            location_id = json.loads(metadata).get("location_id")
+        except (ValueError, AttributeError):
+            logger.warning(f"Ignoring room metadata that is not a JSON object: {metadata!r}")
+        else:
+            if isinstance(location_id, str) and location_id:
+                return location_id
+    return DEFAULT_LOCATION_ID
+
+
+def _load_profile(location_id: str) -> Optional[Dict[str, Any]]:
+    location = crud.get_location(location_id)
+    if location is None:
+        return None
+    return {"id": location.id, "name": location.name, "city": location.city}
+
+
+def get_location_profile(location_id: str) -> Dict[str, Any]:
+    """
+    Profile (id, name, city) of a location, cached per process.
+
+    Unknown locations resolve to the default location, so a misconfigured room
+    still gets a working agent (and its escalations land somewhere visible).
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _profiles.get(location_id)
+    if cached is None or cached[0] <= now:
+        try:
+            profile = _load_profile(location_id)
+            cached = (now + LOCATION_CACHE_TTL_S, profile)
+            with _cache_lock:
+                _profiles[location_id] = cached
+        except Exception as e:
+            if cached is None:
+                logger.warning(f"Could not load location {location_id}: {e}")
+                return DEFAULT_PROFILE if location_id == DEFAULT_LOCATION_ID else get_location_profile(DEFAULT_LOCATION_ID)
+            logger.warning(f"Could not refresh location {location_id}, using cached profile: {e}")
+
+    profile = cached[1]
+    if profile is not None:
+        return profile
+    if location_id == DEFAULT_LOCATION_ID:
+        return DEFAULT_PROFILE
+    logger.warning(f"Unknown location {location_id}, using {DEFAULT_LOCATION_ID}")
+    return get_location_profile(DEFAULT_LOCATION_ID)
@@ -0,0 +1,193 @@
+"""
+Rerank borderline knowledge base matches with a local cross-encoder
+
+Cosine similarity between question embeddings is a weak signal near the answer
+threshold: paraphrases score low and different questions about the same topic
+score high. When the best candidate's similarity falls in the gray zone
+[KB_RERANK_GRAY_LOW, KB_RERANK_GRAY_HIGH), search_knowledge_base_by_question
+retrieves KB_RERANK_CANDIDATES entries and lets a cross-encoder (which reads the
+query and the entry together) pick the answer or reject them all. Confident
+matches and clear misses skip this stage.
+
+Scoring runs on the CPU with a hard budget (KB_RERANK_BUDGET_MS); when it is
+exceeded the caller keeps the plain similarity decision. Scores are cached per
+(query, entry), and scoring abandoned by the budget still fills the cache.
+
+Requires the optional sentence-transformers package; without it (or with
+KB_RERANK_MODEL empty) reranking is disabled.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .resilience import DeadlineExceededError, hedged_call
+from core_service.observability.metrics import KB_RERANK_OUTCOMES
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:  # Optional; without it borderline matches use the similarity cutoff only
+    CrossEncoder = None
+
+logger = logging.getLogger("services.reranker")
+
+KB_RERANK_MODEL = os.getenv("KB_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Top similarities in [low, high) are reranked; below is a miss, at or above is answered as before
+KB_RERANK_GRAY_LOW = float(os.getenv("KB_RERANK_GRAY_LOW", "0.4"))
+KB_RERANK_GRAY_HIGH = float(os.getenv("KB_RERANK_GRAY_HIGH", "0.65"))
+KB_RERANK_CANDIDATES = int(os.getenv("KB_RERANK_CANDIDATES", "5"))
+KB_RERANK_BUDGET_MS = float(os.getenv("KB_RERANK_BUDGET_MS", "250"))
+# Cross-encoder relevance (0-1) needed to answer from a reranked entry
+KB_RERANK_MIN_SCORE = float(os.getenv("KB_RERANK_MIN_SCORE", "0.5"))
+KB_RERANK_CACHE_SIZE = int(os.getenv("KB_RERANK_CACHE_SIZE", "10000"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize_query(query: str) -> str:
+    return _WHITESPACE.sub(" ", query).strip().lower()
+
+
+def entry_passage(row: Dict[str, Any]) -> str:
+    """Text the cross-encoder reads for a KB row"""
+    return f"{row['question_text_example']}\n{row['answer_text']}"
+
+
+def _cache_key(query: str, row: Dict[str, Any]) -> Tuple[str, str, str]:
+    # The text digest retires scores for entries edited since they were scored
+    digest = hashlib.sha1(entry_passage(row).encode("utf-8")).hexdigest()[:16]
+    return _normalize_query(query), str(row["id"]), digest
+
+
+class ScoreCache:
+    """Thread-safe LRU of (query, entry) -> relevance score"""
+
+    def __init__(self, max_size: int = KB_RERANK_CACHE_SIZE):
+        self.max_size = max_size
+        self._scores: "OrderedDict[Tuple[str, str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[float]:
+        with self._lock:
+            score = self._scores.get(key)
+            if score is not None:
+                self._scores.move_to_end(key)
+            return score
+
+    def put(self, key: Tuple[str, str, str], score: float) -> None:
+        with self._lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.max_size:
+                self._scores.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+class CrossEncoderScorer:
+    """Lazily loaded sentence-transformers cross-encoder on the CPU"""
+
+    def __init__(self, model_name: str = KB_RERANK_MODEL):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                logger.info(f"Loading reranker model {self.model_name}")
+                self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def score(self, query: str, passages: Sequence[str]) -> List[float]:
+        """Relevance in [0, 1] per passage (single-label models apply a sigmoid)"""
+        model = self._load()
+        return [float(s) for s in model.predict([(query, p) for p in passages])]
+
+
+class Reranker:
+    """Decide borderline KB matches; see the module docstring"""
+
+    def __init__(self, scorer=None, gray_low: float = KB_RERANK_GRAY_LOW, gray_high: float = KB_RERANK_GRAY_HIGH,
+                 candidates: int = KB_RERANK_CANDIDATES, budget_ms: float = KB_RERANK_BUDGET_MS,
+                 min_score: float = KB_RERANK_MIN_SCORE, cache: Optional[ScoreCache] = None):
+        self.scorer = scorer
+        self.gray_low = gray_low
+        self.gray_high = gray_high
+        self.candidates = candidates
+        self.budget_ms = budget_ms
+        self.min_score = min_score
+        self.cache = cache if cache is not None else ScoreCache()
+
+    @property
+    def enabled(self) -> bool:
+        return self.scorer is not None
+
+    def in_gray_zone(self, top_sim: Optional[float]) -> bool:
+        return self.enabled and top_sim is not None and self.gray_low <= top_sim < self.gray_high
+
+    def warm_up(self) -> None:
+        """Load the model and run one pair so the first call does not spend its budget loading"""
+        if self.enabled:
+            self.scorer.score("warm up", ["warm up"])
+
+    def _score_uncached(self, query: str, rows: List[Dict[str, Any]]) -> None:
+        scores = self.scorer.score(query, [entry_passage(r) for r in rows])
+        for row, score in zip(rows, scores):
+            self.cache.put(_cache_key(query, row), score)
+
+    def score(self, query: str, rows: List[Dict[str, Any]]) -> Optional[List[float]]:
+        """
+        Relevance per row, from the cache where possible.
+
+        Returns:
+            Scores in row order, or None if scoring missed the budget or failed
+        """
+        missing = [r for r in rows if self.cache.get(_cache_key(query, r)) is None]
+        if missing:
+            try:
+                # Single attempt: a timed-out scoring run finishes in the background and fills the cache
+                hedged_call(lambda: self._score_uncached(query, missing), deadline_s=self.budget_ms / 1000,
+                            hedge_delay_s=self.budget_ms / 1000, max_attempts=1)
+            except DeadlineExceededError:
+                KB_RERANK_OUTCOMES.labels(outcome="timeout").inc()
+                return None
+            except Exception as e:
+                logger.warning(f"Reranker failed, keeping similarity order: {e}")
+                KB_RERANK_OUTCOMES.labels(outcome="error").inc()
+                return None
+        scores = [self.cache.get(_cache_key(query, r)) for r in rows]
+        # A concurrent burst may have evicted a score we just computed
+        return None if any(s is None for s in scores) else scores
+
+    def rerank(self, query: str, rows: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Reorder candidates by cross-encoder relevance, dropping those under min_score.
+
+        Returns:
+            Passing rows (best first, with a rerank_score key), possibly empty,
+            or None if no decision was made within the budget
+        """
+        scores = self.score(query, rows)
+        if scores is None:
+            return None
+        ranked = sorted(
+            ({**row, "rerank_score": score} for row, score in zip(rows, scores)),
+            key=lambda r: r["rerank_score"], reverse=True,
+        )
+        passing = [r for r in ranked if r["rerank_score"] >= self.min_score]
+        if not passing:
+            outcome = "rejected"
+        elif passing[0]["id"] == rows[0]["id"]:
+            outcome = "confirmed"
+        else:
+            outcome = "reordered"
+        KB_RERANK_OUTCOMES.labels(outcome=outcome).inc()
+        return passing
+
+
+reranker = Reranker(CrossEncoderScorer() if CrossEncoder is not None and KB_RERANK_MODEL else None)
@@ -0,0 +1,215 @@
+"""
+Resilience - Deadlines, hedged requests and circuit breaking for remote calls
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit breaker is open"""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when no attempt finished before the deadline"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed    -> calls flow; `failure_threshold` consecutive failures open the circuit
+    open      -> calls are rejected immediately for `reset_timeout_s`
+    half_open -> a single trial call is let through; success closes, failure re-opens
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout_s: float = 30.0,
+        on_state_change: Optional[Callable[[str], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self._on_state_change = on_state_change
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout_s:
+            self._transition(self.HALF_OPEN)
+        return self._state
+
+    def _transition(self, new_state: str) -> None:
+        if new_state == self._state:
+            return
+        self._state = new_state
+        if new_state == self.OPEN:
+            self._opened_at = self._clock()
+        if new_state != self.HALF_OPEN:
+            self._trial_in_flight = False
+        if self._on_state_change:
+            self._on_state_change(new_state)
+
+    def allow_request(self) -> bool:
+        """Return True if a call may proceed (reserving the trial slot when half-open)"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive_failures = 0
+            self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._transition(self.OPEN)
+            self._trial_in_flight = False
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_s: float) -> None:
+        with self._lock:
+            self._samples.append(latency_s)
+
+    def percentile(self, pct: float, default: float, min_samples: int = 20) -> float:
+        """Return the pct-th percentile, or `default` until enough samples are collected"""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return default
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+        return ordered[index]
+
+
+class RateLimiter:
+    """Token bucket: `rate_per_s` tokens per second with bursts of up to `burst` tokens"""
+
+    def __init__(
+        self,
+        rate_per_s: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if rate_per_s <= 0:
+            raise ValueError("rate_per_s must be positive")
+        self.rate_per_s = rate_per_s
+        self.burst = burst if burst is not None else max(1.0, rate_per_s)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available; returns the time spent waiting"""
+        if tokens > self.burst:
+            raise ValueError(f"Cannot acquire {tokens} tokens with a burst of {self.burst}")
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_s)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate_per_s
+            self._sleep(delay)
+            waited += delay
+
+
+# Shared pool for hedged attempts; attempts abandoned after a deadline finish in the background
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedged-call")
+
+
+def hedged_call(
+    fn: Callable[[], T],
+    deadline_s: float,
+    hedge_delay_s: float,
+    max_attempts: int = 2,
+    on_hedge: Optional[Callable[[], None]] = None,
+) -> T:
+    """
+    Run fn with a deadline, launching a duplicate attempt if the first is slow.
+
+    A new attempt is started when the in-flight ones have run for `hedge_delay_s`
+    without finishing, or immediately when an attempt fails, up to `max_attempts`.
+    The first successful result wins.
+
+    Args:
+        fn: Zero-argument callable to run (must be safe to call more than once)
+        deadline_s: Overall time budget for all attempts
+        hedge_delay_s: How long to wait on in-flight attempts before hedging
+        max_attempts: Maximum attempts including the first
+        on_hedge: Called whenever a hedged/retry attempt is launched
+
+    Returns:
+        The result of the first successful attempt
+
+    Raises:
+        DeadlineExceededError: If no attempt succeeded before the deadline
+        Exception: The last attempt's error if every attempt failed
+    """
+    deadline = time.monotonic() + deadline_s
+    pending = {_executor.submit(fn)}
+    attempts = 1
+    last_error: Optional[BaseException] = None
+
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        can_hedge = attempts < max_attempts
+        done, pending = wait(pending, timeout=min(remaining, hedge_delay_s) if can_hedge else remaining,
+                             return_when=FIRST_COMPLETED)
+
+        for future in done:
+            error = future.exception()
+            if error is None:
+                return future.result()
+            last_error = error
+
+        # Hedge on slowness, retry on failure, while attempts and time remain
+        if attempts < max_attempts and deadline - time.monotonic() > 0:
+            pending.add(_executor.submit(fn))
+            attempts += 1
+            if on_hedge:
+                on_hedge()
+
+    if pending or last_error is None:
+        raise DeadlineExceededError(f"No result within {deadline_s:.2f}s after {attempts} attempt(s)")
+    raise last_error
@@ -0,0 +1,159 @@
+"""
+Resolutions - hear about supervisor answers while the caller is still on the line
+
+Resolving a help request fires NOTIFY help_request_resolved (trigger in
+db/init/011_help_request_resolved_notify.sql) when its transaction commits.
+Each agent worker process keeps one asyncpg connection LISTENing on that
+channel and wakes the calls waiting on the resolved request, so an answer
+reaches the caller about as fast as the commit, with no polling.
+
+Without asyncpg or a Postgres DATABASE_URL nothing is delivered in-call; the
+customer still gets the text sent by create_customer_notification.
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.engine import make_url
+
+from core_service.database import crud
+from core_service.database.session import primary_reads
+
+try:
+    import asyncpg
+except ImportError:  # pragma: no cover - optional dependency
+    asyncpg = None
+
+logger = logging.getLogger("services.resolutions")
+
+HELP_REQUEST_RESOLVED_CHANNEL = "help_request_resolved"
+# How long a call keeps waiting for the supervisor's answer after escalating
+IN_CALL_ANSWER_WAIT_S = float(os.getenv("IN_CALL_ANSWER_WAIT_S", "300"))
+LISTEN_RECONNECT_DELAYS_S = (1, 2, 5, 10, 30)
+
+
+def _listen_dsn(database_url: Optional[str]) -> Optional[str]:
+    """asyncpg DSN for a SQLAlchemy Postgres URL (any driver), or None for other databases"""
+    if not database_url:
+        return None
+    url = make_url(database_url)
+    if url.get_backend_name() != "postgresql":
+        return None
+    return url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def _load_answer(help_request_id: str) -> Optional[str]:
+    """Answer text of a resolved help request, or None while it is not resolved"""
+    # From the primary: the NOTIFY may arrive before a replica has the answer
+    with primary_reads():
+        data = crud.get_help_request_with_answer(help_request_id)
+    if not data or data["help_request"].status != "resolved" or not data["supervisor_response"]:
+        return None
+    return data["supervisor_response"].answer_text
+
+
+class ResolutionListener:
+    """Waits for help request resolutions over one LISTEN connection per process"""
+
+    def __init__(self, dsn: Optional[str], connect: Optional[Callable[[str], Any]] = None):
+        self.dsn = dsn
+        self._connect = connect or (asyncpg.connect if asyncpg is not None else None)
+        self._conn = None
+        self._conn_lock: Optional[asyncio.Lock] = None  # Created on the event loop that first waits
+        # help request id -> futures of the calls waiting for its answer
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._tasks: set = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self._connect is not None and bool(self.dsn)
+
+    def _connected(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    async def _ensure_listening(self) -> bool:
+        if self._connected():
+            return True
+        if self._conn_lock is None:
+            self._conn_lock = asyncio.Lock()
+        async with self._conn_lock:
+            if self._connected():
+                return True
+            try:
+                conn = await self._connect(self.dsn)
+                await conn.add_listener(HELP_REQUEST_RESOLVED_CHANNEL, self._on_notify)
+                conn.add_termination_listener(self._on_terminated)
+            except Exception as e:
+                logger.warning(f"Could not LISTEN for help request resolutions: {e}")
+                return False
+            self._conn = conn
+        # Anything resolved while nobody was listening was announced to no one
+        for help_request_id in list(self._waiters):
+            await self._check(help_request_id)
+        return True
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        if payload in self._waiters:
+            self._spawn(self._check(payload))
+
+    def _on_terminated(self, connection) -> None:
+        logger.warning("LISTEN connection for help request resolutions closed")
+        self._conn = None
+        if self._waiters:
+            self._spawn(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        for delay in LISTEN_RECONNECT_DELAYS_S:
+            await asyncio.sleep(delay)
+            if not self._waiters or await self._ensure_listening():
+                return
+
+    async def _check(self, help_request_id: str) -> None:
+        """Wake the waiters of a help request if it has been resolved"""
+        try:
+            answer = await asyncio.to_thread(_load_answer, help_request_id)
+        except Exception as e:
+            logger.warning(f"Could not read the answer to help request {help_request_id}: {e}")
+            return
+        if answer is None:
+            return
+        for future in self._waiters.get(help_request_id, []):
+            if not future.done():
+                future.set_result(answer)
+
+    async def wait_for_answer(self, help_request_id: Any, timeout_s: float = IN_CALL_ANSWER_WAIT_S) -> Optional[str]:
+        """
+        Wait for a supervisor to answer a help request.
+
+        Returns:
+            The answer text, or None if it did not come within timeout_s (or cannot be
+            listened for)
+        """
+        if not self.enabled:
+            return None
+        key = str(help_request_id)
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, []).append(future)
+        try:
+            if not await self._ensure_listening():
+                return None
+            # The answer may have been committed before this call started listening
+            await self._check(key)
+            return await asyncio.wait_for(future, timeout=timeout_s)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self._waiters.get(key, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(key, None)
+
+
+resolution_listener = ResolutionListener(_listen_dsn(os.getenv("DATABASE_URL")))
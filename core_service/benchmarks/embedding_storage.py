@@ -0,0 +1,246 @@
+"""
+Embedding Storage Benchmark - Recall and latency of reduced/quantized KB vectors
+
+Loads the same corpus into one scratch table per (dimensions, storage)
+configuration, builds the index the service would use (see
+core_service/database/vector_storage.py) and runs the same query shapes as
+knowledge_base_crud: ANN KNN for vector/halfvec, and Hamming-distance
+candidates plus exact cosine rescoring for binary. Recall@k is measured
+against an exact float32 scan at full width, together with per-query latency
+and table/index size.
+
+"--source kb" benchmarks the live knowledge base vectors (real embeddings,
+queries are perturbed copies of KB rows); the default synthetic corpus is
+clustered with energy concentrated in the leading dimensions, like
+text-embedding-3 output.
+
+Usage (from the repo root, with DATABASE_URL pointing at a local database):
+
+    python -m core_service.benchmarks.embedding_storage --rows 5000 --queries 200
+    python -m core_service.benchmarks.embedding_storage --source kb --dimensions 1536,512 --storages vector,binary
+
+Scratch tables are named bench_embedding_storage_* and dropped afterwards.
+"""
+import argparse
+import json
+import math
+import random
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy import text
+
+from core_service.api.services.embedding_providers import truncate_embedding
+from core_service.benchmarks.loadtest import percentile
+from core_service.database.session import SessionLocal
+from core_service.database.vector_storage import (
+    STORAGE_BINARY,
+    STORAGE_MODES,
+    column_type_sql,
+    index_sql,
+    quantized_sql,
+)
+
+TABLE_PREFIX = "bench_embedding_storage_"
+FULL_DIMENSIONS = 1536
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def synthetic_corpus(rows: int, dimensions: int, clusters: int, rng: random.Random) -> List[List[float]]:
+    """Clustered unit vectors whose per-dimension scale decays with the dimension index"""
+    scales = [1.0 / math.sqrt(1.0 + i / 64.0) for i in range(dimensions)]
+    centers = [[rng.gauss(0.0, s) for s in scales] for _ in range(clusters)]
+    corpus = []
+    for _ in range(rows):
+        center = centers[rng.randrange(clusters)]
+        corpus.append(_normalize([c + rng.gauss(0.0, 0.5 * s) for c, s in zip(center, scales)]))
+    return corpus
+
+
+def perturb(vector: Sequence[float], noise: float, rng: random.Random) -> List[float]:
+    """A nearby unit vector, standing in for a paraphrased question"""
+    scale = noise / math.sqrt(len(vector))
+    return _normalize([v + rng.gauss(0.0, scale) for v in vector])
+
+
+def recall_at_k(found: Sequence, truth: Sequence) -> float:
+    """Fraction of the exact top-k that the approximate search returned"""
+    if not truth:
+        return 1.0
+    return len(set(found) & set(truth)) / len(truth)
+
+
+def load_kb_vectors(limit: int) -> List[List[float]]:
+    """Full-width primary embeddings of the live knowledge base"""
+    session = SessionLocal()
+    try:
+        rows = session.execute(
+            text("SELECT embedding::real[] AS vec FROM knowledge_base WHERE embedding IS NOT NULL LIMIT :limit"),
+            {"limit": limit},
+        ).all()
+        return [list(row.vec) for row in rows]
+    finally:
+        session.close()
+
+
+def _vec_literal(vector: Sequence[float]) -> str:
+    return "[" + ",".join(f"{v:.7g}" for v in vector) + "]"
+
+
+def create_table(session, table: str, dimensions: int, storage: str, corpus: List[List[float]], lists: int) -> None:
+    vector_type = column_type_sql(dimensions, storage)
+    session.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    session.execute(text(f"CREATE TABLE {table} (id integer PRIMARY KEY, embedding {vector_type} NOT NULL)"))
+    session.execute(
+        text(f"INSERT INTO {table} (id, embedding) VALUES (:id, CAST(:vec AS {vector_type}))"),
+        [{"id": i, "vec": _vec_literal(truncate_embedding(v, dimensions))} for i, v in enumerate(corpus)],
+    )
+    if lists:
+        session.execute(text(index_sql("embedding", f"{table}_idx", dimensions, storage, lists=lists, table=table)))
+    session.execute(text(f"ANALYZE {table}"))
+    session.commit()
+
+
+def query_sql(table: str, dimensions: int, storage: str) -> str:
+    """Same query shape as knowledge_base_crud.search_kb_by_embedding for the storage mode"""
+    query_vec = f"CAST(:query_vec AS {column_type_sql(dimensions, storage)})"
+    if storage == STORAGE_BINARY:
+        return f"""
+            SELECT id FROM (
+                SELECT id, embedding <=> {query_vec} AS distance
+                FROM {table}
+                ORDER BY {quantized_sql("embedding", dimensions)} <~> {quantized_sql(query_vec, dimensions)}
+                LIMIT :candidates
+            ) hamming
+            ORDER BY distance
+            LIMIT :k
+        """
+    return f"SELECT id FROM {table} ORDER BY embedding <=> {query_vec} LIMIT :k"
+
+
+def table_sizes(session, table: str) -> Tuple[int, int]:
+    """(heap bytes incl. TOAST, index bytes)"""
+    row = session.execute(text(
+        "SELECT pg_table_size(CAST(:table AS regclass)) AS heap, pg_indexes_size(CAST(:table AS regclass)) AS idx"
+    ), {"table": table}).one()
+    return int(row.heap), int(row.idx)
+
+
+def exact_top_k(session, table: str, dimensions: int, queries: List[List[float]], k: int) -> List[List[int]]:
+    """Ground truth: full-width float32 sequential scan (the table has no ANN index)"""
+    sql = text(query_sql(table, dimensions, "vector"))
+    truth = [[r.id for r in session.execute(sql, {"query_vec": _vec_literal(q), "k": k})] for q in queries]
+    session.rollback()
+    return truth
+
+
+def run_config(session, table: str, dimensions: int, storage: str, queries: List[List[float]],
+               truth: List[List[int]], k: int, rescore_factor: int, probes: int) -> Dict[str, float]:
+    if probes:
+        session.execute(text(f"SET LOCAL ivfflat.probes = {int(probes)}"))
+    sql = text(query_sql(table, dimensions, storage))
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        params = {"query_vec": _vec_literal(truncate_embedding(query, dimensions)), "k": k, "candidates": k * rescore_factor}
+        started = time.perf_counter()
+        found = [r.id for r in session.execute(sql, params)]
+        latencies.append(time.perf_counter() - started)
+        recalls.append(recall_at_k(found, expected))
+    session.rollback()
+
+    heap_bytes, index_bytes = table_sizes(session, table)
+    latencies.sort()
+    return {
+        "dimensions": dimensions,
+        "storage": storage,
+        "recall_at_k": sum(recalls) / len(recalls),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "heap_mb": heap_bytes / 1_048_576,
+        "index_mb": index_bytes / 1_048_576,
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> List[Dict[str, float]]:
+    rng = random.Random(args.seed)
+    if args.source == "kb":
+        corpus = load_kb_vectors(args.rows)
+        if not corpus:
+            raise SystemExit("knowledge_base has no embeddings to benchmark")
+    else:
+        corpus = synthetic_corpus(args.rows, FULL_DIMENSIONS, args.clusters, rng)
+    queries = [perturb(rng.choice(corpus), args.noise, rng) for _ in range(args.queries)]
+
+    dimensions_list = [int(d) for d in args.dimensions.split(",")]
+    storages = [s.strip() for s in args.storages.split(",")]
+    for storage in storages:
+        if storage not in STORAGE_MODES:
+            raise SystemExit(f"Unknown storage mode: {storage}")
+
+    session = SessionLocal()
+    tables = []
+    try:
+        baseline = f"{TABLE_PREFIX}exact"
+        tables.append(baseline)
+        full_dimensions = len(corpus[0])
+        create_table(session, baseline, full_dimensions, "vector", corpus, lists=0)
+        truth = exact_top_k(session, baseline, full_dimensions, queries, args.k)
+
+        results = []
+        for dimensions in (d for d in dimensions_list if d <= full_dimensions):
+            for storage in storages:
+                table = f"{TABLE_PREFIX}{storage}_{dimensions}"
+                tables.append(table)
+                create_table(session, table, dimensions, storage, corpus, lists=args.lists)
+                results.append(run_config(session, table, dimensions, storage, queries, truth,
+                                          args.k, args.rescore_factor, args.probes))
+        return results
+    finally:
+        session.rollback()
+        for table in tables:
+            session.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        session.commit()
+        session.close()
+
+
+def format_report(results: List[Dict[str, float]], k: int) -> str:
+    lines = [f"{'dims':>6}{'storage':>10}{f'recall@{k}':>11}{'p50':>9}{'p95':>9}{'heap MB':>10}{'index MB':>10}"]
+    for r in results:
+        lines.append(
+            f"{r['dimensions']:>6}{r['storage']:>10}{r['recall_at_k']:>11.3f}{r['p50_ms']:>9.2f}"
+            f"{r['p95_ms']:>9.2f}{r['heap_mb']:>10.1f}{r['index_mb']:>10.1f}"
+        )
+    lines.append("(latencies in ms; recall against an exact full-width float32 scan)")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare KB embedding dimensions/storage modes")
+    parser.add_argument("--source", choices=["synthetic", "kb"], default="synthetic")
+    parser.add_argument("--rows", type=int, default=5000, help="Corpus size (max rows read for --source kb)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=50, help="Synthetic corpus topic clusters")
+    parser.add_argument("--noise", type=float, default=0.3, help="Query perturbation (L2 norm of added noise)")
+    parser.add_argument("--dimensions", default="1536,768,512,256")
+    parser.add_argument("--storages", default=",".join(STORAGE_MODES))
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--rescore-factor", type=int, default=4, help="Binary candidates per result (EMBEDDING_RESCORE_FACTOR)")
+    parser.add_argument("--lists", type=int, default=100, help="ivfflat lists, as in db/init")
+    parser.add_argument("--probes", type=int, default=0, help="ivfflat.probes (0 = server default)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    results = run_benchmark(args)
+    print(json.dumps(results, indent=2) if args.json else format_report(results, args.k))
+
+
+if __name__ == "__main__":
+    main()
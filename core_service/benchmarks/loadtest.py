@@ -0,0 +1,361 @@
+"""
+Load Test - Simulate many concurrent callers against the agent tool path
+
+Drives the same service functions the voice agent calls
+(search_knowledge_base_by_question, then create_help_request_for_escalation
+on a miss) and optionally the HTTP API, against a local Postgres. Embeddings
+come from a local provider so runs need no network and are repeatable.
+The default "fake" embedder maps each text to a seeded random vector, so a
+seeded question is an exact KB hit and every generated miss question lands
+far away from all KB entries. "--embedder local" uses the feature-hashing
+provider instead, for realistic similarity distributions.
+
+Usage (from the repo root, with DATABASE_URL pointing at a local database):
+
+    python -m core_service.benchmarks.loadtest --concurrency 32 --calls 2000 --hit-ratio 0.8
+    python -m core_service.benchmarks.loadtest --http-base-url http://localhost:8000 --http-ratio 0.2
+
+Rows created by the run are tagged ("loadtest:" KB keys, "[loadtest]" question
+prefix) and removed afterwards unless --keep-data is passed.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from sqlalchemy import or_
+
+from core_service.api.services import embeddings
+from core_service.api.services.embedding_providers import EmbeddingProvider, HashingEmbeddingProvider
+from core_service.api.services.help_requests import create_help_request_for_escalation
+from core_service.api.services.knowledge_base import (
+    create_knowledge_base_from_text,
+    search_knowledge_base_by_question,
+)
+from core_service.api.services.llm_client import LLMClient
+from core_service.database import crud
+from core_service.database.models import (
+    Call,
+    Customer,
+    Followup,
+    FollowupArchive,
+    HelpRequest,
+    HelpRequestArchive,
+    KnowledgeBaseEntry,
+    SupervisorResponse,
+    SupervisorResponseArchive,
+)
+from core_service.database.session import SessionLocal
+from core_service.observability.tracing import add_stage_observer, remove_stage_observer
+
+KB_KEY_PREFIX = "loadtest:"
+MISS_PREFIX = "[loadtest]"
+
+DEFAULT_QUESTIONS = [
+    "What are your opening hours on weekends?",
+    "How much does a women's haircut cost?",
+    "Do you offer balayage and how long does it take?",
+    "Can I book a manicure and pedicure together?",
+    "Do you accept walk-ins?",
+    "What is your cancellation policy?",
+    "Do you sell gift cards?",
+    "Is there parking near the salon?",
+    "Do you do bridal hair and makeup?",
+    "Which hair products do you use?",
+    "How early should I arrive for my appointment?",
+    "Do you offer student discounts?",
+]
+
+
+class FakeEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic provider for load tests: hashes the text into a seeded
+    unit vector, so identical text always produces an identical embedding.
+    """
+
+    name = "loadtest"
+
+    def __init__(self, latency_s: float = 0.0):
+        super().__init__(model="seeded-random")
+        self.latency_s = latency_s
+
+    def embed(self, text: str) -> List[float]:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+        rng = random.Random(seed)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.dimensions)]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+
+class _DelayedProvider(EmbeddingProvider):
+    """Wrap a provider to add simulated network latency"""
+
+    def __init__(self, inner: EmbeddingProvider, latency_s: float):
+        super().__init__(model=inner.model, dimensions=inner.dimensions)
+        self.name = inner.name
+        self.inner = inner
+        self.latency_s = latency_s
+
+    def embed(self, text: str) -> List[float]:
+        time.sleep(self.latency_s)
+        return self.inner.embed(text)
+
+
+def install_local_embeddings(embedder: str = "fake", latency_s: float = 0.0) -> LLMClient:
+    """Swap the module-level LLM client used by the embeddings service for a local provider"""
+    if embedder == "fake":
+        provider: EmbeddingProvider = FakeEmbeddingProvider(latency_s=latency_s)
+    else:
+        provider = HashingEmbeddingProvider()
+        if latency_s:
+            provider = _DelayedProvider(provider, latency_s)
+    client = LLMClient(provider=provider)
+    embeddings.llm_client = client
+    return client
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile over an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LatencyRecorder:
+    """Thread-safe collection of per-stage latencies and error counts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, stage_name: str, duration_s: float) -> None:
+        with self._lock:
+            self.samples.setdefault(stage_name, []).append(duration_s)
+
+    def record_error(self, stage_name: str) -> None:
+        with self._lock:
+            self.errors[stage_name] = self.errors.get(stage_name, 0) + 1
+
+    def summary(self, wall_time_s: float) -> Dict[str, Dict[str, float]]:
+        """Per-stage count, throughput and latency percentiles (milliseconds)"""
+        report = {}
+        for stage_name in sorted(set(self.samples) | set(self.errors)):
+            values = sorted(self.samples.get(stage_name, []))
+            report[stage_name] = {
+                "count": len(values),
+                "errors": self.errors.get(stage_name, 0),
+                "throughput_per_s": len(values) / wall_time_s if wall_time_s > 0 else 0.0,
+                "mean_ms": (sum(values) / len(values) * 1000) if values else 0.0,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": (values[-1] * 1000) if values else 0.0,
+            }
+        return report
+
+
+def build_call_plan(questions: List[str], calls: int, hit_ratio: float, rng: random.Random) -> List[str]:
+    """Pick the question for each simulated call according to the KB hit/miss ratio"""
+    plan = []
+    for _ in range(calls):
+        if rng.random() < hit_ratio:
+            plan.append(rng.choice(questions))
+        else:
+            plan.append(f"{MISS_PREFIX} unanswered question {uuid.uuid4()}")
+    return plan
+
+
+def seed_knowledge_base(questions: List[str]) -> None:
+    """Insert one KB entry per question (idempotent across runs)"""
+    existing = {entry.normalized_key for entry in crud.list_kb() if entry.normalized_key}
+    for index, question in enumerate(questions):
+        key = f"{KB_KEY_PREFIX}{hashlib.sha1(question.encode('utf-8')).hexdigest()}"
+        if key in existing:
+            continue
+        create_knowledge_base_from_text(question=question, answer=f"Load test answer #{index}", normalized_key=key)
+
+
+def cleanup(customer_id: Optional[uuid.UUID]) -> None:
+    """Remove rows created by the load test"""
+    session = SessionLocal()
+    try:
+        session.query(KnowledgeBaseEntry).filter(
+            KnowledgeBaseEntry.normalized_key.like(f"{KB_KEY_PREFIX}%")
+        ).delete(synchronize_session=False)
+        # Escalations of the run (misses, and seeded questions below the similarity cutoff), hot and archived
+        request_filter = HelpRequest.question_text.like(f"{MISS_PREFIX}%")
+        archive_filter = HelpRequestArchive.question_text.like(f"{MISS_PREFIX}%")
+        if customer_id:
+            request_filter = or_(request_filter, HelpRequest.customer_id == customer_id)
+            archive_filter = or_(archive_filter, HelpRequestArchive.customer_id == customer_id)
+        request_ids = session.query(HelpRequest.id).filter(request_filter).scalar_subquery()
+        archive_ids = session.query(HelpRequestArchive.id).filter(archive_filter).scalar_subquery()
+        for model, ids in ((SupervisorResponse, request_ids), (Followup, request_ids),
+                           (SupervisorResponseArchive, archive_ids), (FollowupArchive, archive_ids)):
+            session.query(model).filter(model.help_request_id.in_(ids)).delete(synchronize_session=False)
+        session.query(HelpRequest).filter(request_filter).delete(synchronize_session=False)
+        session.query(HelpRequestArchive).filter(archive_filter).delete(synchronize_session=False)
+        if customer_id:
+            session.query(Call).filter(Call.customer_id == customer_id).delete(synchronize_session=False)
+            session.query(Customer).filter(Customer.id == customer_id).delete(synchronize_session=False)
+        session.commit()
+    finally:
+        session.close()
+
+
+def _timed(recorder: LatencyRecorder, stage_name: str, fn, *args, **kwargs):
+    """Run fn, recording its latency (or an error) under stage_name"""
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    except Exception:
+        recorder.record_error(stage_name)
+        raise
+    recorder.record(stage_name, time.perf_counter() - start)
+    return result
+
+
+async def _simulate_tool_call(question: str, customer_id: str, min_sim: float, recorder: LatencyRecorder) -> None:
+    """Mirror agent.tools.search_knowledge_base: search, then escalate on a miss"""
+    start = time.perf_counter()
+    result = await asyncio.to_thread(
+        _timed, recorder, "search_total", search_knowledge_base_by_question, question, 1, min_sim
+    )
+    if not result:
+        await asyncio.to_thread(
+            _timed, recorder, "escalation_insert", create_help_request_for_escalation, question, customer_id=customer_id
+        )
+        recorder.record("outcome_miss", time.perf_counter() - start)
+    else:
+        recorder.record("outcome_hit", time.perf_counter() - start)
+    recorder.record("tool_call", time.perf_counter() - start)
+
+
+async def _simulate_http_call(http_client, question: str, rng: random.Random, recorder: LatencyRecorder) -> None:
+    """Dashboard traffic: KB search or pending help-request listing"""
+    if rng.random() < 0.5:
+        stage_name, url, params = "http_list_kb", "/api/knowledge-base/", {"q": question.split()[0]}
+    else:
+        stage_name, url, params = "http_list_pending", "/api/help-requests/", {"status": "pending"}
+    start = time.perf_counter()
+    try:
+        response = await http_client.get(url, params=params)
+        response.raise_for_status()
+    except Exception:
+        recorder.record_error(stage_name)
+        return
+    recorder.record(stage_name, time.perf_counter() - start)
+
+
+async def run_load(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(args.seed)
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    install_local_embeddings(args.embedder, latency_s=args.embedding_latency_ms / 1000.0)
+    # The agent runs searches with asyncio.to_thread; size the pool like a worker would be
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.concurrency))
+
+    seed_knowledge_base(questions)
+    customer = crud.create_customer({"display_name": "Load Test Customer"})
+
+    recorder = LatencyRecorder()
+    add_stage_observer(recorder.record)
+
+    http_client = None
+    if args.http_base_url:
+        import httpx
+        http_client = httpx.AsyncClient(base_url=args.http_base_url, timeout=30.0)
+
+    plan = build_call_plan(questions, args.calls, args.hit_ratio, rng)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def _one(question: str) -> None:
+        async with semaphore:
+            if http_client is not None and rng.random() < args.http_ratio:
+                await _simulate_http_call(http_client, question, rng, recorder)
+            else:
+                try:
+                    await _simulate_tool_call(question, str(customer.id), args.min_sim, recorder)
+                except Exception:
+                    recorder.record_error("tool_call")
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(_one(question) for question in plan))
+    finally:
+        wall_time_s = time.perf_counter() - start
+        remove_stage_observer(recorder.record)
+        if http_client is not None:
+            await http_client.aclose()
+        if not args.keep_data:
+            cleanup(customer.id)
+
+    report = recorder.summary(wall_time_s)
+    report["_run"] = {
+        "calls": args.calls,
+        "concurrency": args.concurrency,
+        "hit_ratio": args.hit_ratio,
+        "wall_time_s": wall_time_s,
+        "calls_per_s": args.calls / wall_time_s if wall_time_s > 0 else 0.0,
+    }
+    return report
+
+
+def format_report(report: Dict[str, Dict[str, float]]) -> str:
+    run = report["_run"]
+    lines = [
+        f"calls={run['calls']} concurrency={run['concurrency']} hit_ratio={run['hit_ratio']} "
+        f"wall={run['wall_time_s']:.2f}s throughput={run['calls_per_s']:.1f} calls/s",
+        f"{'stage':<22}{'count':>8}{'errors':>8}{'rps':>9}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}",
+    ]
+    for stage_name, stats in report.items():
+        if stage_name == "_run":
+            continue
+        lines.append(
+            f"{stage_name:<22}{stats['count']:>8}{stats['errors']:>8}{stats['throughput_per_s']:>9.1f}"
+            f"{stats['mean_ms']:>9.1f}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}"
+        )
+    lines.append("(latencies in ms)")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Simulate concurrent callers against the KB tool path")
+    parser.add_argument("--concurrency", type=int, default=16, help="Simultaneous callers")
+    parser.add_argument("--calls", type=int, default=500, help="Total simulated tool calls")
+    parser.add_argument("--hit-ratio", type=float, default=0.8, help="Fraction of calls answerable from the KB")
+    parser.add_argument("--min-sim", type=float, default=0.5, help="Similarity cutoff, as used by the agent")
+    parser.add_argument("--questions", help="File with one KB question per line (seeded into the KB)")
+    parser.add_argument("--embedder", choices=["fake", "local"], default="fake",
+                        help="fake: exact hits/misses; local: feature-hashing provider")
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0, help="Simulated embedding provider latency")
+    parser.add_argument("--http-base-url", help="Also drive the HTTP API at this base URL")
+    parser.add_argument("--http-ratio", type=float, default=0.2, help="Fraction of operations sent to the HTTP API")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the call plan")
+    parser.add_argument("--keep-data", action="store_true", help="Do not delete rows created by the run")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run_load(args))
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
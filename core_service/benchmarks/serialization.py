@@ -0,0 +1,152 @@
+"""
+Serialization Benchmark - Listing response rendering, before and after the fast path
+
+Renders the same synthetic help request / knowledge base listings the way
+the routes used to (one Pydantic model per row, re-validated and encoded by
+FastAPI's default JSONResponse) and the way they do now (one TypeAdapter
+validation for the whole list, rendered with orjson; see
+core_service/api/responses.py). Also reports gzip/brotli size and time for
+the rendered body. No database or network needed.
+
+Usage (from the repo root):
+
+    python -m core_service.benchmarks.serialization --rows 1000 --repeat 50
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from core_service.api.middleware import BROTLI_QUALITY, GZIP_LEVEL, brotli
+from core_service.api.responses import HELP_REQUEST_LIST, KB_ENTRY_LIST, list_response
+from core_service.api.schemas.help_request import HelpRequestOut
+from core_service.api.schemas.knowledge_base import KnowledgeBaseOut
+from core_service.benchmarks.loadtest import percentile
+
+WORDS = "hours booking cancel color cut nails walk-in price parking deposit gift card refund stylist".split()
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "?"
+
+
+def help_request_rows(count: int, rng: random.Random) -> List[Dict]:
+    now = datetime.now(timezone.utc)
+    rows = []
+    for _ in range(count):
+        resolved = rng.random() < 0.5
+        rows.append({
+            "id": uuid.uuid4(),
+            "customer_id": uuid.uuid4(),
+            "question_text": _sentence(rng, 10),
+            "status": "resolved" if resolved else "pending",
+            "created_at": now,
+            "expires_at": now + timedelta(hours=1),
+            "resolved_at": now if resolved else None,
+            "answer_text": _sentence(rng, 25) if resolved else None,
+        })
+    return rows
+
+
+def kb_rows(count: int, rng: random.Random) -> List[Dict]:
+    now = datetime.now(timezone.utc)
+    return [
+        {"id": uuid.uuid4(), "question_text_example": _sentence(rng, 10), "answer_text": _sentence(rng, 30),
+         "categories": [], "created_at": now, "updated_at": now}
+        for _ in range(count)
+    ]
+
+
+def render_baseline(model, rows: List[Dict]) -> bytes:
+    """Previous path: per-row models, FastAPI response_model re-validation, stdlib JSON"""
+    items = [model(**row) for row in rows]
+    validated = [model.model_validate(item.model_dump()) for item in items]
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def render_fast(adapter, rows: List[Dict]) -> bytes:
+    """Current path: bulk TypeAdapter validation, orjson rendering"""
+    return list_response(adapter, rows).body
+
+
+def time_calls(fn: Callable[[], bytes], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)
+
+
+def compression_stats(body: bytes, repeat: int) -> List[Dict[str, float]]:
+    codecs = {"gzip": lambda data: zlib.compress(data, GZIP_LEVEL)}
+    if brotli is not None:
+        codecs["br"] = lambda data: brotli.compress(data, quality=BROTLI_QUALITY)
+    stats = []
+    for name, compress in codecs.items():
+        samples = time_calls(lambda: compress(body), repeat)
+        stats.append({"encoding": name, "ratio": len(body) / len(compress(body)), "p50_ms": percentile(samples, 50)})
+    return stats
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, List[Dict]]:
+    rng = random.Random(args.seed)
+    listings = {
+        "help_requests": (HelpRequestOut, HELP_REQUEST_LIST, help_request_rows(args.rows, rng)),
+        "knowledge_base": (KnowledgeBaseOut, KB_ENTRY_LIST, kb_rows(args.rows, rng)),
+    }
+    results = {"serialization": [], "compression": []}
+    for name, (model, adapter, rows) in listings.items():
+        baseline_body = render_baseline(model, rows)
+        fast_body = render_fast(adapter, rows)
+        # Same document either way
+        assert json.loads(baseline_body) == json.loads(fast_body)
+        for path, fn in (("baseline", lambda: render_baseline(model, rows)), ("fast", lambda: render_fast(adapter, rows))):
+            samples = time_calls(fn, args.repeat)
+            p50 = percentile(samples, 50)
+            results["serialization"].append({
+                "listing": name, "path": path, "rows": len(rows), "p50_ms": p50,
+                "p95_ms": percentile(samples, 95), "rows_per_s": len(rows) / (p50 / 1000) if p50 else 0.0,
+            })
+        for stat in compression_stats(fast_body, args.repeat):
+            results["compression"].append({"listing": name, "bytes": len(fast_body), **stat})
+    return results
+
+
+def format_report(results: Dict[str, List[Dict]]) -> str:
+    lines = [f"{'listing':<16}{'path':<10}{'rows':>7}{'p50 ms':>10}{'p95 ms':>10}{'rows/s':>12}"]
+    for r in results["serialization"]:
+        lines.append(f"{r['listing']:<16}{r['path']:<10}{r['rows']:>7}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['rows_per_s']:>12.0f}")
+    lines.append("")
+    lines.append(f"{'listing':<16}{'encoding':<10}{'bytes':>10}{'ratio':>8}{'p50 ms':>10}")
+    for r in results["compression"]:
+        lines.append(f"{r['listing']:<16}{r['encoding']:<10}{r['bytes']:>10}{r['ratio']:>8.1f}{r['p50_ms']:>10.2f}")
+    if brotli is None:
+        lines.append("(install brotli to include br)")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare listing serialization paths")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per listing")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    results = run_benchmark(args)
+    print(json.dumps(results, indent=2) if args.json else format_report(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,14 @@ from .help_requests_crud import (
     create_supervisor_response,
     update_help_request_status,
     get_help_request_with_answer,
+    iter_help_request_history,
+    get_next_pending_expiry,
+    get_help_requests_with_customers,
+    batch_resolve_help_requests,
+    claim_next_help_request,
+    heartbeat_claim,
+    release_claim,
+    HelpRequestConflictError,
 )
 
 # Knowledge Base CRUD
@@ -20,11 +28,31 @@ from .knowledge_base_crud import (
     update_kb,
     delete_kb,
     search_kb_by_embedding,
+    search_kb_lexical,
+    search_kb_hybrid,
+    get_existing_kb_keys,
+    bulk_upsert_kb,
+    iter_kb_export,
+    iter_kb_snapshot_rows,
+    embedding_columns_for_tag,
+)
+
+# Table change counters (HTTP caching)
+from .table_versions_crud import (
+    get_table_versions,
 )
 
 # Customer CRUD
 from .customer_crud import (
     create_customer,
+    upsert_customer_by_phone,
+)
+
+# Location CRUD
+from .location_crud import (
+    get_location,
+    list_locations,
+    create_location,
 )
 
 # Followup CRUD
@@ -46,6 +74,14 @@ __all__ = [
     "create_supervisor_response",
     "update_help_request_status",
     "get_help_request_with_answer",
+    "iter_help_request_history",
+    "get_next_pending_expiry",
+    "get_help_requests_with_customers",
+    "batch_resolve_help_requests",
+    "claim_next_help_request",
+    "heartbeat_claim",
+    "release_claim",
+    "HelpRequestConflictError",
     
     # Knowledge Base CRUD
     "list_kb",
@@ -53,9 +89,24 @@ __all__ = [
     "update_kb", 
     "delete_kb",
     "search_kb_by_embedding",
+    "search_kb_lexical",
+    "search_kb_hybrid",
+    "get_existing_kb_keys",
+    "bulk_upsert_kb",
+    "iter_kb_export",
+    "iter_kb_snapshot_rows",
+    
+    # Table change counters (HTTP caching)
+    "get_table_versions",
     
     # Customer CRUD
     "create_customer",
+    "upsert_customer_by_phone",
+    
+    # Location CRUD
+    "get_location",
+    "list_locations",
+    "create_location",
     
     # Followup CRUD
     "create_followup",
@@ -1,3 +1,6 @@
+import uuid
+from typing import Optional
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from ..session import SessionLocal
 from ..models import Customer
 
@@ -12,4 +15,29 @@ def create_customer(data: dict) -> Customer:
         session.refresh(customer)
         return customer
     finally:
-        session.close() 
\ No newline at end of file
+        session.close()
+
+
+def upsert_customer_by_phone(phone_e164: str, location_id: str, display_name: Optional[str] = None) -> uuid.UUID:
+    """
+    Id of a location's customer with this phone number, inserting the customer if new.
+
+    One INSERT ... ON CONFLICT DO NOTHING on customers_location_phone_uidx; only a
+    repeat caller pays for the follow-up SELECT. An existing customer's name is kept.
+    """
+    session = SessionLocal()
+    try:
+        customer_id = session.execute(
+            pg_insert(Customer)
+            .values(id=uuid.uuid4(), location_id=location_id, phone_e164=phone_e164, display_name=display_name)
+            .on_conflict_do_nothing(index_elements=[Customer.location_id, Customer.phone_e164])
+            .returning(Customer.id)
+        ).scalar()
+        if customer_id is None:
+            customer_id = session.query(Customer.id).filter(
+                Customer.location_id == location_id, Customer.phone_e164 == phone_e164
+            ).scalar()
+        session.commit()
+        return customer_id
+    finally:
+        session.close()
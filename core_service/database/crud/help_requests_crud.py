@@ -1,19 +1,50 @@
-from typing import List, Optional
-from sqlalchemy import and_
-from datetime import datetime, timezone
-from ..session import SessionLocal
-from ..models import HelpRequest, SupervisorResponse
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, func, insert, or_, select, union_all, update
+from sqlalchemy.orm import joinedload
+from datetime import datetime, timedelta, timezone
+from ..session import SessionLocal, read_only
+from .knowledge_base_crud import _take_normalized_key
+from ..models import (
+    DEFAULT_LOCATION_ID,
+    Followup,
+    FollowupArchive,
+    HelpRequest,
+    HelpRequestArchive,
+    KnowledgeBaseEntry,
+    SupervisorResponse,
+    SupervisorResponseArchive,
+)
 
+# (request, supervisor response, followup) models of the hot and archive tables
+_HOT_MODELS = (HelpRequest, SupervisorResponse, Followup)
+_ARCHIVE_MODELS = (HelpRequestArchive, SupervisorResponseArchive, FollowupArchive)
 
-def list_help_requests(status: Optional[str] = None) -> List[HelpRequest]:
-    """List help requests, optionally filtered by status
+
+class HelpRequestConflictError(Exception):
+    """A help request was already answered, or is claimed by another supervisor"""
+
+
+def _claim_is_free(now: datetime, supervisor_id: Optional[str] = None):
+    """Filter: the request is unclaimed, its lease ran out, or (if given) supervisor_id holds it"""
+    free = or_(HelpRequest.claimed_by.is_(None), HelpRequest.claim_expires_at.is_(None),
+               HelpRequest.claim_expires_at <= now)
+    if supervisor_id is not None:
+        free = or_(free, HelpRequest.claimed_by == supervisor_id)
+    return free
+
+
+def list_help_requests(status: Optional[str] = None, location_id: Optional[str] = None) -> List[HelpRequest]:
+    """List help requests, optionally filtered by status and location
     
     For pending requests, automatically excludes expired requests
     (where expires_at <= current time)
     """
-    session = SessionLocal()
+    session = read_only(SessionLocal())
     try:
         query = session.query(HelpRequest)
+        if location_id:
+            query = query.filter(HelpRequest.location_id == location_id)
         if status:
             if status == "pending":
                 # For pending requests, filter out expired ones
@@ -31,6 +62,26 @@ def list_help_requests(status: Optional[str] = None) -> List[HelpRequest]:
         session.close()
 
 
+def get_next_pending_expiry(location_id: Optional[str] = None) -> Optional[datetime]:
+    """
+    Earliest expires_at among pending requests (of a location, if given) that have not expired yet.
+
+    The pending listing changes when this passes, without any write.
+    """
+    session = read_only(SessionLocal())
+    try:
+        query = session.query(func.min(HelpRequest.expires_at)).filter(
+            HelpRequest.status == "pending",
+            HelpRequest.resolved_at.is_(None),
+            HelpRequest.expires_at > datetime.now(timezone.utc),
+        )
+        if location_id:
+            query = query.filter(HelpRequest.location_id == location_id)
+        return query.scalar()
+    finally:
+        session.close()
+
+
 def create_help_request(data: dict) -> HelpRequest:
     """Create a new help request"""
     session = SessionLocal()
@@ -45,13 +96,24 @@ def create_help_request(data: dict) -> HelpRequest:
 
 
 def create_supervisor_response(request_id: str, answer_text: str, responder_id: Optional[str] = None) -> Optional[SupervisorResponse]:
-    """Create a supervisor response for a help request"""
+    """Create a supervisor response for a help request
+
+    Raises:
+        HelpRequestConflictError: If the request already has an answer, or another
+            supervisor holds an unexpired claim on it
+    """
     session = SessionLocal()
     try:
-        # Verify help request exists
-        help_request = session.query(HelpRequest).filter(HelpRequest.id == request_id).first()
+        # Verify help request exists (locked, so two supervisors answering at once are serialized here)
+        help_request = session.query(HelpRequest).filter(HelpRequest.id == request_id).with_for_update().first()
         if not help_request:
             return None
+        if session.query(SupervisorResponse.id).filter(SupervisorResponse.help_request_id == request_id).first():
+            raise HelpRequestConflictError(f"Help request {request_id} has already been answered")
+        now = datetime.now(timezone.utc)
+        if not session.query(HelpRequest.id).filter(HelpRequest.id == request_id,
+                                                    _claim_is_free(now, responder_id)).first():
+            raise HelpRequestConflictError(f"Help request {request_id} is claimed by {help_request.claimed_by}")
         
         # Create supervisor response
         response = SupervisorResponse(
@@ -63,6 +125,108 @@ def create_supervisor_response(request_id: str, answer_text: str, responder_id:
         session.commit()
         session.refresh(response)
         return response
+    except HelpRequestConflictError:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def claim_next_help_request(supervisor_id: str, lease_s: float,
+                            location_id: Optional[str] = None) -> Optional[HelpRequest]:
+    """
+    Claim the most urgent (earliest expiring) pending help request for a supervisor.
+
+    Rows locked by another supervisor's claim transaction are skipped (FOR UPDATE
+    SKIP LOCKED), so concurrent claims never wait on each other or get the same
+    request. A supervisor holds one claim at a time: while its lease is live, the
+    request it already holds is returned again.
+
+    Args:
+        supervisor_id: Who claims
+        lease_s: Seconds until the claim lapses unless renewed with heartbeat_claim
+        location_id: Only claim this location's requests
+
+    Returns:
+        The claimed help request, or None if nothing is claimable
+    """
+    session = SessionLocal()
+    session.expire_on_commit = False  # Row is returned after the session is closed
+    try:
+        now = datetime.now(timezone.utc)
+        query = session.query(HelpRequest).filter(
+            HelpRequest.status == "pending",
+            HelpRequest.resolved_at.is_(None),
+            HelpRequest.expires_at > now,
+        )
+        if location_id:
+            query = query.filter(HelpRequest.location_id == location_id)
+
+        help_request = (
+            query.filter(HelpRequest.claimed_by == supervisor_id, HelpRequest.claim_expires_at > now)
+            .with_for_update()
+            .first()
+        ) or (
+            query.filter(_claim_is_free(now))
+            .order_by(HelpRequest.expires_at, HelpRequest.id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if help_request is None:
+            session.rollback()
+            return None
+        help_request.claimed_by = supervisor_id
+        help_request.claim_expires_at = now + timedelta(seconds=lease_s)
+        session.commit()
+        return help_request
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def heartbeat_claim(request_id: str, supervisor_id: str, lease_s: float) -> Optional[HelpRequest]:
+    """
+    Extend a supervisor's claim on a pending help request by lease_s from now.
+
+    A lapsed lease can still be renewed as long as nobody else has claimed the request.
+
+    Returns:
+        The help request, or None if it is no longer pending or claimed by supervisor_id
+    """
+    session = SessionLocal()
+    session.expire_on_commit = False  # Row is returned after the session is closed
+    try:
+        help_request = (
+            session.query(HelpRequest)
+            .filter(HelpRequest.id == request_id, HelpRequest.status == "pending",
+                    HelpRequest.claimed_by == supervisor_id)
+            .with_for_update()
+            .first()
+        )
+        if help_request is None:
+            session.rollback()
+            return None
+        help_request.claim_expires_at = datetime.now(timezone.utc) + timedelta(seconds=lease_s)
+        session.commit()
+        return help_request
+    finally:
+        session.close()
+
+
+def release_claim(request_id: str, supervisor_id: str) -> bool:
+    """Give up a supervisor's claim on a help request; False if it did not hold one"""
+    session = SessionLocal()
+    try:
+        released = session.execute(
+            update(HelpRequest)
+            .where(HelpRequest.id == request_id, HelpRequest.claimed_by == supervisor_id)
+            .values(claimed_by=None, claim_expires_at=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        session.commit()
+        return released > 0
     finally:
         session.close()
 
@@ -88,22 +252,183 @@ def update_help_request_status(request_id: str, status: str = "resolved", cancel
         session.close()
 
 
-def get_help_request_with_answer(request_id: str) -> Optional[dict]:
-    """Get help request with its supervisor response (answer)"""
+def get_help_requests_with_customers(request_ids: Sequence[Any]) -> List[HelpRequest]:
+    """Get help requests by id (hot table only) with their customer loaded"""
+    if not request_ids:
+        return []
+    session = read_only(SessionLocal())
+    try:
+        return (
+            session.query(HelpRequest)
+            .options(joinedload(HelpRequest.customer))
+            .filter(HelpRequest.id.in_(request_ids))
+            .all()
+        )
+    finally:
+        session.close()
+
+
+def batch_resolve_help_requests(
+    request_ids: Sequence[Any],
+    answer_text: str,
+    responder_id: Optional[str],
+    kb_entry: Dict[str, Any],
+    followups: List[Dict[str, Any]],
+) -> Tuple[List[HelpRequest], Optional[KnowledgeBaseEntry]]:
+    """
+    Resolve several help requests with one answer in a single transaction: a supervisor
+    response per request, one knowledge base entry and the customer followups, all
+    inserted in bulk.
+
+    Requests no longer pending once locked (resolved or cancelled concurrently), or
+    claimed by another supervisor, are left alone, along with their followups.
+
+    Args:
+        request_ids: Help requests to resolve
+        answer_text: Supervisor answer stored for every request
+        responder_id: Who answered
+        kb_entry: Column values of the knowledge base entry to create
+        followups: Followup rows (with help_request_id) to insert for resolved requests
+
+    Returns:
+        (resolved help requests, created knowledge base entry), or ([], None) if none was pending
+    """
     session = SessionLocal()
+    session.expire_on_commit = False  # Rows are returned after the session is closed
     try:
-        help_request = session.query(HelpRequest).filter(HelpRequest.id == request_id).first()
-        if not help_request:
-            return None
-        
-        # Get supervisor response
-        supervisor_response = session.query(SupervisorResponse).filter(
-            SupervisorResponse.help_request_id == request_id
-        ).first()
-        
-        return {
-            "help_request": help_request,
-            "supervisor_response": supervisor_response
-        }
+        now = datetime.now(timezone.utc)
+        locked = (
+            session.query(HelpRequest)
+            .filter(HelpRequest.id.in_(request_ids), HelpRequest.status == "pending",
+                    _claim_is_free(now, responder_id))
+            .order_by(HelpRequest.id)  # Consistent lock order across concurrent batches
+            .with_for_update()
+            .all()
+        )
+        if not locked:
+            session.rollback()
+            return [], None
+        ids = [hr.id for hr in locked]
+
+        session.execute(insert(SupervisorResponse), [
+            {"id": uuid.uuid4(), "help_request_id": request_id, "responder_id": responder_id, "answer_text": answer_text}
+            for request_id in ids
+        ])
+        session.execute(
+            update(HelpRequest)
+            .where(HelpRequest.id.in_(ids))
+            .values(status="resolved", resolved_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        _take_normalized_key(session, kb_entry.get("location_id") or DEFAULT_LOCATION_ID, kb_entry.get("normalized_key"))
+        kb_row = KnowledgeBaseEntry(**kb_entry)
+        session.add(kb_row)
+        locked_ids = set(ids)
+        followup_rows = [{"id": uuid.uuid4(), **f} for f in followups if f["help_request_id"] in locked_ids]
+        if followup_rows:
+            session.execute(insert(Followup), followup_rows)
+        session.commit()
+
+        for hr in locked:
+            hr.status = "resolved"
+            hr.resolved_at = now
+        return locked, kb_row
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def get_help_request_with_answer(request_id: str) -> Optional[dict]:
+    """Get help request with its supervisor response (answer), looking in the archive if needed"""
+    session = read_only(SessionLocal())
+    try:
+        for request_model, response_model, _ in (_HOT_MODELS, _ARCHIVE_MODELS):
+            help_request = session.query(request_model).filter(request_model.id == request_id).first()
+            if not help_request:
+                continue
+            
+            # Get supervisor response
+            supervisor_response = session.query(response_model).filter(
+                response_model.help_request_id == request_id
+            ).first()
+            
+            return {
+                "help_request": help_request,
+                "supervisor_response": supervisor_response
+            }
+        return None
+    finally:
+        session.close()
+
+
+def iter_help_request_history(
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    statuses: Optional[List[str]] = None,
+    batch_size: int = 1000,
+    location_id: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream help requests (oldest first) joined with their supervisor response and followup.
+
+    Covers both the hot and the archive tables. Rows come from a server-side cursor
+    `batch_size` at a time, so memory use does not grow with the date range. Both joins
+    are one-to-one (unique help_request_id).
+
+    Args:
+        created_from: Include requests created at or after this time
+        created_to: Include requests created before this time
+        statuses: Include only these statuses (no expiry filtering, unlike list_help_requests)
+        batch_size: Rows fetched per round trip
+        location_id: Include only this location's requests
+    """
+    parts = []
+    for request_model, response_model, followup_model in (_HOT_MODELS, _ARCHIVE_MODELS):
+        part = (
+            select(
+                request_model.id,
+                request_model.location_id,
+                request_model.call_id,
+                request_model.customer_id,
+                request_model.question_text,
+                request_model.normalized_key,
+                request_model.status,
+                request_model.created_at,
+                request_model.expires_at,
+                request_model.resolved_at,
+                request_model.cancel_reason,
+                response_model.answer_text,
+                response_model.responder_id,
+                response_model.created_at.label("answered_at"),
+                followup_model.channel.label("followup_channel"),
+                followup_model.status.label("followup_status"),
+                followup_model.sent_at.label("followup_sent_at"),
+            )
+            .outerjoin(response_model, response_model.help_request_id == request_model.id)
+            .outerjoin(followup_model, followup_model.help_request_id == request_model.id)
+        )
+        if created_from is not None:
+            part = part.where(request_model.created_at >= created_from)
+        if created_to is not None:
+            part = part.where(request_model.created_at < created_to)
+        if statuses:
+            part = part.where(request_model.status.in_(statuses))
+        if location_id:
+            part = part.where(request_model.location_id == location_id)
+        parts.append(part)
+
+    history = union_all(*parts).subquery()
+    query = (
+        select(history)
+        .order_by(history.c.created_at, history.c.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    session = read_only(SessionLocal())
+    try:
+        for row in session.execute(query):
+            yield dict(row._mapping)
     finally:
-        session.close() 
\ No newline at end of file
+        session.close()
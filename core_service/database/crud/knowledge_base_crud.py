@@ -1,15 +1,42 @@
-from typing import List, Optional
-from sqlalchemy import or_, func
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import or_, func, text, bindparam, cast, select, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import datetime
-from ..session import SessionLocal
-from ..models import KnowledgeBaseEntry
+from pgvector.sqlalchemy import BIT, HALFVEC
+from ..session import SessionLocal, read_only
+from ..models import DEFAULT_LOCATION_ID, KnowledgeBaseEntry
+from ..vector_storage import (
+    EMBEDDING_RESCORE_FACTOR,
+    EMBEDDING_STORAGE,
+    STORAGE_BINARY,
+    column_type,
+    column_type_sql,
+    quantized_sql,
+)
 
+# How long a process trusts its cached copy of kb_embedding_slots
+KB_EMBEDDING_SLOTS_TTL_S = float(os.getenv("KB_EMBEDDING_SLOTS_TTL_S", "5"))
+_slots_lock = threading.Lock()
+_slots_cache = {"expires_at": 0.0, "shadow_tag": None}
 
-def list_kb(q: Optional[str] = None) -> List[KnowledgeBaseEntry]:
-    """List knowledge base entries, optionally filtered by search query"""
-    session = SessionLocal()
+# Must match the expression of knowledge_base_fts_idx (db/init/003_kb_text_search.sql)
+KB_TSVECTOR_SQL = "to_tsvector('english', question_text_example || ' ' || answer_text)"
+
+# Match any query term (plainto_tsquery alone requires all of them, too strict for spoken questions)
+KB_TSQUERY_SQL = "replace(plainto_tsquery('english', :query_text)::text, '&', '|')::tsquery"
+
+
+def list_kb(q: Optional[str] = None, location_id: Optional[str] = None) -> List[KnowledgeBaseEntry]:
+    """List knowledge base entries, optionally filtered by search query and location"""
+    session = read_only(SessionLocal())
     try:
         query = session.query(KnowledgeBaseEntry)
+        if location_id:
+            query = query.filter(KnowledgeBaseEntry.location_id == location_id)
         if q:
             search_term = f"%{q}%"
             query = query.filter(
@@ -23,10 +50,24 @@ def list_kb(q: Optional[str] = None) -> List[KnowledgeBaseEntry]:
         session.close()
 
 
+def _take_normalized_key(session, location_id: str, normalized_key: Optional[str], entry_id=None) -> None:
+    """Clear the dedup key from the location's other entry asking the same question; the newest entry holds it"""
+    if not normalized_key:
+        return
+    query = session.query(KnowledgeBaseEntry).filter(
+        KnowledgeBaseEntry.location_id == location_id,
+        KnowledgeBaseEntry.normalized_key == normalized_key,
+    )
+    if entry_id is not None:
+        query = query.filter(KnowledgeBaseEntry.id != entry_id)
+    query.update({KnowledgeBaseEntry.normalized_key: None}, synchronize_session=False)
+
+
 def create_kb(data: dict) -> KnowledgeBaseEntry:
     """Create a new knowledge base entry"""
     session = SessionLocal()
     try:
+        _take_normalized_key(session, data.get("location_id") or DEFAULT_LOCATION_ID, data.get("normalized_key"))
         kb_entry = KnowledgeBaseEntry(**data)
         session.add(kb_entry)
         session.commit()
@@ -44,6 +85,8 @@ def update_kb(entry_id: str, data: dict) -> Optional[KnowledgeBaseEntry]:
         if not kb_entry:
             return None
         
+        if "normalized_key" in data:
+            _take_normalized_key(session, kb_entry.location_id, data["normalized_key"], entry_id=kb_entry.id)
         for key, value in data.items():
             if hasattr(kb_entry, key):
                 setattr(kb_entry, key, value)
@@ -71,29 +114,236 @@ def delete_kb(entry_id: str) -> bool:
         session.close()
 
 
-def search_kb_by_embedding(query_vec: List[float], k: int = 5) -> List[dict]:
+def _shadow_slot_tag() -> Optional[str]:
+    """Provider tag held by the embedding_next slot (cached for KB_EMBEDDING_SLOTS_TTL_S)"""
+    with _slots_lock:
+        if time.monotonic() < _slots_cache["expires_at"]:
+            return _slots_cache["shadow_tag"]
+    session = SessionLocal()
+    try:
+        tag = session.execute(
+            text("SELECT model_tag FROM kb_embedding_slots WHERE column_name = 'embedding_next'")
+        ).scalar()
+    except Exception:
+        tag = None  # Slots table not created yet (db/init/005_kb_reembed.sql)
+    finally:
+        session.close()
+    with _slots_lock:
+        _slots_cache.update(expires_at=time.monotonic() + KB_EMBEDDING_SLOTS_TTL_S, shadow_tag=tag)
+    return tag
+
+
+def embedding_columns_for_tag(embedding_model: Optional[str]) -> Tuple[str, str]:
+    """
+    (vector column, tag column) holding primary vectors with the given provider tag.
+
+    Normally `embedding`. While a re-embedding job fills the shadow slot, and after its
+    cutover swaps the slots, queries tagged with the shadow slot's model read
+    `embedding_next` instead, so processes on either model keep finding their vectors.
+    """
+    if embedding_model and embedding_model == _shadow_slot_tag():
+        return "embedding_next", "embedding_next_model"
+    return "embedding", "embedding_model"
+
+
+def get_existing_kb_keys(keys: List[str], location_id: str = DEFAULT_LOCATION_ID) -> Set[str]:
+    """Return the subset of normalized keys that already exist in a location's knowledge base"""
+    if not keys:
+        return set()
+    session = SessionLocal()
+    try:
+        rows = session.query(KnowledgeBaseEntry.normalized_key).filter(
+            KnowledgeBaseEntry.location_id == location_id,
+            KnowledgeBaseEntry.normalized_key.in_(keys),
+        ).all()
+        return {r[0] for r in rows}
+    finally:
+        session.close()
+
+
+# Columns an import may overwrite when a normalized_key already exists
+KB_UPSERT_COLUMNS = (
+    "question_text_example",
+    "answer_text",
+    "embedding",
+    "embedding_model",
+    "fallback_embedding",
+    "fallback_embedding_model",
+)
+
+
+def bulk_upsert_kb(rows: List[Dict[str, Any]], update_existing: bool = False, chunk_size: int = 500,
+                   location_id: str = DEFAULT_LOCATION_ID) -> Dict[str, int]:
+    """
+    Insert many knowledge base entries in one transaction with multi-row INSERTs,
+    deduplicated on (location_id, normalized_key) (knowledge_base_normalized_key_uidx).
+
+    Args:
+        rows: Column dicts, all with the same keys and a unique, non-null normalized_key
+        update_existing: Overwrite entries whose key exists instead of skipping them
+        chunk_size: Rows per INSERT statement
+        location_id: Location the entries belong to
+
+    Returns:
+        dict: Counts of inserted, updated and skipped rows
+    """
+    session = SessionLocal()
+    try:
+        inserted = updated = 0
+        for start in range(0, len(rows), chunk_size):
+            chunk = [{"id": uuid.uuid4(), **row, "location_id": location_id} for row in rows[start:start + chunk_size]]
+            stmt = pg_insert(KnowledgeBaseEntry).values(chunk)
+            conflict_target = {
+                "index_elements": [KnowledgeBaseEntry.location_id, KnowledgeBaseEntry.normalized_key],
+                "index_where": KnowledgeBaseEntry.normalized_key.isnot(None),
+            }
+            if update_existing:
+                assignments = {column: stmt.excluded[column] for column in KB_UPSERT_COLUMNS if column in chunk[0]}
+                assignments["updated_at"] = func.now()
+                # The shadow vector no longer matches the question; the re-embed job's catch-up refills it
+                assignments["embedding_next"] = None
+                assignments["embedding_next_model"] = None
+                stmt = stmt.on_conflict_do_update(**conflict_target, set_=assignments)
+            else:
+                stmt = stmt.on_conflict_do_nothing(**conflict_target)
+            # xmax = 0 only for freshly inserted tuples, which separates inserts from updates
+            results = session.execute(stmt.returning(literal_column("xmax = 0").label("inserted"))).all()
+            chunk_inserted = sum(1 for r in results if r.inserted)
+            inserted += chunk_inserted
+            updated += len(results) - chunk_inserted
+        session.commit()
+        return {"inserted": inserted, "updated": updated, "skipped": len(rows) - inserted - updated}
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def iter_kb_export(include_embeddings: bool = False, batch_size: int = 500,
+                   location_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream every knowledge base entry (oldest first; of one location if given) with a
+    server-side cursor, holding at most `batch_size` rows in memory.
+    """
+    columns = [
+        KnowledgeBaseEntry.id,
+        KnowledgeBaseEntry.question_text_example,
+        KnowledgeBaseEntry.answer_text,
+        KnowledgeBaseEntry.normalized_key,
+        KnowledgeBaseEntry.valid_to,
+        KnowledgeBaseEntry.created_at,
+        KnowledgeBaseEntry.updated_at,
+    ]
+    if include_embeddings:
+        columns += [
+            KnowledgeBaseEntry.embedding,
+            KnowledgeBaseEntry.embedding_model,
+            KnowledgeBaseEntry.fallback_embedding,
+            KnowledgeBaseEntry.fallback_embedding_model,
+        ]
+    session = read_only(SessionLocal())
+    try:
+        query = (
+            select(*columns)
+            .order_by(KnowledgeBaseEntry.created_at, KnowledgeBaseEntry.id)
+            .execution_options(yield_per=batch_size)
+        )
+        if location_id:
+            query = query.where(KnowledgeBaseEntry.location_id == location_id)
+        for row in session.execute(query):
+            yield dict(row._mapping)
+    finally:
+        session.close()
+
+
+def iter_kb_snapshot_rows(batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """
+    Stream every entry with a primary embedding, grouped by (location_id, embedding_model),
+    for the agents' KB snapshot file (api/services/kb_snapshot.py).
+    """
+    session = read_only(SessionLocal())
+    try:
+        query = (
+            select(
+                KnowledgeBaseEntry.id,
+                KnowledgeBaseEntry.location_id,
+                KnowledgeBaseEntry.question_text_example,
+                KnowledgeBaseEntry.answer_text,
+                KnowledgeBaseEntry.valid_to,
+                KnowledgeBaseEntry.embedding,
+                KnowledgeBaseEntry.embedding_model,
+            )
+            .where(KnowledgeBaseEntry.embedding.isnot(None))
+            .order_by(KnowledgeBaseEntry.location_id, KnowledgeBaseEntry.embedding_model, KnowledgeBaseEntry.id)
+            .execution_options(yield_per=batch_size)
+        )
+        for row in session.execute(query):
+            yield dict(row._mapping)
+    finally:
+        session.close()
+
+
+def search_kb_by_embedding(
+    query_vec: List[float],
+    k: int = 5,
+    embedding_model: Optional[str] = None,
+    use_fallback: bool = False,
+    location_id: str = DEFAULT_LOCATION_ID,
+) -> List[dict]:
     """
     Vector KNN over knowledge_base using pgvector cosine distance, via SQLAlchemy's Vector comparator API.
     Returns rows with a 'sim' field (cosine similarity in [0,1]).
+
+    Args:
+        query_vec: Query embedding
+        k: Number of nearest entries to return
+        embedding_model: Provider tag of query_vec; only rows embedded by the same provider are compared
+        use_fallback: Search the degraded-mode fallback_embedding column instead of embedding
+        location_id: Location whose entries are searched (only its partition is scanned)
     """
-    session = SessionLocal()
+    session = read_only(SessionLocal())
     try:
+        if use_fallback:
+            vector_name, model_name = "fallback_embedding", "fallback_embedding_model"
+        else:
+            vector_name, model_name = embedding_columns_for_tag(embedding_model)
+        vector_column = getattr(KnowledgeBaseEntry, vector_name)
+        model_column = getattr(KnowledgeBaseEntry, model_name)
+
         # Use comparator for clarity; cosine_distance returns distance in [0, 2]
-        distance_expr = KnowledgeBaseEntry.embedding.cosine_distance(query_vec)
+        distance_expr = vector_column.cosine_distance(query_vec)
         sim_expr = (1 - distance_expr).label('sim')
 
-        rows = (
+        query = (
             session.query(
                 KnowledgeBaseEntry.id,
                 KnowledgeBaseEntry.question_text_example,
                 KnowledgeBaseEntry.answer_text,
                 sim_expr,
             )
+            .filter(KnowledgeBaseEntry.location_id == location_id)
             .filter(or_(KnowledgeBaseEntry.valid_to.is_(None), KnowledgeBaseEntry.valid_to > func.now()))
-            .order_by(distance_expr)
-            .limit(k)
-            .all()
         )
+        if embedding_model:
+            query = query.filter(model_column == embedding_model)
+        if use_fallback:
+            query = query.filter(vector_column.isnot(None))
+        if EMBEDDING_STORAGE == STORAGE_BINARY:
+            # Hamming-distance candidates from the binary index, rescored below with exact cosine distance
+            dims = len(query_vec)
+            hamming_expr = cast(func.binary_quantize(vector_column), BIT(dims)).hamming_distance(
+                cast(func.binary_quantize(cast(query_vec, HALFVEC(dims))), BIT(dims))
+            )
+            candidates = (
+                query.with_entities(KnowledgeBaseEntry.id)
+                .order_by(hamming_expr)
+                .limit(k * EMBEDDING_RESCORE_FACTOR)
+                .subquery()
+            )
+            query = query.filter(KnowledgeBaseEntry.id.in_(select(candidates.c.id)))
+
+        rows = query.order_by(distance_expr).limit(k).all()
         # convert to plain dicts
         return [
             {
@@ -105,4 +355,161 @@ def search_kb_by_embedding(query_vec: List[float], k: int = 5) -> List[dict]:
             for r in rows
         ]
     finally:
-        session.close() 
\ No newline at end of file
+        session.close()
+
+
+def search_kb_lexical(query_text: str, k: int = 5, location_id: str = DEFAULT_LOCATION_ID) -> List[dict]:
+    """
+    Index-backed lexical search (full-text OR trigram match) over knowledge_base.
+    Needs no embedding, so it is the degraded-mode retrieval path.
+    Returns rows with a 'sim' field (trigram similarity of the question text in [0,1]).
+    """
+    session = read_only(SessionLocal())
+    try:
+        sql = text(f"""
+            SELECT id, question_text_example, answer_text,
+                   similarity(question_text_example, :query_text) AS sim
+            FROM knowledge_base
+            WHERE location_id = :location_id
+              AND (valid_to IS NULL OR valid_to > now())
+              AND ({KB_TSVECTOR_SQL} @@ {KB_TSQUERY_SQL} OR question_text_example % :query_text)
+            ORDER BY sim DESC
+            LIMIT :k
+        """)
+        rows = session.execute(sql, {"query_text": query_text, "k": k, "location_id": location_id}).all()
+        return [
+            {
+                "id": r.id,
+                "question_text_example": r.question_text_example,
+                "answer_text": r.answer_text,
+                "sim": float(r.sim),
+            }
+            for r in rows
+        ]
+    finally:
+        session.close()
+
+
+def search_kb_hybrid(
+    query_text: str,
+    query_vec: List[float],
+    k: int = 5,
+    candidates: int = 20,
+    embedding_model: Optional[str] = None,
+    use_fallback: bool = False,
+    rrf_k: int = 60,
+    location_id: str = DEFAULT_LOCATION_ID,
+) -> List[dict]:
+    """
+    Hybrid retrieval: vector KNN and full-text candidates fetched in one round trip
+    and merged with reciprocal rank fusion (score = sum of 1 / (rrf_k + rank)).
+
+    Every merged row also gets its cosine 'sim' to the query, so callers can keep
+    applying the same similarity cutoff as the pure vector search.
+
+    Args:
+        query_text: Raw question text for the lexical leg
+        query_vec: Query embedding for the vector leg
+        k: Number of fused rows to return
+        candidates: Candidates taken from each leg before fusion
+        embedding_model: Provider tag of query_vec; rows from other providers get no vector rank/sim
+        use_fallback: Use the fallback_embedding column instead of embedding
+        rrf_k: RRF damping constant
+        location_id: Location whose entries are searched (only its partition is scanned)
+    """
+    session = read_only(SessionLocal())
+    try:
+        # Column names are chosen from constants, never from input
+        if use_fallback:
+            vector_column, model_column = "fallback_embedding", "fallback_embedding_model"
+        else:
+            vector_column, model_column = embedding_columns_for_tag(embedding_model)
+        model_filter = f"AND {model_column} = :embedding_model" if embedding_model else ""
+        kb_model_filter = f"AND kb.{model_column} = :embedding_model" if embedding_model else ""
+        query_vec_sql = f"CAST(:query_vec AS {column_type_sql(len(query_vec))})"
+        if EMBEDDING_STORAGE == STORAGE_BINARY:
+            # Hamming-distance candidates from the binary index, then exact cosine rescoring
+            vec_sql = f"""
+                SELECT id, distance FROM (
+                    SELECT id, {vector_column} <=> {query_vec_sql} AS distance
+                    FROM knowledge_base
+                    WHERE location_id = :location_id
+                      AND (valid_to IS NULL OR valid_to > now())
+                      AND {vector_column} IS NOT NULL {model_filter}
+                    ORDER BY {quantized_sql(vector_column, len(query_vec))} <~> {quantized_sql(query_vec_sql, len(query_vec))}
+                    LIMIT :candidates * :rescore_factor
+                ) hamming
+                ORDER BY distance
+                LIMIT :candidates
+            """
+        else:
+            vec_sql = f"""
+                SELECT id, {vector_column} <=> {query_vec_sql} AS distance
+                FROM knowledge_base
+                WHERE location_id = :location_id
+                  AND (valid_to IS NULL OR valid_to > now())
+                  AND {vector_column} IS NOT NULL {model_filter}
+                ORDER BY {vector_column} <=> {query_vec_sql}
+                LIMIT :candidates
+            """
+
+        sql = text(f"""
+            WITH vec AS ({vec_sql}),
+            vec_ranked AS (
+                SELECT id, row_number() OVER (ORDER BY distance) AS rnk FROM vec
+            ),
+            lex AS (
+                SELECT id, ts_rank_cd({KB_TSVECTOR_SQL}, {KB_TSQUERY_SQL}, 32) AS lexical_rank
+                FROM knowledge_base
+                WHERE location_id = :location_id
+                  AND (valid_to IS NULL OR valid_to > now())
+                  AND {KB_TSVECTOR_SQL} @@ {KB_TSQUERY_SQL}
+                ORDER BY lexical_rank DESC
+                LIMIT :candidates
+            ),
+            lex_ranked AS (
+                SELECT id, lexical_rank, row_number() OVER (ORDER BY lexical_rank DESC) AS rnk FROM lex
+            ),
+            fused AS (
+                SELECT COALESCE(v.id, l.id) AS id,
+                       l.lexical_rank,
+                       COALESCE(1.0 / (:rrf_k + v.rnk), 0) + COALESCE(1.0 / (:rrf_k + l.rnk), 0) AS rrf_score
+                FROM vec_ranked v
+                FULL OUTER JOIN lex_ranked l ON l.id = v.id
+            )
+            SELECT kb.id, kb.question_text_example, kb.answer_text,
+                   CASE WHEN kb.{vector_column} IS NOT NULL {kb_model_filter}
+                        THEN 1 - (kb.{vector_column} <=> {query_vec_sql}) END AS sim,
+                   f.lexical_rank, f.rrf_score
+            FROM fused f
+            JOIN knowledge_base kb ON kb.location_id = :location_id AND kb.id = f.id
+            ORDER BY f.rrf_score DESC
+            LIMIT :k
+        """).bindparams(bindparam("query_vec", type_=column_type(len(query_vec))))
+
+        params = {
+            "query_text": query_text,
+            "query_vec": query_vec,
+            "k": k,
+            "candidates": candidates,
+            "rrf_k": rrf_k,
+            "rescore_factor": EMBEDDING_RESCORE_FACTOR,
+            "location_id": location_id,
+        }
+        if embedding_model:
+            params["embedding_model"] = embedding_model
+
+        rows = session.execute(sql, params).all()
+        return [
+            {
+                "id": r.id,
+                "question_text_example": r.question_text_example,
+                "answer_text": r.answer_text,
+                "sim": float(r.sim) if r.sim is not None else None,
+                "lexical_rank": float(r.lexical_rank) if r.lexical_rank is not None else None,
+                "rrf_score": float(r.rrf_score),
+            }
+            for r in rows
+        ]
+    finally:
+        session.close()
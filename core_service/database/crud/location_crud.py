@@ -0,0 +1,34 @@
+from typing import List, Optional
+from ..session import SessionLocal, read_only
+from ..models import Location
+
+
+def get_location(location_id: str) -> Optional[Location]:
+    """Get a location by id"""
+    session = read_only(SessionLocal())
+    try:
+        return session.query(Location).filter(Location.id == location_id).first()
+    finally:
+        session.close()
+
+
+def list_locations() -> List[Location]:
+    """List all locations"""
+    session = read_only(SessionLocal())
+    try:
+        return session.query(Location).order_by(Location.id).all()
+    finally:
+        session.close()
+
+
+def create_location(data: dict) -> Location:
+    """Create a location (its knowledge base partition is created by a trigger, see db/init/009_locations.sql)"""
+    session = SessionLocal()
+    try:
+        location = Location(**data)
+        session.add(location)
+        session.commit()
+        session.refresh(location)
+        return location
+    finally:
+        session.close()
@@ -0,0 +1,34 @@
+import logging
+from typing import Dict, Optional, Sequence
+from sqlalchemy import bindparam, text
+from ..session import SessionLocal, read_only
+
+logger = logging.getLogger("crud.table_versions")
+
+
+def get_table_versions(table_names: Sequence[str]) -> Optional[Dict[str, int]]:
+    """
+    Change counters of the given tables, bumped by triggers on every write
+    (db/init/006_table_versions.sql) except help request claim lease updates
+    (013_help_request_version_columns.sql).
+
+    Returns:
+        {table_name: version}, or None if the counters are unavailable
+        (e.g. the migration has not been applied)
+    """
+    session = read_only(SessionLocal())
+    try:
+        rows = session.execute(
+            text("SELECT table_name, version FROM table_versions WHERE table_name IN :names")
+            .bindparams(bindparam("names", expanding=True)),
+            {"names": list(table_names)},
+        ).all()
+    except Exception as e:
+        logger.debug(f"Table versions unavailable: {e}")
+        return None
+    finally:
+        session.close()
+    versions = {row.table_name: row.version for row in rows}
+    if set(versions) != set(table_names):
+        return None
+    return versions
@@ -1,19 +1,33 @@
-from sqlalchemy import Column, String, Text, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, String, Text, DateTime, Boolean, ForeignKey, Index, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
-from pgvector.sqlalchemy import Vector
 from .session import Base
+from .vector_storage import column_type
 import uuid
 from datetime import timedelta
 
+# Location that rows written before multi-location support (db/init/009_locations.sql) belong to
+DEFAULT_LOCATION_ID = "default"
+
+
+class Location(Base):
+    __tablename__ = "locations"
+    
+    id = Column(Text, primary_key=True)  # Slug ([a-z0-9_]); also names its knowledge_base partition
+    name = Column(Text, nullable=False)
+    city = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 
 class Customer(Base):
     __tablename__ = "customers"
+    __table_args__ = (Index("customers_location_phone_uidx", "location_id", "phone_e164", unique=True),)
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    location_id = Column(Text, ForeignKey("locations.id"), nullable=False, default=DEFAULT_LOCATION_ID)
     display_name = Column(Text)
-    phone_e164 = Column(Text, unique=True)
+    phone_e164 = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
@@ -33,6 +47,7 @@ class HelpRequest(Base):
     __tablename__ = "help_requests"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    location_id = Column(Text, ForeignKey("locations.id"), nullable=False, default=DEFAULT_LOCATION_ID)
     call_id = Column(UUID(as_uuid=True), ForeignKey("calls.id"))
     customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id"), nullable=False)
     question_text = Column(Text, nullable=False)
@@ -42,6 +57,9 @@ class HelpRequest(Base):
     expires_at = Column(DateTime(timezone=True), nullable=False, default=func.now() + timedelta(hours=1))
     resolved_at = Column(DateTime(timezone=True))
     cancel_reason = Column(Text)
+    # Supervisor working on the request, until claim_expires_at (renewed by heartbeats)
+    claimed_by = Column(Text)
+    claim_expires_at = Column(DateTime(timezone=True))
     
     # Relationships
     customer = relationship("Customer")
@@ -62,17 +80,25 @@ class SupervisorResponse(Base):
 
 
 class KnowledgeBaseEntry(Base):
+    # Partitioned by location_id (the table's primary key is (location_id, id); id alone is unique)
     __tablename__ = "knowledge_base"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    location_id = Column(Text, ForeignKey("locations.id"), nullable=False, default=DEFAULT_LOCATION_ID)
     normalized_key = Column(Text)
     question_text_example = Column(Text, nullable=False)
     answer_text = Column(Text, nullable=False)
-    source_help_request_id = Column(UUID(as_uuid=True), ForeignKey("help_requests.id"))
+    source_help_request_id = Column(UUID(as_uuid=True))  # help_requests.id, or help_requests_archive.id once archived
     valid_to = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
-    embedding = Column(Vector(1536), nullable=False)  # Store embedding as pgvector for semantic search
+    embedding = Column(column_type(), nullable=False)  # Store embedding as pgvector for semantic search (see vector_storage.py)
+    embedding_model = Column(Text)  # Provider tag ("openai:text-embedding-3-small") that produced `embedding`
+    fallback_embedding = Column(column_type())  # Degraded-mode embedding from the fallback provider
+    fallback_embedding_model = Column(Text)
+    # Shadow slot filled by jobs/reembed_knowledge_base.py before a model cutover swaps it with `embedding`
+    embedding_next = Column(column_type())
+    embedding_next_model = Column(Text)
 
 
 class Followup(Base):
@@ -89,4 +115,48 @@ class Followup(Base):
     
     # Relationships
     help_request = relationship("HelpRequest")
-    customer = relationship("Customer") 
\ No newline at end of file
+    customer = relationship("Customer")
+
+
+# Finished requests moved out of the hot tables by archive_help_requests() (db/init/007_help_request_archive.sql).
+# Same columns as the hot tables, without foreign keys.
+
+class HelpRequestArchive(Base):
+    __tablename__ = "help_requests_archive"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    location_id = Column(Text, nullable=False, default=DEFAULT_LOCATION_ID)
+    call_id = Column(UUID(as_uuid=True))
+    customer_id = Column(UUID(as_uuid=True), nullable=False)
+    question_text = Column(Text, nullable=False)
+    normalized_key = Column(Text)
+    status = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    resolved_at = Column(DateTime(timezone=True))
+    cancel_reason = Column(Text)
+    claimed_by = Column(Text)
+    claim_expires_at = Column(DateTime(timezone=True))
+
+
+class SupervisorResponseArchive(Base):
+    __tablename__ = "supervisor_responses_archive"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    help_request_id = Column(UUID(as_uuid=True), unique=True, nullable=False)
+    responder_id = Column(Text)
+    answer_text = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+
+
+class FollowupArchive(Base):
+    __tablename__ = "followups_archive"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    help_request_id = Column(UUID(as_uuid=True), nullable=False)
+    customer_id = Column(UUID(as_uuid=True), nullable=False)
+    channel = Column(Text, nullable=False)
+    payload = Column(JSON)
+    status = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    sent_at = Column(DateTime(timezone=True))
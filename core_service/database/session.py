@@ -1,9 +1,18 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from dotenv import load_dotenv, find_dotenv
 
+from core_service.observability.db import instrument_engine
+from core_service.observability.metrics import DB_READ_ROUTING, DB_REPLICA_LAG_SECONDS
+
 # Load environment variables from repo root
 load_dotenv(find_dotenv())
 
@@ -11,6 +20,174 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
+# Optional streaming replicas for read-only sessions (comma-separated URLs, in order of preference)
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Replicas further behind than this are skipped
+DB_REPLICA_MAX_LAG_S = float(os.getenv("DB_REPLICA_MAX_LAG_S", "2"))
+# After a request or job commits a write, its own reads stay on the primary this long (read-your-writes).
+# Keep it above DB_REPLICA_MAX_LAG_S + DB_REPLICA_CHECK_S.
+DB_READ_YOUR_WRITES_S = float(os.getenv("DB_READ_YOUR_WRITES_S", "5"))
+# How long a replica's lag/health measurement is trusted
+DB_REPLICA_CHECK_S = float(os.getenv("DB_REPLICA_CHECK_S", "2"))
+
+# Zero when fully replayed, so an idle primary does not look like lag. NULL (unhealthy) when
+# no WAL receiver is streaming: a disconnected replica has replayed everything it received
+# and would otherwise look fresh. status is only visible with pg_read_all_stats; without it,
+# a running receiver counts as streaming.
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (
+            SELECT 1 FROM pg_stat_wal_receiver WHERE COALESCE(status, 'streaming') = 'streaming'
+        ) THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+READ_ONLY = "read_only"
+
+_primary_reads: ContextVar[bool] = ContextVar("primary_reads", default=False)
+# {"bind": engine} shared by the read-only sessions of one request (see pin_read_engine)
+_read_pin: ContextVar[Optional[dict]] = ContextVar("read_pin", default=None)
+
+
+class ReplicaRouter:
+    """
+    Pick the engine for read-only sessions: the first replica (in configured order)
+    that is reachable and within DB_REPLICA_MAX_LAG_S, unless the current context
+    wrote recently; otherwise the primary.
+
+    Write times are kept per context (one request, or a job's thread), so one
+    client's commits never move another client's reads to the primary.
+    """
+
+    def __init__(self, primary: Engine, replicas: List[Engine], max_lag_s: float = DB_REPLICA_MAX_LAG_S,
+                 read_your_writes_s: float = DB_READ_YOUR_WRITES_S, check_interval_s: float = DB_REPLICA_CHECK_S,
+                 clock=time.monotonic):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag_s = max_lag_s
+        self.read_your_writes_s = read_your_writes_s
+        self.check_interval_s = check_interval_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Per router, so routers with different clocks (tests) do not share write times
+        self._last_write: ContextVar[float] = ContextVar(f"last_write_{id(self)}", default=float("-inf"))
+        # replica index -> (checked at, lag in seconds or None if unreachable)
+        self._health = {}
+
+    def record_write(self) -> None:
+        """Note a committed write of the current context"""
+        self._last_write.set(self._clock())
+
+    def wrote_recently(self) -> bool:
+        return self._clock() - self._last_write.get() < self.read_your_writes_s
+
+    def _measure_lag(self, replica: Engine) -> Optional[float]:
+        try:
+            with replica.connect() as conn:
+                lag = conn.execute(text(REPLICA_LAG_SQL)).scalar()
+            return None if lag is None else float(lag)
+        except Exception:
+            return None
+
+    def _lag(self, index: int) -> Optional[float]:
+        now = self._clock()
+        with self._lock:
+            cached = self._health.get(index)
+            if cached and now - cached[0] < self.check_interval_s:
+                return cached[1]
+        replica = self.replicas[index]
+        lag = self._measure_lag(replica)
+        with self._lock:
+            self._health[index] = (now, lag)
+        DB_REPLICA_LAG_SECONDS.labels(replica=f"{replica.url.host}:{replica.url.port}").set(-1 if lag is None else lag)
+        return lag
+
+    def read_engine(self) -> Tuple[Engine, str]:
+        """Returns (engine, reason)"""
+        if not self.replicas:
+            return self.primary, "no_replicas"
+        if _primary_reads.get():
+            return self.primary, "primary_requested"
+        if self.wrote_recently():
+            return self.primary, "read_your_writes"
+        reason = "replica_unavailable"
+        for index, replica in enumerate(self.replicas):
+            lag = self._lag(index)
+            if lag is None:
+                continue
+            if lag > self.max_lag_s:
+                reason = "replica_lagging"
+                continue
+            return replica, "replica"
+        return self.primary, reason
+
+
+def _create_replica_engine(url: str) -> Engine:
+    replica = create_engine(url, pool_pre_ping=True, connect_args={"connect_timeout": 2})
+    instrument_engine(replica)
+    return replica
+
+
 engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base() 
\ No newline at end of file
+instrument_engine(engine)
+router = ReplicaRouter(engine, [_create_replica_engine(url) for url in DATABASE_REPLICA_URLS])
+
+
+@event.listens_for(engine, "commit")
+def _record_primary_write(conn):
+    # Runs in the committing thread, so the write is recorded in the writer's own context
+    router.record_write()
+
+
+class RoutingSession(Session):
+    """Session that sends read_only() sessions to a replica chosen once per session"""
+
+    def get_bind(self, mapper=None, **kw):
+        if self.info.get(READ_ONLY):
+            bind = self.info.get("read_bind")
+            if bind is None:
+                pin = _read_pin.get()
+                if pin is not None and "bind" in pin and not _primary_reads.get() and not router.wrote_recently():
+                    bind = self.info["read_bind"] = pin["bind"]
+                    return bind
+                bind, reason = router.read_engine()
+                self.info["read_bind"] = bind
+                if pin is not None and reason != "primary_requested":
+                    pin["bind"] = bind
+                if reason != "no_replicas":
+                    DB_READ_ROUTING.labels(target="primary" if bind is router.primary else "replica", reason=reason).inc()
+            return bind
+        return super().get_bind(mapper, **kw)
+
+
+def read_only(session: Session) -> Session:
+    """Mark a session as read-only so it may be served by a replica (never write through it)"""
+    session.info[READ_ONLY] = True
+    return session
+
+
+def pin_read_engine() -> None:
+    """
+    Serve every later read-only session of the current context (one request) from the
+    database the first of them is routed to. Replicas replay at different points, so an
+    ETag's version counters and the rows it describes must come from the same one.
+    """
+    if _read_pin.get() is None:
+        _read_pin.set({})
+
+
+@contextmanager
+def primary_reads():
+    """Serve read-only sessions opened inside this block from the primary (read-modify-write flows)"""
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+Base = declarative_base()
@@ -0,0 +1,57 @@
+"""
+Vector Storage - How knowledge base embeddings are stored and indexed
+
+EMBEDDING_DIMENSIONS  Stored vector width. text-embedding-3 vectors can be
+                      shortened by truncation, so values below 1536 trade a
+                      little recall for a smaller heap and index.
+EMBEDDING_STORAGE     vector  - float32 column, ivfflat cosine index
+                      halfvec - float16 column, half the size of `vector`
+                      binary  - float16 column plus an HNSW index over the
+                                binary-quantized (1 bit per dimension) vector;
+                                candidates are found by Hamming distance and
+                                rescored with exact cosine distance
+
+Must match the live schema; use jobs/migrate_embedding_storage.py to change it.
+"""
+import os
+
+from pgvector.sqlalchemy import HALFVEC, Vector
+
+STORAGE_VECTOR = "vector"
+STORAGE_HALFVEC = "halfvec"
+STORAGE_BINARY = "binary"
+STORAGE_MODES = (STORAGE_VECTOR, STORAGE_HALFVEC, STORAGE_BINARY)
+
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", STORAGE_VECTOR).lower()
+# Binary storage: fetch k * factor Hamming candidates before exact rescoring
+EMBEDDING_RESCORE_FACTOR = int(os.getenv("EMBEDDING_RESCORE_FACTOR", "4"))
+
+if EMBEDDING_STORAGE not in STORAGE_MODES:
+    raise ValueError(f"EMBEDDING_STORAGE must be one of {STORAGE_MODES}, got {EMBEDDING_STORAGE!r}")
+
+
+def column_type(dimensions: int = EMBEDDING_DIMENSIONS, storage: str = EMBEDDING_STORAGE):
+    """SQLAlchemy type of the embedding columns"""
+    return Vector(dimensions) if storage == STORAGE_VECTOR else HALFVEC(dimensions)
+
+
+def column_type_sql(dimensions: int = EMBEDDING_DIMENSIONS, storage: str = EMBEDDING_STORAGE) -> str:
+    """Postgres type of the embedding columns, e.g. 'halfvec(512)'"""
+    return f"vector({dimensions})" if storage == STORAGE_VECTOR else f"halfvec({dimensions})"
+
+
+def quantized_sql(expression: str, dimensions: int = EMBEDDING_DIMENSIONS) -> str:
+    """Binary-quantized form of a vector expression; must match the binary index expression"""
+    return f"(binary_quantize({expression})::bit({dimensions}))"
+
+
+def index_sql(column: str, index_name: str, dimensions: int = EMBEDDING_DIMENSIONS,
+              storage: str = EMBEDDING_STORAGE, lists: int = 100, table: str = "knowledge_base") -> str:
+    """CREATE INDEX statement for an embedding column under the given storage mode"""
+    if storage == STORAGE_BINARY:
+        return (f"CREATE INDEX {index_name} ON {table} "
+                f"USING hnsw ({quantized_sql(column, dimensions)} bit_hamming_ops)")
+    opclass = "vector_cosine_ops" if storage == STORAGE_VECTOR else "halfvec_cosine_ops"
+    return (f"CREATE INDEX {index_name} ON {table} "
+            f"USING ivfflat ({column} {opclass}) WITH (lists = {lists})")
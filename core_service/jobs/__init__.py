@@ -0,0 +1 @@
+# Jobs package 
\ No newline at end of file
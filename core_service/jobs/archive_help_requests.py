@@ -0,0 +1,81 @@
+"""
+Move finished help requests out of the hot tables
+
+Calls archive_help_requests() (db/init/007_help_request_archive.sql) until
+no resolved/expired/cancelled request older than the retention period is
+left, committing after each batch so locks are short. The expiry-job
+service in docker-compose.yml does the same hourly; this job is for
+one-off runs, e.g. after lowering the retention.
+
+Usage (from the repo root):
+
+    python -m core_service.jobs.archive_help_requests --dry-run
+    python -m core_service.jobs.archive_help_requests --retention-days 30 --batch-size 5000
+"""
+import argparse
+import logging
+import os
+
+from sqlalchemy import text
+
+from core_service.database.session import SessionLocal
+
+logger = logging.getLogger("jobs.archive_help_requests")
+
+HELP_REQUEST_ARCHIVE_AFTER_DAYS = int(os.getenv("HELP_REQUEST_ARCHIVE_AFTER_DAYS", "30"))
+
+
+def count_archivable(retention_days: int) -> int:
+    """Finished requests old enough to archive (including ones held back by an unsent followup)"""
+    session = SessionLocal()
+    try:
+        return session.execute(text("""
+            SELECT count(*) FROM help_requests
+            WHERE status IN ('resolved', 'expired', 'cancelled')
+              AND created_at < now() - make_interval(days => :days)
+        """), {"days": retention_days}).scalar()
+    finally:
+        session.close()
+
+
+def archive(retention_days: int = HELP_REQUEST_ARCHIVE_AFTER_DAYS, batch_size: int = 5000) -> int:
+    """
+    Archive batches until none is left.
+
+    Returns:
+        int: Number of help requests moved
+    """
+    moved = 0
+    while True:
+        session = SessionLocal()
+        try:
+            batch = session.execute(
+                text("SELECT archive_help_requests(make_interval(days => :days), :batch_size)"),
+                {"days": retention_days, "batch_size": batch_size},
+            ).scalar()
+            session.commit()
+        finally:
+            session.close()
+        if not batch:
+            return moved
+        moved += batch
+        logger.info(f"Archived {moved} help requests")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Archive finished help requests")
+    parser.add_argument("--retention-days", type=int, default=HELP_REQUEST_ARCHIVE_AFTER_DAYS,
+                        help="Keep finished requests this long in the hot tables")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the requests that would be moved")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.dry_run:
+        print(f"{count_archivable(args.retention_days)} help requests are older than {args.retention_days} days and finished")
+        return
+    print(f"Archived {archive(args.retention_days, args.batch_size)} help requests")
+
+
+if __name__ == "__main__":
+    main()
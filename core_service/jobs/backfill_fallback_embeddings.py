@@ -0,0 +1,76 @@
+"""
+Backfill degraded-mode embeddings for knowledge base rows
+
+Fills knowledge_base.fallback_embedding for rows written before a fallback
+provider was configured (or by a different fallback provider), so the
+fallback can answer from the whole KB during a primary provider outage.
+
+Usage (from the repo root):
+
+    EMBEDDING_FALLBACK_PROVIDER=local python -m core_service.jobs.backfill_fallback_embeddings --batch-size 200
+"""
+import argparse
+import logging
+
+from sqlalchemy import or_
+
+from core_service.api.services.embeddings import embed_question_fallback
+from core_service.api.services.knowledge_base import _normalize_embedding_vector
+from core_service.api.services.llm_client import llm_client
+from core_service.database.models import KnowledgeBaseEntry
+from core_service.database.session import SessionLocal
+
+logger = logging.getLogger("jobs.backfill_fallback_embeddings")
+
+
+def backfill(batch_size: int = 200) -> int:
+    """
+    Embed every KB row whose fallback vector is missing or from another provider.
+
+    Returns:
+        int: Number of rows updated
+    """
+    if llm_client.fallback_provider is None:
+        raise ValueError("EMBEDDING_FALLBACK_PROVIDER is not configured")
+    target_tag = llm_client.fallback_provider.tag
+
+    updated = 0
+    last_id = None
+    while True:
+        session = SessionLocal()
+        try:
+            query = session.query(KnowledgeBaseEntry).filter(
+                or_(
+                    KnowledgeBaseEntry.fallback_embedding_model.is_(None),
+                    KnowledgeBaseEntry.fallback_embedding_model != target_tag,
+                )
+            )
+            if last_id is not None:
+                query = query.filter(KnowledgeBaseEntry.id > last_id)
+            batch = query.order_by(KnowledgeBaseEntry.id).limit(batch_size).all()
+            if not batch:
+                return updated
+
+            for entry in batch:
+                fallback = embed_question_fallback(entry.question_text_example)
+                entry.fallback_embedding = _normalize_embedding_vector(fallback)
+                entry.fallback_embedding_model = fallback.model_tag
+            session.commit()
+
+            updated += len(batch)
+            last_id = batch[-1].id
+            logger.info(f"Backfilled {updated} fallback embeddings ({target_tag})")
+        finally:
+            session.close()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Backfill fallback-provider embeddings for the knowledge base")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    print(f"Updated {backfill(args.batch_size)} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Bulk import/export of knowledge base entries from the command line
+
+Same behaviour as POST /api/knowledge-base/import and
+GET /api/knowledge-base/export, without going through the API.
+
+Usage (from the repo root):
+
+    python -m core_service.jobs.kb_import_export import faq.csv
+    python -m core_service.jobs.kb_import_export import kb.jsonl --on-conflict update
+    python -m core_service.jobs.kb_import_export import faq.csv --location brooklyn
+    python -m core_service.jobs.kb_import_export export --include-embeddings -o kb.jsonl
+"""
+import argparse
+import json
+import logging
+import sys
+
+from core_service.database.models import DEFAULT_LOCATION_ID
+from core_service.api.services.knowledge_base_bulk import (
+    CONFLICT_MODES,
+    FORMATS,
+    KBImportError,
+    export_entries,
+    import_entries,
+    parse_import,
+)
+
+
+def _format_for(path: str, fmt: str) -> str:
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Bulk import/export knowledge base entries")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="Import entries from a CSV or JSONL file ('-' for stdin)")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=FORMATS, help="Defaults from the file extension")
+    import_parser.add_argument("--on-conflict", choices=CONFLICT_MODES, default="skip")
+    import_parser.add_argument("--location", default=DEFAULT_LOCATION_ID, help="Location receiving the entries")
+
+    export_parser = commands.add_parser("export", help="Export all entries")
+    export_parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    export_parser.add_argument("--include-embeddings", action="store_true")
+    export_parser.add_argument("--location", help="Only this location's entries (default: all locations)")
+    export_parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.command == "import":
+        fmt = _format_for(args.path, args.format)
+        try:
+            if args.path == "-":
+                records = parse_import(sys.stdin, fmt)
+            else:
+                with open(args.path, newline="", encoding="utf-8-sig") as f:
+                    records = parse_import(f, fmt)
+        except KBImportError as e:
+            parser.error(str(e))
+        print(json.dumps(import_entries(records, on_conflict=args.on_conflict, location_id=args.location), indent=2))
+        return
+
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for chunk in export_entries(args.format, include_embeddings=args.include_embeddings, location_id=args.location):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Change how knowledge base embeddings are stored (dimensions and storage type)
+
+Rewrites knowledge_base.embedding and knowledge_base.fallback_embedding to
+the target width and storage mode, updates the provider tags and rebuilds
+the ANN indexes (see core_service/database/vector_storage.py).
+
+Shrinking keeps the leading components of each stored vector and
+re-normalizes them, which is exactly what the embedding API returns for a
+smaller `dimensions`, so no embedding calls are needed. Growing cannot be
+done in place: vectors are zero-padded and every row must be re-embedded
+(--reembed). Re-embedding can also be run on its own, e.g. after switching
+models.
+
+The column rewrite takes an exclusive lock on knowledge_base for its
+duration. Set EMBEDDING_DIMENSIONS / EMBEDDING_STORAGE to the same values
+and restart the core service and agent afterwards.
+
+Usage (from the repo root):
+
+    python -m core_service.jobs.migrate_embedding_storage --dimensions 512 --storage binary --dry-run
+    python -m core_service.jobs.migrate_embedding_storage --dimensions 512 --storage binary
+    python -m core_service.jobs.migrate_embedding_storage --dimensions 1536 --storage vector --reembed
+"""
+import argparse
+import logging
+import os
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+
+from core_service.api.services.embedding_providers import EmbeddingProvider, create_provider
+from core_service.database.session import SessionLocal
+from core_service.database.vector_storage import (
+    STORAGE_MODES,
+    STORAGE_VECTOR,
+    column_type_sql,
+    index_sql,
+)
+
+logger = logging.getLogger("jobs.migrate_embedding_storage")
+
+# (vector column, tag column, index name, provider env var)
+EMBEDDING_COLUMNS = (
+    ("embedding", "embedding_model", "knowledge_base_vec_idx", "EMBEDDING_PROVIDER"),
+    ("fallback_embedding", "fallback_embedding_model", "knowledge_base_fallback_vec_idx", "EMBEDDING_FALLBACK_PROVIDER"),
+    # Shadow slot of jobs/reembed_knowledge_base.py; refilled by that job, not here
+    ("embedding_next", "embedding_next_model", "knowledge_base_next_vec_idx", None),
+)
+
+_TYPE_RE = re.compile(r"^(vector|halfvec)\((\d+)\)$")
+
+
+def current_column_type(session, column: str) -> Tuple[str, int]:
+    """Return (type name, dimensions) of a knowledge_base vector column"""
+    formatted = session.execute(text("""
+        SELECT format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = 'knowledge_base'::regclass AND attname = :column AND NOT attisdropped
+    """), {"column": column}).scalar()
+    match = _TYPE_RE.match(formatted or "")
+    if not match:
+        raise ValueError(f"Unsupported type for knowledge_base.{column}: {formatted}")
+    return match.group(1), int(match.group(2))
+
+
+def plan_statements(current_dimensions: int, dimensions: int, storage: str) -> List[str]:
+    """
+    SQL that rewrites both embedding columns and their indexes, in execution order.
+
+    Args:
+        current_dimensions: Width of the columns today
+        dimensions: Target width
+        storage: Target storage mode (vector, halfvec or binary)
+    """
+    target_type = column_type_sql(dimensions, storage)
+    statements = []
+    for column, tag_column, index_name, _ in EMBEDDING_COLUMNS:
+        statements.append(f"DROP INDEX IF EXISTS {index_name}")
+
+        if dimensions < current_dimensions:
+            converted = f"l2_normalize(subvector({column}, 1, {dimensions}))"
+        elif dimensions > current_dimensions:
+            # Placeholder values only; these rows are re-embedded before they are searchable again
+            converted = f"({column}::real[] || array_fill(0::real, ARRAY[{dimensions - current_dimensions}]))"
+        else:
+            converted = column
+        statements.append(
+            f"ALTER TABLE knowledge_base ALTER COLUMN {column} TYPE {target_type} "
+            f"USING {converted}::{target_type}"
+        )
+
+        if dimensions < current_dimensions:
+            # Truncated vectors are valid reduced-dimension embeddings of the same model
+            suffix = "" if dimensions == EmbeddingProvider.native_dimensions else f"@{dimensions}"
+            statements.append(
+                f"UPDATE knowledge_base SET {tag_column} = "
+                f"regexp_replace({tag_column}, '@[0-9]+$', '') || '{suffix}' "
+                f"WHERE {tag_column} IS NOT NULL"
+            )
+
+        statements.append(index_sql(column, index_name, dimensions, storage))
+    return statements
+
+
+def migrate(dimensions: int, storage: str, dry_run: bool = False) -> List[str]:
+    """
+    Rewrite the embedding columns in a single transaction.
+
+    Returns:
+        List[str]: The statements executed (or that would be executed on a dry run)
+    """
+    session = SessionLocal()
+    try:
+        _, current_dimensions = current_column_type(session, "embedding")
+        statements = plan_statements(current_dimensions, dimensions, storage)
+        if dry_run:
+            return statements
+        for statement in statements:
+            logger.info(statement)
+            session.execute(text(statement))
+        session.execute(text("ANALYZE knowledge_base"))
+        session.commit()
+        return statements
+    finally:
+        session.close()
+
+
+def reembed(dimensions: int, storage: str, batch_size: int = 100) -> int:
+    """
+    Re-embed every vector whose tag differs from the configured provider at `dimensions`.
+
+    Returns:
+        int: Number of vectors written
+    """
+    vector_type = column_type_sql(dimensions, storage)
+    updated = 0
+    for column, tag_column, _, provider_env in EMBEDDING_COLUMNS:
+        if provider_env is None:
+            continue
+        default_provider = "openai" if provider_env == "EMBEDDING_PROVIDER" else None
+        provider = create_provider(os.getenv(provider_env, default_provider), dimensions=dimensions)
+        if provider is None:
+            continue
+
+        last_id = None
+        while True:
+            session = SessionLocal()
+            try:
+                keyset = "AND id > :last_id" if last_id is not None else ""
+                batch = session.execute(text(f"""
+                    SELECT id, question_text_example
+                    FROM knowledge_base
+                    WHERE {tag_column} IS DISTINCT FROM :tag {keyset}
+                    ORDER BY id
+                    LIMIT :batch_size
+                """), {"tag": provider.tag, "last_id": last_id, "batch_size": batch_size}).all()
+                if not batch:
+                    break
+
+                vectors = provider.embed_batch([row.question_text_example for row in batch])
+                for row, vector in zip(batch, vectors):
+                    session.execute(
+                        text(f"UPDATE knowledge_base SET {column} = CAST(:vec AS {vector_type}), "
+                             f"{tag_column} = :tag WHERE id = :id"),
+                        {"vec": str([float(v) for v in vector]), "tag": provider.tag, "id": row.id},
+                    )
+                session.commit()
+
+                updated += len(batch)
+                last_id = batch[-1].id
+                logger.info(f"Re-embedded {updated} vectors ({provider.tag})")
+            finally:
+                session.close()
+    return updated
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Change knowledge base embedding dimensions/storage")
+    parser.add_argument("--dimensions", type=int, required=True)
+    parser.add_argument("--storage", choices=STORAGE_MODES, default=STORAGE_VECTOR)
+    parser.add_argument("--reembed", action="store_true", help="Re-embed rows instead of relying on truncation")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true", help="Print the DDL without running it")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    session = SessionLocal()
+    try:
+        _, current_dimensions = current_column_type(session, "embedding")
+    finally:
+        session.close()
+    if args.dimensions > current_dimensions and not args.reembed:
+        parser.error(f"growing from {current_dimensions} to {args.dimensions} dimensions requires --reembed")
+
+    statements = migrate(args.dimensions, args.storage, dry_run=args.dry_run)
+    if args.dry_run:
+        print(";\n".join(statements) + ";")
+        return
+    if args.reembed:
+        print(f"Re-embedded {reembed(args.dimensions, args.storage, args.batch_size)} vectors")
+    print(f"knowledge_base now stores {column_type_sql(args.dimensions, args.storage)} ({args.storage}); "
+          f"set EMBEDDING_DIMENSIONS={args.dimensions} EMBEDDING_STORAGE={args.storage} and restart the services")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Publish the knowledge base snapshot mapped by agent workers
+
+Writes a new snapshot (api/services/kb_snapshot.py) to KB_SNAPSHOT_DIR when
+the knowledge_base table version has changed since the published one. With
+--watch it keeps checking every KB_SNAPSHOT_POLL_S, so agents search a
+knowledge base at most that much older than the database (plus their own
+KB_SNAPSHOT_CHECK_S). Each check also confirms an unchanged snapshot; agents stop
+searching one that goes unconfirmed for KB_SNAPSHOT_MAX_AGE_S, so a publisher run
+from cron needs a shorter period than that. Run it on the host (or volume) the
+agent workers share.
+
+Usage (from the repo root):
+
+    python -m core_service.jobs.publish_kb_snapshot
+    python -m core_service.jobs.publish_kb_snapshot --watch
+"""
+import argparse
+import logging
+import os
+import time
+
+from core_service.api.services.kb_snapshot import KB_SNAPSHOT_DIR, KB_SNAPSHOT_KEEP, publish_snapshot
+
+logger = logging.getLogger("jobs.publish_kb_snapshot")
+
+KB_SNAPSHOT_POLL_S = float(os.getenv("KB_SNAPSHOT_POLL_S", "2"))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Publish the agents' knowledge base snapshot")
+    parser.add_argument("--dir", default=KB_SNAPSHOT_DIR, help="Snapshot directory (default: KB_SNAPSHOT_DIR)")
+    parser.add_argument("--keep", type=int, default=KB_SNAPSHOT_KEEP, help="Snapshots kept on disk")
+    parser.add_argument("--watch", action="store_true", help="Keep publishing as the knowledge base changes")
+    parser.add_argument("--interval", type=float, default=KB_SNAPSHOT_POLL_S, help="Seconds between checks")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not args.dir:
+        parser.error("set KB_SNAPSHOT_DIR or pass --dir")
+
+    while True:
+        try:
+            path = publish_snapshot(args.dir, keep=args.keep)
+            if path:
+                logger.info(f"Published {path}")
+            elif not args.watch:
+                logger.info("Published snapshot is current")
+        except Exception as e:
+            if not args.watch:
+                raise
+            logger.error(f"Could not publish KB snapshot: {e}")
+        if not args.watch:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
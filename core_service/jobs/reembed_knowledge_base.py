@@ -0,0 +1,346 @@
+"""
+Re-embed the knowledge base with a new model, then cut over without downtime
+
+1. run     Fill the shadow slot (knowledge_base.embedding_next) with vectors
+           from the target provider/model, in rate-limited batches. Progress
+           is committed with each batch (kb_reembed_jobs), so a restarted run
+           resumes where it stopped. Rows edited while the job runs are
+           picked up by catch-up passes, then the shadow index is rebuilt.
+2. cutover Swap the shadow slot with the live one in a single transaction
+           (column and index renames, metadata only). Processes still on the
+           old model keep searching the old vectors, which now sit in the
+           shadow slot (see crud.embedding_columns_for_tag). Restart them
+           with the new EMBEDDING_PROVIDER / OPENAI_EMBEDDING_MODEL; rows
+           they write before that are untagged in the live slot, and `run`
+           with the live model re-embeds them.
+3. rollback Swap back, as long as the shadow slot still holds the old vectors.
+
+Usage (from the repo root):
+
+    python -m core_service.jobs.reembed_knowledge_base run --model text-embedding-3-large --requests-per-minute 300
+    python -m core_service.jobs.reembed_knowledge_base status --model text-embedding-3-large
+    python -m core_service.jobs.reembed_knowledge_base cutover --model text-embedding-3-large
+    python -m core_service.jobs.reembed_knowledge_base rollback
+"""
+import argparse
+import logging
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+from core_service.api.services.embedding_providers import EMBEDDING_DIMENSIONS, EmbeddingProvider, create_provider
+from core_service.api.services.resilience import RateLimiter
+from core_service.database.session import SessionLocal, engine
+from core_service.database.vector_storage import EMBEDDING_STORAGE, column_type_sql
+
+logger = logging.getLogger("jobs.reembed_knowledge_base")
+
+SHADOW_INDEX = "knowledge_base_next_vec_idx"
+
+# Renames that exchange the live and shadow slots; running them twice is a no-op overall
+SWAP_STATEMENTS = (
+    "ALTER TABLE knowledge_base RENAME COLUMN embedding TO embedding_swap",
+    "ALTER TABLE knowledge_base RENAME COLUMN embedding_next TO embedding",
+    "ALTER TABLE knowledge_base RENAME COLUMN embedding_swap TO embedding_next",
+    "ALTER TABLE knowledge_base RENAME COLUMN embedding_model TO embedding_model_swap",
+    "ALTER TABLE knowledge_base RENAME COLUMN embedding_next_model TO embedding_model",
+    "ALTER TABLE knowledge_base RENAME COLUMN embedding_model_swap TO embedding_next_model",
+    "ALTER INDEX knowledge_base_vec_idx RENAME TO knowledge_base_swap_vec_idx",
+    f"ALTER INDEX {SHADOW_INDEX} RENAME TO knowledge_base_vec_idx",
+    f"ALTER INDEX knowledge_base_swap_vec_idx RENAME TO {SHADOW_INDEX}",
+    # Only the live slot is required on every row
+    "ALTER TABLE knowledge_base ALTER COLUMN embedding_next DROP NOT NULL",
+    "ALTER TABLE knowledge_base ALTER COLUMN embedding SET NOT NULL",
+    """UPDATE kb_embedding_slots
+       SET model_tag = CASE column_name WHEN 'embedding' THEN next_slot.model_tag ELSE live_slot.model_tag END,
+           updated_at = now()
+       FROM (SELECT model_tag FROM kb_embedding_slots WHERE column_name = 'embedding_next') next_slot,
+            (SELECT model_tag FROM kb_embedding_slots WHERE column_name = 'embedding') live_slot""",
+)
+
+
+def _slot_tags(session) -> Dict[str, Optional[str]]:
+    rows = session.execute(text("SELECT column_name, model_tag FROM kb_embedding_slots")).all()
+    return {row.column_name: row.model_tag for row in rows}
+
+
+def _embed_with_retries(provider: EmbeddingProvider, texts: List[str], max_retries: int) -> List[List[float]]:
+    """Batch embed, backing off exponentially on errors (rate limits, timeouts)"""
+    for attempt in range(max_retries + 1):
+        try:
+            return provider.embed_batch(texts)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = min(60.0, 2.0 ** attempt)
+            logger.warning(f"Embedding batch failed ({e}); retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+
+def _fill_pass(provider: EmbeddingProvider, batch_size: int, limiters: List[RateLimiter],
+               max_retries: int, resume: bool, vector_column: str = "embedding_next",
+               tag_column: str = "embedding_next_model") -> int:
+    """
+    One keyset pass over rows whose vector in the given slot (the shadow slot by default)
+    is missing or from another model.
+    With `resume`, starts after (and advances) the checkpoint in kb_reembed_jobs; a pass
+    starting from the first row resets its processed count, and a finished pass clears
+    the checkpoint, so processed counts each row once per pass.
+    """
+    target = provider.tag
+    vector_type = column_type_sql(provider.dimensions, EMBEDDING_STORAGE)
+    written = 0
+    last_id = None
+    if resume:
+        session = SessionLocal()
+        try:
+            last_id = session.execute(
+                text("SELECT last_id FROM kb_reembed_jobs WHERE target_tag = :target"), {"target": target}
+            ).scalar()
+            if last_id is None:
+                session.execute(
+                    text("UPDATE kb_reembed_jobs SET processed = 0, updated_at = now() WHERE target_tag = :target"),
+                    {"target": target},
+                )
+                session.commit()
+        finally:
+            session.close()
+
+    while True:
+        session = SessionLocal()
+        try:
+            keyset = "AND id > :last_id" if last_id is not None else ""
+            batch = session.execute(text(f"""
+                SELECT id, question_text_example
+                FROM knowledge_base
+                WHERE {tag_column} IS DISTINCT FROM :target {keyset}
+                ORDER BY id
+                LIMIT :batch_size
+            """), {"target": target, "last_id": last_id, "batch_size": batch_size}).all()
+            if not batch:
+                if resume:
+                    session.execute(
+                        text("UPDATE kb_reembed_jobs SET last_id = NULL, updated_at = now() WHERE target_tag = :target"),
+                        {"target": target},
+                    )
+                    session.commit()
+                return written
+
+            texts = [row.question_text_example for row in batch]
+            limiters[0].acquire()
+            for limiter in limiters[1:]:
+                limiter.acquire(min(limiter.burst, sum(len(t) // 4 + 1 for t in texts)))
+            vectors = _embed_with_retries(provider, texts, max_retries)
+
+            # Skip rows whose question changed since it was read; they are refilled by a catch-up pass
+            session.execute(
+                text(f"""
+                    UPDATE knowledge_base
+                    SET {vector_column} = CAST(:vec AS {vector_type}), {tag_column} = :target
+                    WHERE id = :id AND question_text_example = :question
+                """),
+                [
+                    {"vec": str([float(v) for v in vector]), "target": target, "id": row.id, "question": row.question_text_example}
+                    for row, vector in zip(batch, vectors)
+                ],
+            )
+            last_id = batch[-1].id
+            if resume:
+                session.execute(text("""
+                    UPDATE kb_reembed_jobs
+                    SET last_id = :last_id, processed = processed + :count, updated_at = now()
+                    WHERE target_tag = :target
+                """), {"last_id": last_id, "count": len(batch), "target": target})
+            session.commit()
+
+            written += len(batch)
+            logger.info(f"Re-embedded {written} rows into {vector_column} ({target})")
+        finally:
+            session.close()
+
+
+def run(provider: EmbeddingProvider, batch_size: int = 100, requests_per_minute: float = 300,
+        tokens_per_minute: Optional[float] = None, max_retries: int = 5, catch_up_passes: int = 3) -> int:
+    """
+    Fill the shadow slot with `provider` vectors, resuming from the last checkpoint.
+
+    Once `provider` is live (after cutover), re-embeds the live vectors left untagged by
+    processes still writing with the old model instead.
+
+    Returns:
+        int: Rows written by this invocation
+    """
+    target = provider.tag
+    limiters = [RateLimiter(requests_per_minute / 60.0, burst=1)]
+    if tokens_per_minute:
+        limiters.append(RateLimiter(tokens_per_minute / 60.0, burst=tokens_per_minute))
+
+    session = SessionLocal()
+    try:
+        slots = _slot_tags(session)
+    finally:
+        session.close()
+    if slots.get("embedding") == target:
+        return _repair_live_slot(provider, batch_size, limiters, max_retries, catch_up_passes)
+
+    session = SessionLocal()
+    try:
+        if slots.get("embedding_next") not in (None, target):
+            logger.warning(f"Discarding shadow vectors of {slots['embedding_next']} (rollback to it is no longer possible)")
+        # Record the live model so processes still using it are routed correctly after the swap
+        session.execute(text("""
+            UPDATE kb_embedding_slots
+            SET model_tag = (SELECT embedding_model FROM knowledge_base GROUP BY embedding_model ORDER BY count(*) DESC LIMIT 1),
+                updated_at = now()
+            WHERE column_name = 'embedding' AND model_tag IS NULL
+        """))
+        session.execute(
+            text("UPDATE kb_embedding_slots SET model_tag = :target, updated_at = now() WHERE column_name = 'embedding_next'"),
+            {"target": target},
+        )
+        session.execute(
+            text("INSERT INTO kb_reembed_jobs (target_tag) VALUES (:target) ON CONFLICT (target_tag) DO NOTHING"),
+            {"target": target},
+        )
+        status = session.execute(
+            text("SELECT status FROM kb_reembed_jobs WHERE target_tag = :target"), {"target": target}
+        ).scalar()
+        if status == "cut_over":
+            raise ValueError(f"{target} was already cut over")
+        session.commit()
+    finally:
+        session.close()
+
+    written = _fill_pass(provider, batch_size, limiters, max_retries, resume=True)
+    for _ in range(catch_up_passes):
+        caught_up = _fill_pass(provider, batch_size, limiters, max_retries, resume=False)
+        written += caught_up
+        if not caught_up:
+            break
+
+    # ivfflat centroids are computed at build time, so rebuild now that the slot has data
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"REINDEX INDEX CONCURRENTLY {SHADOW_INDEX}"))
+
+    session = SessionLocal()
+    try:
+        session.execute(
+            text("UPDATE kb_reembed_jobs SET status = 'filled', updated_at = now() WHERE target_tag = :target"),
+            {"target": target},
+        )
+        session.commit()
+    finally:
+        session.close()
+    return written
+
+
+def _repair_live_slot(provider: EmbeddingProvider, batch_size: int, limiters: List[RateLimiter],
+                      max_retries: int, passes: int) -> int:
+    """Re-embed live vectors not tagged with the live model (written after cutover by processes on the old one)"""
+    written = 0
+    for _ in range(passes + 1):
+        repaired = _fill_pass(provider, batch_size, limiters, max_retries, resume=False,
+                              vector_column="embedding", tag_column="embedding_model")
+        written += repaired
+        if not repaired:
+            break
+    logger.info(f"{provider.tag} is live; re-embedded {written} live vectors from other models")
+    return written
+
+
+def swap_slots(expected_tag: str) -> None:
+    """
+    Atomically make the shadow slot live.
+
+    Raises:
+        ValueError: If any row's shadow vector is missing or not from `expected_tag`
+    """
+    session = SessionLocal()
+    try:
+        session.execute(text("LOCK TABLE knowledge_base IN ACCESS EXCLUSIVE MODE"))
+        slots = _slot_tags(session)
+        if slots.get("embedding_next") != expected_tag:
+            raise ValueError(f"The shadow slot does not hold {expected_tag}")
+        missing = session.execute(
+            text("SELECT count(*) FROM knowledge_base WHERE embedding_next_model IS DISTINCT FROM :tag"),
+            {"tag": expected_tag},
+        ).scalar()
+        if missing:
+            raise ValueError(f"{missing} rows have no {expected_tag} vector yet; run the job again to catch up")
+        for statement in SWAP_STATEMENTS:
+            session.execute(text(statement))
+        session.execute(
+            text("UPDATE kb_reembed_jobs SET status = 'cut_over', updated_at = now() WHERE target_tag = :tag"),
+            {"tag": expected_tag},
+        )
+        # The model swapped out can be cut over to again (rollback)
+        session.execute(
+            text("UPDATE kb_reembed_jobs SET status = 'filled', updated_at = now() WHERE target_tag = :tag"),
+            {"tag": slots.get("embedding")},
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def status(target: Optional[str]) -> Dict[str, object]:
+    session = SessionLocal()
+    try:
+        report: Dict[str, object] = {"slots": _slot_tags(session)}
+        report["rows"] = session.execute(text("SELECT count(*) FROM knowledge_base")).scalar()
+        if target:
+            report["shadow_rows_for_target"] = session.execute(
+                text("SELECT count(*) FROM knowledge_base WHERE embedding_next_model = :target"), {"target": target}
+            ).scalar()
+            job = session.execute(
+                text("SELECT last_id, processed, status, started_at, updated_at FROM kb_reembed_jobs WHERE target_tag = :target"),
+                {"target": target},
+            ).first()
+            report["checkpoint"] = dict(job._mapping) if job else None
+        return report
+    finally:
+        session.close()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Re-embed the knowledge base and cut over to a new model")
+    parser.add_argument("command", choices=["run", "status", "cutover", "rollback"])
+    parser.add_argument("--provider", default="openai", help="Target provider (openai or local)")
+    parser.add_argument("--model", help="Target model (defaults to OPENAI_EMBEDDING_MODEL)")
+    parser.add_argument("--dimensions", type=int, default=EMBEDDING_DIMENSIONS, help="Must match the embedding columns")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--requests-per-minute", type=float, default=300)
+    parser.add_argument("--tokens-per-minute", type=float, help="Approximate input-token budget (4 characters per token)")
+    parser.add_argument("--max-retries", type=int, default=5)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.command == "rollback":
+        session = SessionLocal()
+        try:
+            previous = _slot_tags(session).get("embedding_next")
+        finally:
+            session.close()
+        if not previous:
+            parser.error("the shadow slot is empty; nothing to roll back to")
+        swap_slots(previous)
+        print(f"Rolled back: {previous} is live again")
+        return
+
+    provider = create_provider(args.provider, dimensions=args.dimensions, model=args.model)
+    if args.command == "status":
+        print(status(provider.tag))
+    elif args.command == "run":
+        written = run(provider, args.batch_size, args.requests_per_minute, args.tokens_per_minute, args.max_retries)
+        print(f"Wrote {written} shadow vectors for {provider.tag}; run 'cutover' when ready")
+    else:
+        swap_slots(provider.tag)
+        print(f"Cut over to {provider.tag}; restart services with the new embedding settings")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Observability package 
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""
+DB instrumentation - SQLAlchemy engine events that time every statement and
+attribute query counts to the HTTP request being served.
+
+Statements are also aggregated per process by fingerprint (the SQL with
+literals and bind parameters replaced by ?), and SELECTs slower than
+DB_SLOW_QUERY_MS get an EXPLAIN (ANALYZE, BUFFERS) captured in the background
+into a ring buffer, so a plan regression (a sequential scan where the index
+was used) is visible without reproducing it by hand. Both are served by the
+admin endpoints (api/routes/admin.py).
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .metrics import DB_QUERY_SECONDS, DB_SLOW_QUERIES, DB_SLOW_QUERY_SEQ_SCANS
+
+logger = logging.getLogger("observability.db")
+
+# Statements slower than this are counted as slow and EXPLAINed; 0 disables capture
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "250"))
+# A fingerprint is EXPLAINed at most once per cooldown (EXPLAIN ANALYZE runs the query again)
+DB_EXPLAIN_COOLDOWN_S = float(os.getenv("DB_EXPLAIN_COOLDOWN_S", "300"))
+DB_EXPLAIN_BUFFER_SIZE = int(os.getenv("DB_EXPLAIN_BUFFER_SIZE", "50"))
+DB_EXPLAIN_TIMEOUT_MS = int(os.getenv("DB_EXPLAIN_TIMEOUT_MS", "10000"))
+# Distinct fingerprints tracked per process; the least recently seen is dropped beyond it
+DB_QUERY_FINGERPRINTS = int(os.getenv("DB_QUERY_FINGERPRINTS", "1000"))
+
+# Captures waiting for the explain thread; slow statements beyond it are not explained
+EXPLAIN_MAX_PENDING = 4
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_STRINGS = re.compile(r"'(?:''|[^'])*'")
+_PARAMS = re.compile(r"%\([^)]+\)s|%s|\$\d+|(?<![:\w]):\w+|\?")
+_NUMBERS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE)
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS = re.compile(r"(\(\?\))(?:\s*,\s*\(\?\))+")
+_WHITESPACE = re.compile(r"\s+")
+_SEQ_SCANS = re.compile(r"Seq Scan on (\w+)")
+
+
+class RequestDBStats:
+    """Per-request accumulator; shared by reference with threadpool workers via contextvars"""
+
+    __slots__ = ("query_count", "total_seconds")
+
+    def __init__(self):
+        self.query_count = 0
+        self.total_seconds = 0.0
+
+
+_request_db_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("request_db_stats", default=None)
+
+_stats_lock = threading.Lock()
+# fingerprint -> {"calls", "total_seconds", "max_seconds", "slow_calls", "last_seen"}
+_fingerprint_stats: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+_explain_lock = threading.Lock()
+_explained_at: Dict[str, float] = {}
+_explains_pending = 0
+_slow_queries: Deque[Dict[str, Any]] = deque(maxlen=DB_EXPLAIN_BUFFER_SIZE)
+_explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-explain")
+
+
+def start_request_stats() -> RequestDBStats:
+    """Begin collecting DB statistics for the current request context"""
+    stats = RequestDBStats()
+    _request_db_stats.set(stats)
+    return stats
+
+
+def _statement_operation(statement: str) -> str:
+    """Return the leading SQL keyword (select/insert/...) as a low-cardinality label"""
+    head = statement.lstrip().split(None, 1)
+    return head[0].lower() if head else "unknown"
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """
+    Normalize a statement so executions differing only in values group together:
+    comments dropped, literals and bind parameters replaced by ?, IN lists and
+    multi-row VALUES collapsed to one element, whitespace collapsed.
+    """
+    sql = _COMMENTS.sub(" ", statement)
+    sql = _STRINGS.sub("?", sql)
+    sql = _PARAMS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _LISTS.sub("(?)", sql)
+    sql = _ROWS.sub(r"\1", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def fingerprint_id(fingerprint_sql: str) -> str:
+    """Short stable id of a fingerprint"""
+    return hashlib.sha1(fingerprint_sql.encode()).hexdigest()[:12]
+
+
+def _record_fingerprint(fingerprint_sql: str, elapsed: float, slow: bool) -> None:
+    with _stats_lock:
+        entry = _fingerprint_stats.get(fingerprint_sql)
+        if entry is None:
+            entry = _fingerprint_stats[fingerprint_sql] = {
+                "calls": 0, "total_seconds": 0.0, "max_seconds": 0.0, "slow_calls": 0, "last_seen": 0.0,
+            }
+            while len(_fingerprint_stats) > DB_QUERY_FINGERPRINTS:
+                _fingerprint_stats.popitem(last=False)
+        else:
+            _fingerprint_stats.move_to_end(fingerprint_sql)
+        entry["calls"] += 1
+        entry["total_seconds"] += elapsed
+        entry["max_seconds"] = max(entry["max_seconds"], elapsed)
+        entry["slow_calls"] += slow
+        entry["last_seen"] = time.time()
+
+
+def query_stats(limit: int = 50, order_by: str = "total") -> List[Dict[str, Any]]:
+    """
+    Per-fingerprint statement statistics of this process.
+
+    Args:
+        limit: Number of fingerprints to return
+        order_by: "total", "mean", "max" or "calls"
+    """
+    with _stats_lock:
+        items = [(sql, dict(entry)) for sql, entry in _fingerprint_stats.items()]
+    stats = [{
+        "id": fingerprint_id(sql),
+        "fingerprint": sql,
+        "calls": entry["calls"],
+        "total_ms": round(entry["total_seconds"] * 1000, 3),
+        "mean_ms": round(entry["total_seconds"] * 1000 / entry["calls"], 3),
+        "max_ms": round(entry["max_seconds"] * 1000, 3),
+        "slow_calls": entry["slow_calls"],
+        "last_seen": datetime.fromtimestamp(entry["last_seen"], timezone.utc).isoformat(),
+    } for sql, entry in items]
+    key = {"total": "total_ms", "mean": "mean_ms", "max": "max_ms", "calls": "calls"}[order_by]
+    stats.sort(key=lambda s: s[key], reverse=True)
+    return stats[:limit]
+
+
+def slow_queries() -> List[Dict[str, Any]]:
+    """Captured slow statements with their plans, newest first"""
+    with _explain_lock:
+        return list(reversed(_slow_queries))
+
+
+def reset_query_stats() -> None:
+    """Forget fingerprint statistics, captured plans and explain cooldowns"""
+    with _stats_lock:
+        _fingerprint_stats.clear()
+    with _explain_lock:
+        _slow_queries.clear()
+        _explained_at.clear()
+
+
+def _explainable(statement: str, executemany: bool) -> bool:
+    # EXPLAIN ANALYZE executes the statement: only plain reads are safe to run twice
+    if executemany or _statement_operation(statement) not in ("select", "with"):
+        return False
+    return not re.search(r"\bfor\s+(update|share|no\s+key\s+update|key\s+share)\b", statement, re.IGNORECASE)
+
+
+def _explain_plan(engine: Engine, statement: str, parameters) -> List[str]:
+    """EXPLAIN (ANALYZE, BUFFERS) a statement on its own read-only connection, outside engine events"""
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute("SET TRANSACTION READ ONLY")
+        cursor.execute(f"SET LOCAL statement_timeout = {int(DB_EXPLAIN_TIMEOUT_MS)}")
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        raw.rollback()
+        raw.close()
+
+
+def _capture_plan(engine: Engine, fingerprint_sql: str, statement: str, parameters, elapsed: float) -> None:
+    global _explains_pending
+    try:
+        plan = _explain_plan(engine, statement, parameters)
+        error = None
+    except Exception as e:
+        plan, error = [], str(e)
+        logger.warning(f"EXPLAIN of slow query {fingerprint_id(fingerprint_sql)} failed: {e}")
+    seq_scans = sorted(set(_SEQ_SCANS.findall("\n".join(plan))))
+    for relation in seq_scans:
+        DB_SLOW_QUERY_SEQ_SCANS.labels(relation=relation).inc()
+    with _explain_lock:
+        _explains_pending -= 1
+        _slow_queries.append({
+            "id": fingerprint_id(fingerprint_sql),
+            "fingerprint": fingerprint_sql,
+            "duration_ms": round(elapsed * 1000, 3),
+            "captured_at": datetime.now(timezone.utc).isoformat(),
+            "database": f"{engine.url.host}:{engine.url.port}" if engine.url.host else engine.url.drivername,
+            "seq_scans": seq_scans,
+            "plan": plan,
+            "error": error,
+        })
+
+
+def _maybe_explain(engine: Engine, fingerprint_sql: str, statement: str, parameters, elapsed: float) -> None:
+    """Queue a plan capture unless this fingerprint was explained recently or the queue is full"""
+    global _explains_pending
+    now = time.monotonic()
+    with _explain_lock:
+        if now - _explained_at.get(fingerprint_sql, float("-inf")) < DB_EXPLAIN_COOLDOWN_S:
+            return
+        if _explains_pending >= EXPLAIN_MAX_PENDING:
+            return
+        _explained_at[fingerprint_sql] = now
+        _explains_pending += 1
+    _explain_executor.submit(_capture_plan, engine, fingerprint_sql, statement, parameters, elapsed)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # On the execution context, not the pooled connection: a failed statement must not leave it behind
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _record_statement(operation: str, statement: str, elapsed: float) -> bool:
+    """Count a finished (or failed) statement everywhere it is reported; True if it was slow"""
+    DB_QUERY_SECONDS.labels(operation=operation).observe(elapsed)
+
+    stats = _request_db_stats.get()
+    if stats is not None:
+        stats.query_count += 1
+        stats.total_seconds += elapsed
+
+    slow = DB_SLOW_QUERY_MS > 0 and elapsed * 1000 >= DB_SLOW_QUERY_MS
+    _record_fingerprint(fingerprint(statement), elapsed, slow)
+    if slow:
+        DB_SLOW_QUERIES.labels(operation=operation).inc()
+    return slow
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    if start is None:
+        return
+    context._query_start = None
+    elapsed = time.perf_counter() - start
+
+    if _record_statement(_statement_operation(statement), statement, elapsed) \
+            and conn.dialect.name == "postgresql" and _explainable(statement, executemany):
+        _maybe_explain(conn.engine, fingerprint(statement), statement, parameters, elapsed)
+
+
+def _handle_error(exception_context):
+    """Time statements that failed (statement_timeout, lock errors...), which skip after_cursor_execute"""
+    context = exception_context.execution_context
+    start = getattr(context, "_query_start", None)
+    if start is None or exception_context.statement is None:
+        return
+    context._query_start = None
+    statement = exception_context.statement
+    _record_statement(_statement_operation(statement), statement, time.perf_counter() - start)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Attach timing listeners to an engine (idempotent)"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
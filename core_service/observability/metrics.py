@@ -0,0 +1,220 @@
+"""
+Metrics - Prometheus metric definitions shared by the core service and agent workers
+"""
+import os
+from typing import Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client import multiprocess
+
+# Buckets tuned for voice latency: most stages should land well under a second
+STAGE_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+DB_QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIMILARITY_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.45, 0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0)
+
+
+# Knowledge base search hot path (agent tool)
+KB_SEARCH_STAGE_SECONDS = Histogram(
+    "kb_search_stage_seconds",
+    "Time spent in each stage of the knowledge base search tool",
+    ["stage"],
+    buckets=STAGE_LATENCY_BUCKETS,
+)
+
+KB_SEARCH_TOP_SIMILARITY = Histogram(
+    "kb_search_top_similarity",
+    "Cosine similarity of the best knowledge base candidate per query",
+    buckets=SIMILARITY_BUCKETS,
+)
+
+KB_SEARCH_LOOKUPS = Counter(
+    "kb_search_lookups_total",
+    "Knowledge base lookups by result (hit = answered from KB, miss = escalated)",
+    ["result"],
+)
+
+KB_SEARCH_STATUS_UPDATES = Counter(
+    "kb_search_status_updates_total",
+    "Number of times the 'one moment' status update was spoken while searching",
+)
+
+KB_RERANK_OUTCOMES = Counter(
+    "kb_rerank_outcomes_total",
+    "Gray-zone rerank decisions (confirmed, reordered, rejected, timeout, error)",
+    ["outcome"],
+)
+
+ESCALATION_IN_CALL_ANSWERS = Counter(
+    "escalation_in_call_answers_total",
+    "Escalated questions by in-call answer outcome (spoken, not_answered, call_ended)",
+    ["outcome"],
+)
+
+
+# Core service HTTP layer
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=STAGE_LATENCY_BUCKETS,
+)
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Requests admitted and being served, by priority class",
+    ["priority"],
+    multiprocess_mode="livesum",
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth",
+    "Requests waiting for admission, by priority class",
+    ["priority"],
+    multiprocess_mode="livesum",
+)
+
+ADMISSION_QUEUE_WAIT_SECONDS = Histogram(
+    "admission_queue_wait_seconds",
+    "Time queued requests waited for admission (admitted or shed)",
+    ["priority"],
+    buckets=STAGE_LATENCY_BUCKETS,
+)
+
+ADMISSION_SHED = Counter(
+    "admission_shed_total",
+    "Requests rejected with 503 by admission control (queue_full, timeout, evicted)",
+    ["priority", "reason"],
+)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "http_request_db_queries",
+    "Number of SQL statements executed while serving a request (N+1 detector)",
+    ["method", "route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+
+DB_TIME_PER_REQUEST_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Total time spent in SQL statements while serving a request",
+    ["method", "route"],
+    buckets=STAGE_LATENCY_BUCKETS,
+)
+
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "Duration of individual SQL statements",
+    ["operation"],
+    buckets=DB_QUERY_BUCKETS,
+)
+
+DB_SLOW_QUERIES = Counter(
+    "db_slow_queries_total",
+    "SQL statements slower than DB_SLOW_QUERY_MS (see observability/db.py)",
+    ["operation"],
+)
+
+DB_SLOW_QUERY_SEQ_SCANS = Counter(
+    "db_slow_query_seq_scans_total",
+    "Sequential scans in the EXPLAIN ANALYZE plans captured for slow statements",
+    ["relation"],
+)
+
+DB_READ_ROUTING = Counter(
+    "db_read_routing_total",
+    "Read-only sessions by the database they were sent to and why (see database/session.py)",
+    ["target", "reason"],
+)
+
+DB_REPLICA_LAG_SECONDS = Gauge(
+    "db_replica_lag_seconds",
+    "Replication lag of each read replica at its last health check",
+    ["replica"],
+    multiprocess_mode="max",
+)
+
+# Embedding provider
+EMBEDDING_REQUEST_SECONDS = Histogram(
+    "embedding_request_duration_seconds",
+    "Latency of embedding provider calls",
+    ["model", "outcome"],
+    buckets=STAGE_LATENCY_BUCKETS,
+)
+
+EMBEDDING_BREAKER_STATE = Gauge(
+    "embedding_circuit_breaker_state",
+    "Embedding provider circuit breaker state (0 = closed, 1 = half open, 2 = open)",
+    ["provider"],
+    multiprocess_mode="max",
+)
+
+EMBEDDING_BREAKER_REJECTIONS = Counter(
+    "embedding_circuit_breaker_rejections_total",
+    "Embedding calls rejected without contacting the provider because the breaker was open",
+    ["provider"],
+)
+
+EMBEDDING_HEDGED_REQUESTS = Counter(
+    "embedding_hedged_requests_total",
+    "Duplicate (hedged or retry) embedding attempts launched",
+    ["provider"],
+)
+
+EMBEDDING_FALLBACKS = Counter(
+    "embedding_fallbacks_total",
+    "Embedding requests served by the fallback path, by reason",
+    ["reason"],
+)
+
+
+def _collector_registry() -> CollectorRegistry:
+    """Return the registry to expose, aggregating child processes in multiprocess mode"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """Render all metrics in the Prometheus text format as (body, content_type)"""
+    return generate_latest(_collector_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: Optional[int] = None) -> bool:
+    """
+    Expose metrics over HTTP for processes that are not behind the core service.
+
+    When PROMETHEUS_MULTIPROC_DIR is set (LiveKit runs each job in its own
+    process) the server aggregates samples written by every child process.
+
+    Args:
+        port: Port to listen on. Defaults to the AGENT_METRICS_PORT env variable.
+
+    Returns:
+        bool: True if the server was started, False if no port is configured
+    """
+    if port is None:
+        port_env = os.getenv("AGENT_METRICS_PORT")
+        if not port_env:
+            return False
+        port = int(port_env)
+
+    start_http_server(port, registry=_collector_registry())
+    return True
@@ -0,0 +1,225 @@
+"""
+Profiling - in-place CPU, memory and asyncio diagnostics for running processes
+
+Shared by the core service (admin HTTP endpoints, api/routes/admin.py) and the
+agent workers (signals, see install_signal_handlers):
+
+- sample_stacks: statistical sampler over every thread's stack, returned in
+  the folded "frame;frame;frame count" format read by flamegraph.pl,
+  speedscope and inferno. Sampling sys._current_frames() needs no tracing
+  hooks, so the profiled code runs at full speed between samples.
+- tracemalloc helpers: top allocation sites and diffs against a baseline.
+- dump_tasks / dump_threads: what every asyncio task and thread is waiting on.
+"""
+import asyncio
+import io
+import logging
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("observability.profiling")
+
+PROFILE_MAX_SECONDS = 60.0
+PROFILE_DUMP_DIR = os.getenv("PROFILE_DUMP_DIR", os.path.join(tempfile.gettempdir(), "salon-profiles"))
+# Length of the CPU capture an agent worker takes on SIGUSR2
+AGENT_PROFILE_SECONDS = float(os.getenv("AGENT_PROFILE_SECONDS", "15"))
+
+_capture_lock = threading.Lock()
+_baseline_lock = threading.Lock()
+_baseline: Optional[tracemalloc.Snapshot] = None
+
+
+class ProfilerBusyError(Exception):
+    """Another CPU capture is already running in this process"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(duration_s: float, interval_s: float = 0.005, include_idle: bool = False) -> str:
+    """
+    Sample every thread's stack for duration_s.
+
+    Args:
+        duration_s: Capture length (capped at PROFILE_MAX_SECONDS)
+        interval_s: Time between samples
+        include_idle: Keep samples of threads parked in a wait (thread pools, selectors)
+
+    Returns:
+        Folded stacks, one "root;...;leaf count" line per distinct stack, most frequent first
+
+    Raises:
+        ProfilerBusyError: If a capture is already running
+    """
+    if not _capture_lock.acquire(blocking=False):
+        raise ProfilerBusyError("A CPU capture is already running")
+    try:
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks: Counter = Counter()
+        deadline = time.monotonic() + min(duration_s, PROFILE_MAX_SECONDS)
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                if not include_idle and labels and labels[0].startswith(("wait ", "select ", "poll ", "_worker ")):
+                    continue
+                labels.append(f"thread {names.get(thread_id, thread_id)}")
+                stacks[";".join(reversed(labels))] += 1
+            time.sleep(interval_s)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    finally:
+        _capture_lock.release()
+
+
+def start_tracemalloc(frames: int = 25) -> bool:
+    """Start tracing allocations (keeping `frames` frames per trace); False if already tracing"""
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(frames)
+    return True
+
+
+def stop_tracemalloc() -> None:
+    """Stop tracing allocations and drop the baseline snapshot"""
+    global _baseline
+    with _baseline_lock:
+        _baseline = None
+    tracemalloc.stop()
+
+
+def _stat_dict(stat) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    return {
+        "location": f"{frame.filename}:{frame.lineno}",
+        "size_bytes": stat.size,
+        "count": stat.count,
+        "size_diff_bytes": getattr(stat, "size_diff", None),
+        "count_diff": getattr(stat, "count_diff", None),
+    }
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not tracing; start it first")
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+
+
+def top_allocations(limit: int = 25, key_type: str = "lineno") -> List[Dict[str, Any]]:
+    """Largest live allocation sites, grouped by "lineno", "filename" or "traceback" """
+    return [_stat_dict(s) for s in _snapshot().statistics(key_type)[:limit]]
+
+
+def set_baseline() -> None:
+    """Take the snapshot later diffs are computed against"""
+    global _baseline
+    snapshot = _snapshot()
+    with _baseline_lock:
+        _baseline = snapshot
+
+
+def diff_allocations(limit: int = 25, key_type: str = "lineno") -> List[Dict[str, Any]]:
+    """Allocation sites that grew the most since set_baseline()"""
+    with _baseline_lock:
+        baseline = _baseline
+    if baseline is None:
+        raise RuntimeError("No baseline snapshot; take one first")
+    return [_stat_dict(s) for s in _snapshot().compare_to(baseline, key_type)[:limit]]
+
+
+def dump_tasks(loop: Optional[asyncio.AbstractEventLoop] = None) -> List[Dict[str, Any]]:
+    """Every pending task of an event loop with the stack it is suspended at"""
+    tasks = asyncio.all_tasks(loop) if loop is not None else asyncio.all_tasks()
+    dumped = []
+    for task in sorted(tasks, key=lambda t: t.get_name()):
+        stack = io.StringIO()
+        task.print_stack(file=stack)
+        dumped.append({
+            "name": task.get_name(),
+            "coro": getattr(task.get_coro(), "__qualname__", repr(task.get_coro())),
+            "done": task.done(),
+            "stack": stack.getvalue().splitlines()[1:],  # Drop the "Stack for <Task ...>" header
+        })
+    return dumped
+
+
+def dump_threads() -> Dict[str, List[str]]:
+    """Current stack of every thread"""
+    names = {t.ident: t.name for t in threading.enumerate()}
+    return {
+        str(names.get(thread_id, thread_id)): [line.rstrip() for line in traceback.format_stack(frame)]
+        for thread_id, frame in sys._current_frames().items()
+    }
+
+
+def _write_dump(kind: str, text: str) -> str:
+    os.makedirs(PROFILE_DUMP_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DUMP_DIR, f"{os.getpid()}-{time.strftime('%Y%m%dT%H%M%S')}-{kind}")
+    with open(path, "w") as f:
+        f.write(text)
+    return path
+
+
+def _dump_state(signum, frame) -> None:
+    lines = []
+    try:
+        tasks = dump_tasks(asyncio.get_running_loop())
+    except RuntimeError:
+        tasks = []  # Signal arrived outside the event loop
+    lines.append(f"# {len(tasks)} asyncio tasks")
+    for task in tasks:
+        lines.append(f"\n## {task['name']} ({task['coro']})")
+        lines.extend(task["stack"])
+    for name, stack in dump_threads().items():
+        lines.append(f"\n# thread {name}")
+        lines.extend(stack)
+    if tracemalloc.is_tracing():
+        lines.append("\n# top allocations")
+        lines.extend(f"{s['location']} {s['size_bytes']} B in {s['count']} blocks" for s in top_allocations())
+    logger.warning(f"Wrote state dump to {_write_dump('state.txt', chr(10).join(lines))}")
+
+
+def _profile_in_background(signum, frame) -> None:
+    def _capture() -> None:
+        try:
+            folded = sample_stacks(AGENT_PROFILE_SECONDS)
+        except ProfilerBusyError:
+            logger.warning("CPU capture already running")
+            return
+        logger.warning(f"Wrote CPU profile to {_write_dump('cpu.folded', folded)}")
+
+    threading.Thread(target=_capture, name="profiler", daemon=True).start()
+
+
+def install_signal_handlers() -> bool:
+    """
+    Let operators diagnose a running process without restarting it:
+    SIGUSR1 writes asyncio tasks, thread stacks (and top allocations, when
+    PYTHONTRACEMALLOC is set) to PROFILE_DUMP_DIR; SIGUSR2 writes an
+    AGENT_PROFILE_SECONDS CPU profile there as folded stacks.
+
+    Returns:
+        bool: False where the signals do not exist (Windows) or off the main thread
+    """
+    if not hasattr(signal, "SIGUSR1") or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signal.SIGUSR1, _dump_state)
+    signal.signal(signal.SIGUSR2, _profile_in_background)
+    return True
@@ -0,0 +1,89 @@
+"""
+Tracing - Per-stage timing spans exported as Prometheus histograms and,
+when the OpenTelemetry API is installed, as OpenTelemetry spans.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .metrics import KB_SEARCH_STAGE_SECONDS
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # OpenTelemetry is optional
+    otel_trace = None
+
+logger = logging.getLogger("observability.tracing")
+
+_tracer = otel_trace.get_tracer("salon.kb_search") if otel_trace else None
+
+# In-process listeners (e.g. the load-test harness) that want raw stage durations
+_stage_observers: List[Callable[[str, float], None]] = []
+
+
+def add_stage_observer(callback: Callable[[str, float], None]) -> None:
+    """Register a callback invoked with (stage_name, duration_s) whenever a stage finishes"""
+    _stage_observers.append(callback)
+
+
+def remove_stage_observer(callback: Callable[[str, float], None]) -> None:
+    """Unregister a callback added with add_stage_observer"""
+    if callback in _stage_observers:
+        _stage_observers.remove(callback)
+
+
+class StageSpan:
+    """Mutable handle yielded by `stage` so callers can attach attributes mid-span."""
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.duration_s: Optional[float] = None
+        self._otel_span = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is None:
+            return
+        self.attributes[key] = value
+        if self._otel_span is not None:
+            self._otel_span.set_attribute(key, value)
+
+
+@contextmanager
+def stage(name: str, **attributes: Any) -> Iterator[StageSpan]:
+    """
+    Time a stage of the knowledge base search hot path.
+
+    The duration is always recorded in the `kb_search_stage_seconds` histogram.
+    Attributes such as room or call ids are attached to the OpenTelemetry span
+    and the debug log line, but never used as Prometheus labels to keep
+    cardinality bounded.
+
+    Args:
+        name: Stage name (e.g. "embedding", "vector_search", "escalation_insert")
+        **attributes: Correlation attributes for the span (room, call_id, ...)
+    """
+    span = StageSpan(name, {k: v for k, v in attributes.items() if v is not None})
+    otel_cm = _tracer.start_as_current_span(f"kb_search.{name}") if _tracer else None
+    if otel_cm is not None:
+        span._otel_span = otel_cm.__enter__()
+        for key, value in span.attributes.items():
+            span._otel_span.set_attribute(key, value)
+
+    start = time.perf_counter()
+    exc_info = (None, None, None)
+    try:
+        yield span
+    except BaseException as e:
+        exc_info = (type(e), e, e.__traceback__)
+        span.set_attribute("error", type(e).__name__)
+        raise
+    finally:
+        span.duration_s = time.perf_counter() - start
+        KB_SEARCH_STAGE_SECONDS.labels(stage=name).observe(span.duration_s)
+        for observer in _stage_observers:
+            observer(name, span.duration_s)
+        if otel_cm is not None:
+            otel_cm.__exit__(*exc_info)
+        logger.debug(f"stage={name} duration_ms={span.duration_s * 1000:.1f} attrs={span.attributes}")
@@ -0,0 +1,124 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.admission import (
+    PRIORITY_BULK,
+    PRIORITY_CRITICAL,
+    PRIORITY_INTERACTIVE,
+    SHED_EVICTED,
+    SHED_QUEUE_FULL,
+    SHED_TIMEOUT,
+    AdmissionController,
+    AdmissionMiddleware,
+    classify,
+)
+
+
+class TestClassification:
+
+    def test_supervisor_actions_are_critical_and_exports_bulk(self):
+        assert classify("POST", "/api/help-requests/5f0c/resolve")[0] == PRIORITY_CRITICAL
+        assert classify("POST", "/api/help-requests/claim")[0] == PRIORITY_CRITICAL
+        assert classify("GET", "/api/help-requests/")[0] == PRIORITY_INTERACTIVE
+        assert classify("GET", "/api/knowledge-base/export")[0] == PRIORITY_BULK
+        assert classify("GET", "/api/knowledge-base/export")[2] == 2
+
+
+class TestAdmissionController:
+
+    def test_queue_is_served_by_priority_then_arrival(self):
+        """Test that a freed slot goes to the most important waiter"""
+        controller = AdmissionController(max_concurrency=1, max_queue=10, queue_timeout_s=1)
+        admitted = []
+
+        async def request(name, priority):
+            assert await controller.acquire(priority) is None
+            admitted.append(name)
+            await asyncio.sleep(0)
+            controller.release(priority)
+
+        async def scenario():
+            await controller.acquire(PRIORITY_INTERACTIVE)
+            tasks = [asyncio.create_task(request(name, priority)) for name, priority in (
+                ("export", PRIORITY_BULK), ("list", PRIORITY_INTERACTIVE),
+                ("resolve", PRIORITY_CRITICAL), ("claim", PRIORITY_CRITICAL),
+            )]
+            await asyncio.sleep(0.01)
+            controller.release(PRIORITY_INTERACTIVE)
+            await asyncio.gather(*tasks)
+
+        asyncio.run(scenario())
+        assert admitted == ["resolve", "claim", "list", "export"]
+        assert (controller.in_flight, controller.queued) == (0, 0)
+
+    def test_full_queue_sheds_or_evicts_lower_priority(self):
+        """Test that a full queue rejects at once, unless a less important waiter can make room"""
+        controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout_s=1)
+
+        async def scenario():
+            await controller.acquire(PRIORITY_INTERACTIVE)
+            bulk = asyncio.create_task(controller.acquire(PRIORITY_BULK))
+            await asyncio.sleep(0)
+            second_bulk = await controller.acquire(PRIORITY_BULK)
+            critical = asyncio.create_task(controller.acquire(PRIORITY_CRITICAL))
+            await asyncio.sleep(0)
+            controller.release(PRIORITY_INTERACTIVE)
+            return second_bulk, await bulk, await critical
+
+        assert asyncio.run(scenario()) == (SHED_QUEUE_FULL, SHED_EVICTED, None)
+
+    def test_wait_longer_than_timeout_is_shed(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=5, queue_timeout_s=0.02)
+
+        async def scenario():
+            await controller.acquire(PRIORITY_INTERACTIVE)
+            return await controller.acquire(PRIORITY_CRITICAL)
+
+        assert asyncio.run(scenario()) == SHED_TIMEOUT
+        assert controller.queued == 0
+
+    def test_route_limit_does_not_block_other_routes(self):
+        """Test that a saturated export route only queues exports"""
+        controller = AdmissionController(max_concurrency=4, max_queue=5, queue_timeout_s=0.02)
+
+        async def scenario():
+            await controller.acquire(PRIORITY_BULK, "export", 1)
+            export = await controller.acquire(PRIORITY_BULK, "export", 1)
+            listing = await controller.acquire(PRIORITY_INTERACTIVE)
+            return export, listing
+
+        assert asyncio.run(scenario()) == (SHED_TIMEOUT, None)
+
+
+class TestAdmissionMiddleware:
+
+    def test_overload_returns_503_with_retry_after(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=0)
+        controller.in_flight = 1  # Another request holds the only slot
+        app = FastAPI()
+        app.add_middleware(AdmissionMiddleware, controller=controller)
+
+        @app.get("/api/help-requests/")
+        def list_help_requests():
+            return []
+
+        @app.get("/healthz")
+        def health_check():
+            return {"status": "ok"}
+
+        @app.get("/api/admin/queries")
+        def query_stats():
+            return []
+
+        with TestClient(app) as client:
+            shed = client.get("/api/help-requests/")
+            health = client.get("/healthz")
+            admin = client.get("/api/admin/queries")
+
+        assert shed.status_code == 503
+        assert shed.headers["retry-after"] == "1"
+        assert health.status_code == 200
+        assert admin.status_code == 200
+        assert controller.in_flight == 1
@@ -0,0 +1,56 @@
+import uuid
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from api.services import customer
+from api.services.customer import caller_phone_from_attributes, customer_id_for_session, normalize_phone_e164
+
+
+class TestCallerPhone:
+
+    def test_normalizes_sip_numbers(self):
+        assert normalize_phone_e164("+1 (212) 555-0100") == "+12125550100"
+        assert normalize_phone_e164("tel:+442071838750") == "+442071838750"
+        assert normalize_phone_e164("12125550100") == "+12125550100"
+        assert normalize_phone_e164("anonymous") is None
+        assert normalize_phone_e164("") is None
+
+    def test_reads_sip_participant_attribute(self):
+        assert caller_phone_from_attributes({"sip.phoneNumber": "+12125550100"}) == "+12125550100"
+        assert caller_phone_from_attributes({}) is None
+        assert caller_phone_from_attributes(None) is None
+
+
+class TestCustomerForSession:
+
+    def setup_method(self):
+        customer._customer_ids.clear()
+
+    def test_repeat_caller_skips_the_database(self):
+        """Test that a cached caller is identified without another upsert"""
+        customer_id = uuid.uuid4()
+        with patch('api.services.customer.crud.upsert_customer_by_phone', return_value=customer_id) as mock_upsert:
+            first = customer_id_for_session(phone_e164="+12125550100", location_id="default")
+            second = customer_id_for_session(phone_e164="+12125550100", location_id="default")
+            customer_id_for_session(phone_e164="+12125550100", location_id="brooklyn")
+
+        assert first == second == customer_id
+        assert mock_upsert.call_count == 2  # Once per location
+
+    def test_cache_is_bounded(self):
+        with patch.object(customer, "CUSTOMER_CACHE_SIZE", 2), \
+             patch('api.services.customer.crud.upsert_customer_by_phone', side_effect=lambda *a, **k: uuid.uuid4()):
+            for phone in ("+12125550100", "+12125550101", "+12125550102"):
+                customer_id_for_session(phone_e164=phone)
+
+        assert [key[1] for key in customer._customer_ids] == ["+12125550101", "+12125550102"]
+
+    def test_anonymous_caller_gets_new_customer(self):
+        created = SimpleNamespace(id=uuid.uuid4())
+        with patch('api.services.customer.crud.create_customer', return_value=created) as mock_create, \
+             patch('api.services.customer.crud.upsert_customer_by_phone') as mock_upsert:
+            assert customer_id_for_session(display_name="Voice Chat Customer") == created.id
+
+        mock_create.assert_called_once_with({"location_id": "default", "display_name": "Voice Chat Customer"})
+        mock_upsert.assert_not_called()
+
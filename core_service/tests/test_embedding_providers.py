@@ -0,0 +1,109 @@
+import pytest
+from unittest.mock import Mock, patch
+
+from api.services.embedding_providers import HashingEmbeddingProvider, create_provider
+from api.services.llm_client import Embedding, LLMClient
+from api.services.knowledge_base import create_knowledge_base_from_text, search_knowledge_base_by_question
+
+
+def _cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+class TestHashingEmbeddingProvider:
+
+    def test_embedding_shape_and_norm(self):
+        """Test that local embeddings are 1536-dim unit vectors"""
+        vector = HashingEmbeddingProvider().embed("What are your opening hours?")
+        assert len(vector) == 1536
+        assert _cosine(vector, vector) == pytest.approx(1.0)
+
+    def test_embedding_is_deterministic(self):
+        """Test that separate provider instances agree (needed across worker processes)"""
+        assert HashingEmbeddingProvider().embed("Do you do nails?") == HashingEmbeddingProvider().embed("Do you do nails?")
+
+    def test_paraphrases_are_closer_than_unrelated_text(self):
+        """Test that shared vocabulary produces higher similarity"""
+        provider = HashingEmbeddingProvider()
+        base = provider.embed("What are your opening hours on Saturday?")
+        paraphrase = provider.embed("What are the opening hours on Saturdays?")
+        unrelated = provider.embed("Do you sell gift cards?")
+        assert _cosine(base, paraphrase) > 0.5
+        assert _cosine(base, paraphrase) > _cosine(base, unrelated)
+
+    def test_empty_text(self):
+        """Test that text without tokens yields a zero vector instead of failing"""
+        assert set(HashingEmbeddingProvider().embed("?!")) == {0.0}
+
+    def test_create_provider(self):
+        """Test provider selection by config name"""
+        assert create_provider("local").tag == "local:feature-hash-v1-1536"
+        assert create_provider("openai").tag == "openai:text-embedding-3-small"
+        assert create_provider(None) is None
+        assert create_provider("none") is None
+        with pytest.raises(ValueError):
+            create_provider("unknown")
+
+
+class TestLLMClientFallback:
+
+    def test_primary_embedding_is_tagged(self):
+        """Test that embeddings carry the primary provider tag"""
+        client = LLMClient(provider=HashingEmbeddingProvider())
+        embedding = client.embed("Do you do nails?")
+        assert embedding.model_tag == "local:feature-hash-v1-1536"
+        assert embedding.is_fallback is False
+
+    def test_falls_back_when_primary_fails(self):
+        """Test that a failing primary provider degrades to the fallback provider"""
+        primary = Mock(tag="openai:text-embedding-3-small", model="text-embedding-3-small")
+        primary.embed.side_effect = RuntimeError("provider down")
+        client = LLMClient(provider=primary, fallback_provider=HashingEmbeddingProvider())
+
+        embedding = client.embed("Do you do nails?")
+
+        assert embedding.model_tag == "local:feature-hash-v1-1536"
+        assert embedding.is_fallback is True
+        assert len(embedding) == 1536
+
+    def test_raises_without_fallback(self):
+        """Test that a failing primary provider raises when no fallback is configured"""
+        primary = Mock(tag="openai:text-embedding-3-small", model="text-embedding-3-small")
+        primary.embed.side_effect = RuntimeError("provider down")
+
+        with patch.dict('os.environ', {"EMBEDDING_FALLBACK_PROVIDER": ""}):
+            client = LLMClient(provider=primary)
+
+        with pytest.raises(Exception, match="Failed to get embedding"):
+            client.get_embedding("Do you do nails?")
+
+
+class TestProviderTaggedKnowledgeBase:
+
+    def test_search_only_matches_same_provider(self):
+        """Test that the query's provider tag and column choice are passed to the vector search"""
+        embedding = Embedding([0.1] * 1536, "local:feature-hash-v1-1536", is_fallback=True)
+
+        with patch('api.services.knowledge_base.embed_question', return_value=embedding), \
+             patch('api.services.knowledge_base.crud.search_kb_by_embedding', return_value=[]) as mock_search:
+            search_knowledge_base_by_question("Do you do nails?", k=3, min_sim=0.5)
+
+        mock_search.assert_called_once_with(
+            [0.1] * 1536, k=3, embedding_model="local:feature-hash-v1-1536", use_fallback=True,
+            location_id="default",
+        )
+
+    def test_create_stores_primary_and_fallback_embeddings(self):
+        """Test that KB writes store both tagged embeddings when a fallback is configured"""
+        primary = Embedding([0.1] * 1536, "openai:text-embedding-3-small")
+        fallback = Embedding([0.2] * 1536, "local:feature-hash-v1-1536", is_fallback=True)
+
+        with patch('api.services.knowledge_base.embed_question', return_value=primary), \
+             patch('api.services.knowledge_base.embed_question_fallback', return_value=fallback), \
+             patch('api.services.knowledge_base.crud.create_kb') as mock_create:
+            create_knowledge_base_from_text("Do you do nails?", "Yes, every day.")
+
+        payload = mock_create.call_args[0][0]
+        assert payload["embedding_model"] == "openai:text-embedding-3-small"
+        assert payload["fallback_embedding_model"] == "local:feature-hash-v1-1536"
+        assert payload["fallback_embedding"][0] == 0.2
@@ -0,0 +1,105 @@
+import math
+import random
+import pytest
+from unittest.mock import Mock
+
+from api.services.embedding_providers import (
+    HashingEmbeddingProvider,
+    OpenAIEmbeddingProvider,
+    create_provider,
+    truncate_embedding,
+)
+from core_service.benchmarks.embedding_storage import query_sql, recall_at_k, synthetic_corpus
+from core_service.database.vector_storage import column_type_sql, index_sql
+from core_service.jobs.migrate_embedding_storage import plan_statements
+
+
+class TestReducedDimensions:
+
+    def test_truncate_embedding_renormalizes(self):
+        """Test that truncation keeps the leading components as a unit vector"""
+        truncated = truncate_embedding([3.0, 4.0, 12.0], 2)
+
+        assert truncated == pytest.approx([0.6, 0.8])
+
+    def test_local_provider_reduced_vector_is_prefix_of_full(self):
+        """Test that a reduced local embedding equals the truncated full-width one"""
+        text = "What are your opening hours?"
+        full = HashingEmbeddingProvider().embed(text)
+        reduced = HashingEmbeddingProvider(dimensions=512).embed(text)
+
+        assert len(reduced) == 512
+        assert reduced == pytest.approx(truncate_embedding(full, 512))
+
+    def test_reduced_dimensions_are_tagged(self):
+        """Test that reduced-dimension vectors never share a tag with full-width ones"""
+        assert create_provider("local", dimensions=512).tag == "local:feature-hash-v1-1536@512"
+        assert create_provider("openai", dimensions=256).tag == "openai:text-embedding-3-small@256"
+        assert create_provider("openai", dimensions=1536).tag == "openai:text-embedding-3-small"
+
+    def test_openai_requests_reduced_dimensions(self):
+        """Test that the API is asked for the reduced width, and only when reduced"""
+        provider = OpenAIEmbeddingProvider(dimensions=512)
+        provider._client = Mock()
+        provider._client.embeddings.create.return_value = Mock(data=[Mock(embedding=[0.1] * 512)])
+
+        provider.embed("hello")
+
+        provider._client.embeddings.create.assert_called_once_with(
+            input="hello", model="text-embedding-3-small", dimensions=512
+        )
+
+    def test_dimensions_above_native_are_rejected(self):
+        """Test that a provider cannot be configured wider than its model"""
+        with pytest.raises(ValueError):
+            HashingEmbeddingProvider(dimensions=2048)
+
+
+class TestStorageMigration:
+
+    def test_shrink_truncates_in_place_and_retags(self):
+        """Test that shrinking rewrites vectors by truncation and appends the width to tags"""
+        statements = plan_statements(1536, 512, "binary")
+        sql = "\n".join(statements)
+
+        assert "l2_normalize(subvector(embedding, 1, 512))::halfvec(512)" in sql
+        assert "|| '@512'" in sql
+        assert "USING hnsw ((binary_quantize(embedding)::bit(512)) bit_hamming_ops)" in sql
+        # Indexes are dropped before the rewrite and rebuilt after it
+        assert statements[0] == "DROP INDEX IF EXISTS knowledge_base_vec_idx"
+
+    def test_grow_pads_without_retagging(self):
+        """Test that growing pads vectors and leaves tags for re-embedding to fix"""
+        sql = "\n".join(plan_statements(512, 1536, "vector"))
+
+        assert "array_fill(0::real, ARRAY[1024])" in sql
+        assert "UPDATE knowledge_base" not in sql
+
+    def test_storage_types(self):
+        """Test the column type and index opclass for each storage mode"""
+        assert column_type_sql(1536, "vector") == "vector(1536)"
+        assert column_type_sql(512, "halfvec") == "halfvec(512)"
+        assert column_type_sql(512, "binary") == "halfvec(512)"
+        assert "halfvec_cosine_ops" in index_sql("embedding", "idx", 512, "halfvec")
+
+
+class TestStorageBenchmarkHelpers:
+
+    def test_recall_at_k(self):
+        """Test recall as the overlap with the exact top-k"""
+        assert recall_at_k([1, 2, 3, 4], [1, 2, 5, 6]) == 0.5
+        assert recall_at_k([], []) == 1.0
+
+    def test_synthetic_corpus_is_unit_vectors(self):
+        """Test the synthetic corpus shape"""
+        corpus = synthetic_corpus(10, 64, 3, random.Random(1))
+
+        assert len(corpus) == 10
+        assert all(math.isclose(sum(v * v for v in vec), 1.0) for vec in corpus)
+
+    def test_binary_query_rescores_hamming_candidates(self):
+        """Test that the binary query orders by Hamming distance then by exact cosine"""
+        sql = query_sql("t", 512, "binary")
+
+        assert "<~> (binary_quantize(CAST(:query_vec AS halfvec(512)))::bit(512))" in sql
+        assert "ORDER BY distance" in sql
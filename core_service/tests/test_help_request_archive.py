@@ -0,0 +1,49 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from sqlalchemy.orm import sessionmaker
+
+from database.crud.help_requests_crud import get_help_request_with_answer, iter_help_request_history
+from database.models import HelpRequestArchive, SupervisorResponseArchive
+
+
+def _archived_request(test_session, customer_id):
+    created = datetime.now(timezone.utc) - timedelta(days=90)
+    archived = HelpRequestArchive(
+        id=uuid.uuid4(), customer_id=customer_id, question_text="Do you do balayage?",
+        status="resolved", created_at=created, expires_at=created + timedelta(hours=1),
+        resolved_at=created + timedelta(minutes=10),
+    )
+    test_session.add(archived)
+    test_session.add(SupervisorResponseArchive(id=uuid.uuid4(), help_request_id=archived.id, answer_text="Yes"))
+    test_session.commit()
+    return archived
+
+
+class TestArchivedHelpRequests:
+
+    def test_detail_falls_back_to_archive(self, test_engine, test_session, sample_help_request):
+        """Test that an archived request is still found by id, with its answer"""
+        archived = _archived_request(test_session, sample_help_request.customer_id)
+        TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+        with patch('database.crud.help_requests_crud.SessionLocal', TestSessionLocal):
+            result = get_help_request_with_answer(archived.id)
+            missing = get_help_request_with_answer(uuid.uuid4())
+
+        assert result["help_request"].question_text == "Do you do balayage?"
+        assert result["supervisor_response"].answer_text == "Yes"
+        assert missing is None
+
+    def test_history_covers_hot_and_archive(self, test_engine, test_session, sample_help_request):
+        """Test that the history export merges both tables, oldest first"""
+        archived = _archived_request(test_session, sample_help_request.customer_id)
+        TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+        with patch('database.crud.help_requests_crud.SessionLocal', TestSessionLocal):
+            rows = list(iter_help_request_history())
+            resolved = list(iter_help_request_history(statuses=["resolved"]))
+
+        assert [row["id"] for row in rows] == [archived.id, sample_help_request.id]
+        assert rows[0]["answer_text"] == "Yes"
+        assert [row["id"] for row in resolved] == [archived.id]
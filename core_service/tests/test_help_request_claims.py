@@ -0,0 +1,132 @@
+import contextvars
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from api.caching import listing_etag
+
+from database.crud.help_requests_crud import (
+    HelpRequestConflictError,
+    claim_next_help_request,
+    create_supervisor_response,
+    heartbeat_claim,
+    release_claim,
+    update_help_request_status,
+)
+from database.crud.table_versions_crud import get_table_versions
+from database.models import HelpRequest
+
+
+@pytest.fixture
+def queue(test_engine, test_session, sample_customer):
+    """Three pending requests expiring in 30, 10 and 20 minutes, plus an expired one"""
+    now = datetime.now(timezone.utc)
+    requests = {}
+    for name, minutes in (("later", 30), ("urgent", 10), ("soon", 20), ("expired", -5)):
+        hr = HelpRequest(id=uuid.uuid4(), customer_id=sample_customer.id, question_text=name, status="pending",
+                         expires_at=now + timedelta(minutes=minutes))
+        test_session.add(hr)
+        requests[name] = hr.id
+    test_session.commit()
+    TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+    with patch('database.crud.help_requests_crud.SessionLocal', TestSessionLocal):
+        yield requests
+
+
+class TestClaims:
+
+    def test_supervisors_get_different_requests_most_urgent_first(self, queue):
+        """Test that each claim hands out the next unclaimed request by expires_at"""
+        claims = [claim_next_help_request(s, 60) for s in ("alice", "bob", "carol", "dave")]
+
+        assert [c.id if c else None for c in claims] == [queue["urgent"], queue["soon"], queue["later"], None]
+        assert claims[0].claimed_by == "alice"
+
+    def test_claim_again_returns_held_request(self, queue):
+        """Test that a supervisor holds one claim at a time"""
+        first = claim_next_help_request("alice", 60)
+        again = claim_next_help_request("alice", 60)
+
+        assert again.id == first.id
+
+    def test_lapsed_claim_returns_to_queue(self, queue):
+        """Test that a claim not renewed in time can be taken by someone else"""
+        claim_next_help_request("alice", -1)
+
+        assert claim_next_help_request("bob", 60).id == queue["urgent"]
+        assert heartbeat_claim(queue["urgent"], "alice", 60) is None
+
+    def test_heartbeat_and_release(self, queue):
+        """Test that only the holder can renew or release a claim"""
+        claim_next_help_request("alice", 60)
+
+        assert heartbeat_claim(queue["urgent"], "alice", 60).claimed_by == "alice"
+        assert not release_claim(queue["urgent"], "bob")
+        assert release_claim(queue["urgent"], "alice")
+        assert claim_next_help_request("bob", 60).id == queue["urgent"]
+
+
+class TestAnswerConflicts:
+
+    def test_claimed_request_rejects_other_responders(self, queue):
+        """Test that only the claim holder can answer a claimed request"""
+        claim_next_help_request("alice", 60)
+
+        with pytest.raises(HelpRequestConflictError):
+            create_supervisor_response(queue["urgent"], "No", responder_id="bob")
+        assert create_supervisor_response(queue["urgent"], "Yes", responder_id="alice") is not None
+
+    def test_second_answer_is_a_conflict(self, queue):
+        """Test that answering twice fails before any knowledge base work"""
+        create_supervisor_response(queue["soon"], "Yes", responder_id="alice")
+
+        with pytest.raises(HelpRequestConflictError):
+            create_supervisor_response(queue["soon"], "Yes", responder_id="bob")
+
+
+VERSION_TRIGGER_SQL = Path(__file__).parents[2] / "db" / "init" / "013_help_request_version_columns.sql"
+
+
+class TestListingETag:
+
+    @pytest.fixture
+    def counted(self, queue, test_engine):
+        """help_requests version counter bumped on updates of the columns 013 lists, as in Postgres"""
+        columns = re.search(r"UPDATE OF (.*?)\s+ON help_requests", VERSION_TRIGGER_SQL.read_text(), re.DOTALL).group(1)
+        with test_engine.begin() as conn:
+            conn.execute(text("CREATE TABLE table_versions (table_name TEXT PRIMARY KEY, version INTEGER NOT NULL)"))
+            conn.execute(text("INSERT INTO table_versions VALUES ('help_requests', 0)"))
+            conn.execute(text(
+                f"CREATE TRIGGER help_requests_version_trg AFTER UPDATE OF {' '.join(columns.split())} ON help_requests "
+                "BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'help_requests'; END"
+            ))
+        TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+        with patch('database.crud.table_versions_crud.SessionLocal', TestSessionLocal), \
+             patch('api.caching.crud.get_table_versions', get_table_versions):
+            yield queue
+
+    @staticmethod
+    def _etag():
+        request = SimpleNamespace(url=SimpleNamespace(path="/api/help-requests/", query="status=pending"))
+        # Own context: listing_etag pins this request's reads to one database
+        return contextvars.copy_context().run(listing_etag, request, ["help_requests"])
+
+    def test_heartbeat_keeps_listing_etag(self, counted):
+        """Test that claim lease writes do not invalidate cached listings, while status changes do"""
+        claim_next_help_request("alice", 60)
+        etag = self._etag()
+
+        heartbeat_claim(counted["urgent"], "alice", 60)
+        assert self._etag() == etag
+        release_claim(counted["urgent"], "alice")
+        assert self._etag() == etag
+
+        update_help_request_status(counted["soon"], "resolved")
+        assert self._etag() != etag
@@ -0,0 +1,119 @@
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from api.services.help_request_clusters import batch_resolve, cluster_pending_help_requests, cluster_vectors
+from api.services.llm_client import Embedding
+from database.crud.help_requests_crud import batch_resolve_help_requests
+from database.models import Followup, HelpRequest, KnowledgeBaseEntry, SupervisorResponse
+
+
+def _pending(question, location_id="default", minutes_ago=0):
+    return SimpleNamespace(id=uuid.uuid4(), location_id=location_id, question_text=question, status="pending",
+                           created_at=datetime(2025, 1, 2, tzinfo=timezone.utc) - timedelta(minutes=minutes_ago))
+
+
+class TestClusterVectors:
+
+    def test_groups_near_duplicates(self):
+        """Test that paraphrase vectors merge and an unrelated one stays alone"""
+        vectors = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.98, 0.05, 0.0], [0.95, 0.1, 0.05]])
+
+        assert cluster_vectors(vectors, threshold=0.9) == [[0, 2, 3], [1]]
+
+    def test_threshold_one_keeps_singletons(self):
+        vectors = np.array([[1.0, 0.0], [0.9, 0.1]])
+
+        assert cluster_vectors(vectors, threshold=1.0) == [[0], [1]]
+        assert cluster_vectors(np.zeros((0, 2)), threshold=0.5) == []
+
+
+class TestClusterPending:
+
+    def test_clusters_never_span_locations(self):
+        """Test that identical questions of different locations form separate clusters"""
+        pending = [_pending("Open Sunday?", "default", 5), _pending("Open Sunday?", "brooklyn"),
+                   _pending("Are you open on Sundays?", "default")]
+
+        def fake_embed(texts):
+            return [Embedding([1.0, 0.0], "test:model") for _ in texts]
+
+        with patch('api.services.help_request_clusters.crud.list_help_requests', return_value=pending), \
+             patch('api.services.help_request_clusters.embed_questions', side_effect=fake_embed):
+            clusters = cluster_pending_help_requests()
+
+        assert [(c["location_id"], c["size"]) for c in clusters] == [("default", 2), ("brooklyn", 1)]
+        assert clusters[0]["representative_question"] == "Open Sunday?"
+
+
+class TestBatchResolve:
+
+    def test_rejects_mixed_locations(self):
+        """Test that one answer cannot resolve requests of different locations"""
+        requests = [_pending("Q", "default"), _pending("Q", "brooklyn")]
+
+        with patch('api.services.help_request_clusters.crud.get_help_requests_with_customers', return_value=requests):
+            with pytest.raises(ValueError):
+                batch_resolve([r.id for r in requests], "A", "sup", logging.getLogger("test"))
+
+    def test_kb_entry_carries_dedup_key(self):
+        """Test that the cluster's KB entry can be found by later imports"""
+        requests = [_pending("Open on SUNDAY?", "brooklyn", 5), _pending("open sunday", "brooklyn")]
+        for request in requests:
+            request.customer = None
+
+        with patch('api.services.help_request_clusters.crud.get_help_requests_with_customers', return_value=requests), \
+             patch('api.services.knowledge_base.embed_question', return_value=Embedding([0.1] * 4, "test:model")), \
+             patch('api.services.knowledge_base.embed_question_fallback', return_value=None), \
+             patch('api.services.help_request_clusters.customer_notification_followup', return_value={}), \
+             patch('api.services.help_request_clusters.crud.batch_resolve_help_requests',
+                   return_value=([], None)) as mock_resolve:
+            batch_resolve([r.id for r in requests], "A", "sup", logging.getLogger("test"))
+
+        kb_entry = mock_resolve.call_args[0][3]
+        assert kb_entry["normalized_key"] == "open on sunday"
+        assert kb_entry["location_id"] == "brooklyn"
+
+    def test_single_transaction_resolves_pending_only(self, test_engine, test_session, sample_customer):
+        """Test that pending requests get responses, followups and one KB entry; others are skipped"""
+        requests = [
+            HelpRequest(id=uuid.uuid4(), customer_id=sample_customer.id, question_text=f"Q{i}", status=status,
+                        expires_at=datetime.now(timezone.utc) + timedelta(hours=1))
+            for i, status in enumerate(("pending", "pending", "cancelled"))
+        ]
+        test_session.add_all(requests)
+        test_session.commit()
+        ids = [r.id for r in requests]
+        followups = [{"help_request_id": i, "customer_id": sample_customer.id, "channel": "customer_sms",
+                      "payload": {"message": "A"}} for i in ids]
+        older = KnowledgeBaseEntry(question_text_example="q0", answer_text="Old", normalized_key="q0",
+                                   embedding=[0.1] * 1536)
+        test_session.add(older)
+        test_session.commit()
+        kb_entry = {"question_text_example": "Q0", "answer_text": "A", "embedding": [0.1] * 1536, "normalized_key": "q0"}
+        TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+        with patch('database.crud.help_requests_crud.SessionLocal', TestSessionLocal):
+            resolved, kb_row = batch_resolve_help_requests(ids, "A", "sup", kb_entry, followups)
+
+        assert sorted(r.question_text for r in resolved) == ["Q0", "Q1"]
+        assert kb_row is not None
+        check = TestSessionLocal()
+        try:
+            assert check.query(SupervisorResponse).count() == 2
+            assert check.query(Followup).count() == 2
+            assert check.query(KnowledgeBaseEntry).count() == 2
+            # The new entry takes over the dedup key of the older one asking the same question
+            assert check.query(KnowledgeBaseEntry.normalized_key).filter(
+                KnowledgeBaseEntry.id == kb_row.id).scalar() == "q0"
+            assert check.query(KnowledgeBaseEntry.normalized_key).filter(
+                KnowledgeBaseEntry.id == older.id).scalar() is None
+            assert {r.status for r in check.query(HelpRequest).all()} == {"resolved", "cancelled"}
+        finally:
+            check.close()
@@ -0,0 +1,60 @@
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from sqlalchemy.orm import sessionmaker
+
+from database.crud.help_requests_crud import iter_help_request_history
+from database.models import SupervisorResponse
+
+
+class TestHelpRequestHistoryCRUD:
+
+    def test_rows_are_joined_with_supervisor_response(self, test_engine, test_session, sample_help_request):
+        """Test that history rows carry the answer of resolved requests"""
+        test_session.add(SupervisorResponse(help_request_id=sample_help_request.id, answer_text="Use the reset link"))
+        test_session.commit()
+        TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+        with patch('database.crud.help_requests_crud.SessionLocal', TestSessionLocal):
+            rows = list(iter_help_request_history(batch_size=1))
+
+        assert len(rows) == 1
+        assert rows[0]["question_text"] == "How do I reset my password?"
+        assert rows[0]["answer_text"] == "Use the reset link"
+        assert rows[0]["followup_status"] is None
+
+    def test_status_and_date_filters(self, test_engine, sample_help_request):
+        """Test that status and created_at range filters are applied"""
+        TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+        tomorrow = datetime.now(timezone.utc) + timedelta(days=1)
+
+        with patch('database.crud.help_requests_crud.SessionLocal', TestSessionLocal):
+            assert list(iter_help_request_history(statuses=["resolved"])) == []
+            assert list(iter_help_request_history(created_from=tomorrow)) == []
+            assert len(list(iter_help_request_history(statuses=["pending", "resolved"]))) == 1
+
+
+class TestHelpRequestExportRoute:
+
+    def test_export_streams_ndjson(self, client):
+        """Test GET /api/help-requests/export writes one JSON object per line"""
+        rows = [
+            {"id": uuid.uuid4(), "status": "resolved", "created_at": datetime(2025, 1, 2, tzinfo=timezone.utc)},
+            {"id": uuid.uuid4(), "status": "pending", "created_at": datetime(2025, 1, 3, tzinfo=timezone.utc)},
+        ]
+
+        with patch('api.services.help_requests.crud.iter_help_request_history', return_value=iter(rows)) as mock_iter:
+            response = client.get(
+                "/api/help-requests/export",
+                params={"status": ["resolved", "pending"], "created_from": "2025-01-01T00:00:00Z"},
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["status"] for line in lines] == ["resolved", "pending"]
+        assert lines[0]["created_at"] == "2025-01-02T00:00:00+00:00"
+        kwargs = mock_iter.call_args.kwargs
+        assert kwargs["statuses"] == ["resolved", "pending"]
+        assert kwargs["created_from"] == datetime(2025, 1, 1, tzinfo=timezone.utc)
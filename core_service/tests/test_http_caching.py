@@ -0,0 +1,107 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+from sqlalchemy.orm import sessionmaker
+
+from api.caching import etag_matches
+from database.crud.help_requests_crud import get_next_pending_expiry
+
+KB_VERSIONS = {"knowledge_base": 7}
+
+
+def _kb_entry():
+    now = datetime(2025, 1, 2, tzinfo=timezone.utc)
+    return SimpleNamespace(id=uuid.uuid4(), location_id="default", question_text_example="Q", answer_text="A", created_at=now, updated_at=now)
+
+
+class TestConditionalGet:
+
+    def test_if_none_match_returns_304_without_loading_rows(self, client):
+        """Test that a matching ETag short-circuits before the listing query"""
+        with patch('api.caching.crud.get_table_versions', return_value=KB_VERSIONS), \
+             patch('api.routes.knowledge_base.crud.list_kb', return_value=[_kb_entry()]) as mock_list:
+            first = client.get("/api/knowledge-base")
+            etag = first.headers["etag"]
+            second = client.get("/api/knowledge-base", headers={"If-None-Match": etag})
+
+        assert first.status_code == 200
+        assert first.headers["cache-control"] == "private, no-cache"
+        assert second.status_code == 304
+        assert second.headers["etag"] == etag
+        assert second.content == b""
+        assert mock_list.call_count == 1
+
+    def test_write_changes_etag(self, client):
+        """Test that a bumped table version invalidates the client's copy"""
+        with patch('api.caching.crud.get_table_versions', return_value=KB_VERSIONS), \
+             patch('api.routes.knowledge_base.crud.list_kb', return_value=[]):
+            etag = client.get("/api/knowledge-base").headers["etag"]
+
+        with patch('api.caching.crud.get_table_versions', return_value={"knowledge_base": 8}), \
+             patch('api.routes.knowledge_base.crud.list_kb', return_value=[]):
+            response = client.get("/api/knowledge-base", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+    def test_pending_listing_etag_follows_next_expiry(self, client):
+        """Test that the pending listing revalidates once its earliest request expires"""
+        versions = {"help_requests": 3, "supervisor_responses": 1}
+        soon = datetime.now(timezone.utc) + timedelta(minutes=5)
+
+        with patch('api.caching.crud.get_table_versions', return_value=versions), \
+             patch('api.routes.help_requests.crud.list_help_requests', return_value=[]), \
+             patch('api.routes.help_requests.crud.get_next_pending_expiry', side_effect=[soon, soon + timedelta(minutes=1)]):
+            etag = client.get("/api/help-requests/?status=pending").headers["etag"]
+            response = client.get("/api/help-requests/?status=pending", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+    def test_no_etag_without_version_counters(self, client):
+        """Test that responses are not cacheable when the counters are unavailable"""
+        with patch('api.caching.crud.get_table_versions', return_value=None), \
+             patch('api.routes.knowledge_base.crud.list_kb', return_value=[]):
+            response = client.get("/api/knowledge-base", headers={"If-None-Match": "*"})
+
+        assert response.status_code == 200
+        assert "etag" not in response.headers
+
+    def test_compressed_representation_has_its_own_etag(self, client):
+        """Test that gzip and identity bodies carry different strong ETags, both revalidating"""
+        entries = [_kb_entry() for _ in range(50)]
+        with patch('api.caching.crud.get_table_versions', return_value=KB_VERSIONS), \
+             patch('api.routes.knowledge_base.crud.list_kb', return_value=entries), \
+             patch('api.middleware.brotli', None):
+            gzipped = client.get("/api/knowledge-base", headers={"Accept-Encoding": "gzip"})
+            identity = client.get("/api/knowledge-base", headers={"Accept-Encoding": "identity"})
+            revalidated = client.get("/api/knowledge-base", headers={
+                "Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"],
+            })
+
+        assert gzipped.headers["content-encoding"] == "gzip"
+        assert gzipped.headers["etag"] == identity.headers["etag"][:-1] + '-gzip"'
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == gzipped.headers["etag"]
+
+    def test_etag_matching(self):
+        """Test If-None-Match lists and weak comparison"""
+        assert etag_matches('"a", W/"b"', '"b"')
+        assert not etag_matches('"a"', '"b"')
+        assert not etag_matches(None, '"b"')
+        assert etag_matches('"b-gzip"', '"b"')
+        assert not etag_matches('"b-deflate"', '"b"')
+
+
+class TestNextPendingExpiry:
+
+    def test_earliest_unexpired_pending_request(self, test_engine, sample_help_request):
+        """Test that only pending, unexpired requests count"""
+        TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+        with patch('database.crud.help_requests_crud.SessionLocal', TestSessionLocal):
+            expiry = get_next_pending_expiry()
+
+        assert expiry is not None
+        assert expiry.replace(tzinfo=None) == sample_help_request.expires_at.replace(tzinfo=None)
@@ -0,0 +1,56 @@
+import pytest
+from unittest.mock import patch
+
+from api.services.knowledge_base import search_knowledge_base_by_question
+from api.services.llm_client import Embedding, EmbeddingUnavailableError
+
+
+def _row(entry_id, sim, **extra):
+    return {"id": entry_id, "question_text_example": f"q{entry_id}", "answer_text": f"a{entry_id}", "sim": sim, **extra}
+
+
+class TestSearchModes:
+
+    def test_hybrid_filters_fused_rows_by_cosine_similarity(self):
+        """Test that hybrid keeps RRF order but applies the cosine cutoff"""
+        embedding = Embedding([0.1] * 1536, "openai:text-embedding-3-small")
+        fused = [
+            _row("1", 0.42, rrf_score=0.032),   # strong lexical match, weak vector match
+            _row("2", 0.81, rrf_score=0.031),
+            _row("3", None, rrf_score=0.016),   # lexical-only row from another provider
+        ]
+
+        with patch('api.services.knowledge_base.embed_question', return_value=embedding), \
+             patch('api.services.knowledge_base.crud.search_kb_hybrid', return_value=fused) as mock_hybrid:
+            result = search_knowledge_base_by_question("Opening hours on Sunday?", k=1, min_sim=0.5, mode="hybrid")
+
+        assert [r["id"] for r in result] == ["2"]
+        args, kwargs = mock_hybrid.call_args
+        assert args[0] == "Opening hours on Sunday?"
+        assert kwargs["k"] == 5
+        assert kwargs["embedding_model"] == "openai:text-embedding-3-small"
+
+    def test_lexical_mode_skips_embedding(self):
+        """Test that lexical mode never calls the embedding provider"""
+        rows = [_row("1", 0.72), _row("2", 0.31)]
+
+        with patch('api.services.knowledge_base.embed_question') as mock_embed, \
+             patch('api.services.knowledge_base.crud.search_kb_lexical', return_value=rows):
+            result = search_knowledge_base_by_question("Opening hours?", k=2, mode="lexical")
+
+        mock_embed.assert_not_called()
+        assert [r["id"] for r in result] == ["1"]
+
+    def test_unavailable_embeddings_fall_back_to_lexical(self):
+        """Test that vector mode degrades to lexical search when embeddings are unavailable"""
+        with patch('api.services.knowledge_base.embed_question', side_effect=EmbeddingUnavailableError("down")), \
+             patch('api.services.knowledge_base.crud.search_kb_lexical', return_value=[_row("1", 0.9)]) as mock_lexical:
+            result = search_knowledge_base_by_question("Opening hours?", k=1, mode="vector")
+
+        mock_lexical.assert_called_once_with("Opening hours?", k=1, location_id="default")
+        assert result[0]["id"] == "1"
+
+    def test_unknown_mode(self):
+        """Test that an unknown mode is rejected"""
+        with pytest.raises(ValueError):
+            search_knowledge_base_by_question("Opening hours?", mode="semantic")
@@ -0,0 +1,159 @@
+import json
+import pytest
+from unittest.mock import patch
+from sqlalchemy.orm import sessionmaker
+
+from api.services.knowledge_base_bulk import (
+    KBImportError,
+    export_entries,
+    import_entries,
+    normalize_question_key,
+    parse_import,
+)
+from api.services.knowledge_base import create_knowledge_base_from_text, update_knowledge_base_from_text
+from api.services.llm_client import Embedding
+from database.models import KnowledgeBaseEntry
+
+PRIMARY_TAG = "openai:text-embedding-3-small"
+
+
+def _fake_embed_batch(texts):
+    return [Embedding([float(len(text))] * 4, PRIMARY_TAG) for text in texts]
+
+
+class TestParseImport:
+
+    def test_csv_with_normalized_keys(self):
+        """Test CSV parsing derives dedup keys from the question"""
+        lines = ["question_text_example,answer_text", "What are your HOURS?,9-5 daily"]
+
+        records = parse_import(lines, "csv")
+
+        assert records[0]["normalized_key"] == "what are your hours"
+        assert records[0]["embedding"] is None
+
+    def test_jsonl_carries_exported_embeddings(self):
+        """Test that exported vectors and tags survive parsing"""
+        line = json.dumps({"question_text_example": "Q", "answer_text": "A", "embedding": [1, 2], "embedding_model": PRIMARY_TAG})
+
+        records = parse_import([line, ""], "jsonl")
+
+        assert len(records) == 1
+        assert records[0]["embedding"] == [1.0, 2.0]
+        assert records[0]["embedding_model"] == PRIMARY_TAG
+
+    def test_missing_answer_names_the_line(self):
+        """Test that malformed rows are rejected with their line number"""
+        with pytest.raises(KBImportError, match="line 3"):
+            parse_import(["question_text_example,answer_text", "Q1,A1", "Q2,"], "csv")
+
+    def test_key_normalization(self):
+        """Test that punctuation, case and spacing do not create distinct keys"""
+        assert normalize_question_key("  Do you do  NAILS?! ") == normalize_question_key("do you do nails")
+
+
+class TestImportEntries:
+
+    def test_dedups_skips_existing_and_embeds_in_batches(self):
+        """Test in-file dedup, pre-embedding skip of existing keys and batched embedding"""
+        records = parse_import(
+            ["question_text_example,answer_text", "Hours?,9-5", "hours,9-6", "Parking?,Yes", "Walk-ins?,Sometimes"],
+            "csv",
+        )
+
+        with patch('api.services.knowledge_base_bulk.embedding_tags', return_value=(PRIMARY_TAG, None)), \
+             patch('api.services.knowledge_base_bulk.embed_questions', side_effect=_fake_embed_batch) as mock_embed, \
+             patch('api.services.knowledge_base_bulk.crud.get_existing_kb_keys', return_value={"parking"}), \
+             patch('api.services.knowledge_base_bulk.crud.bulk_upsert_kb',
+                   return_value={"inserted": 2, "updated": 0, "skipped": 0}) as mock_upsert:
+            stats = import_entries(records)
+
+        assert stats["duplicates_in_file"] == 1
+        assert stats["skipped_existing"] == 1
+        assert stats["embedded"] == 2
+        mock_embed.assert_called_once_with(["hours", "Walk-ins?"])
+        rows = mock_upsert.call_args[0][0]
+        assert [r["answer_text"] for r in rows] == ["9-6", "Sometimes"]
+        assert all(r["embedding_model"] == PRIMARY_TAG for r in rows)
+
+    def test_reuses_embeddings_from_same_provider(self):
+        """Test that exported vectors from the configured provider are not re-embedded"""
+        records = [
+            {"question_text_example": "Q1", "answer_text": "A1", "normalized_key": "q1",
+             "embedding": [0.5] * 4, "embedding_model": PRIMARY_TAG,
+             "fallback_embedding": None, "fallback_embedding_model": None},
+            {"question_text_example": "Q2", "answer_text": "A2", "normalized_key": "q2",
+             "embedding": [0.5] * 4, "embedding_model": "local:feature-hash-v1-1536",
+             "fallback_embedding": None, "fallback_embedding_model": None},
+        ]
+
+        with patch('api.services.knowledge_base_bulk.embedding_tags', return_value=(PRIMARY_TAG, None)), \
+             patch('api.services.knowledge_base_bulk.embed_questions', side_effect=_fake_embed_batch) as mock_embed, \
+             patch('api.services.knowledge_base_bulk.crud.bulk_upsert_kb',
+                   return_value={"inserted": 1, "updated": 1, "skipped": 0}) as mock_upsert:
+            stats = import_entries(records, on_conflict="update")
+
+        mock_embed.assert_called_once_with(["Q2"])
+        assert stats["reused_embeddings"] == 1
+        assert stats["updated"] == 1
+        assert mock_upsert.call_args.kwargs["update_existing"] is True
+
+    def test_skips_questions_created_through_the_api(self, test_engine, test_session):
+        """Test that entries created outside imports carry dedup keys that follow their question"""
+        TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+        records = parse_import(["question_text_example,answer_text", "what are your HOURS,9-5"], "csv")
+
+        with patch('core_service.database.crud.knowledge_base_crud.SessionLocal', TestSessionLocal), \
+             patch('api.services.knowledge_base.embed_question', return_value=Embedding([0.1] * 1536, PRIMARY_TAG)), \
+             patch('api.services.knowledge_base.embed_question_fallback', return_value=None), \
+             patch('api.services.knowledge_base_bulk.embedding_tags', return_value=(PRIMARY_TAG, None)), \
+             patch('api.services.knowledge_base_bulk.embed_questions', side_effect=_fake_embed_batch), \
+             patch('api.services.knowledge_base_bulk.crud.bulk_upsert_kb',
+                   return_value={"inserted": 1, "updated": 0, "skipped": 0}) as mock_upsert:
+            created = create_knowledge_base_from_text("What are your hours?", "9-6 daily")
+            stats = import_entries(records)
+            update_knowledge_base_from_text(created.id, {"question_text_example": "Do you take walk-ins?"})
+            after_rename = import_entries(records)
+
+        assert stats["skipped_existing"] == 1
+        assert after_rename["skipped_existing"] == 0
+        assert mock_upsert.call_count == 1
+        assert test_session.query(KnowledgeBaseEntry.normalized_key).scalar() == "do you take walk ins"
+
+
+class TestExport:
+
+    def test_csv_export_round_trips_embeddings(self):
+        """Test that a CSV export with embeddings can be parsed back without re-embedding"""
+        entries = [{"id": "1", "question_text_example": "Q, with comma", "answer_text": "A",
+                    "normalized_key": "q with comma", "embedding": [0.25, 0.5], "embedding_model": PRIMARY_TAG,
+                    "fallback_embedding": None, "fallback_embedding_model": None}]
+
+        with patch('api.services.knowledge_base_bulk.crud.iter_kb_export', return_value=iter(entries)):
+            text = "".join(export_entries("csv", include_embeddings=True))
+
+        records = parse_import(text.splitlines(), "csv")
+        assert records[0]["question_text_example"] == "Q, with comma"
+        assert records[0]["embedding"] == [0.25, 0.5]
+        assert records[0]["embedding_model"] == PRIMARY_TAG
+
+
+class TestBulkRoutes:
+
+    def test_import_rejects_malformed_body(self, client):
+        """Test POST /api/knowledge-base/import returns 400 for bad input"""
+        response = client.post("/api/knowledge-base/import?format=jsonl", content=b"not json\n")
+
+        assert response.status_code == 400
+        assert "line 1" in response.json()["detail"]
+
+    def test_export_streams_jsonl(self, client):
+        """Test GET /api/knowledge-base/export is not captured by /{entry_id}"""
+        entries = [{"id": "1", "question_text_example": "Q", "answer_text": "A"}]
+
+        with patch('api.services.knowledge_base_bulk.crud.iter_kb_export', return_value=iter(entries)):
+            response = client.get("/api/knowledge-base/export")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert json.loads(response.text.splitlines()[0])["question_text_example"] == "Q"
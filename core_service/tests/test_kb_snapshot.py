@@ -0,0 +1,114 @@
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from api.services import knowledge_base
+from api.services.kb_snapshot import SnapshotReader, publish_snapshot, write_snapshot
+from api.services.knowledge_base import search_knowledge_base_by_question
+from api.services.llm_client import Embedding
+
+MODEL = "openai:text-embedding-3-small"
+
+
+def _row(location_id, question, vector, valid_to=None, model=MODEL):
+    return {"id": uuid.uuid4(), "location_id": location_id, "question_text_example": question,
+            "answer_text": f"answer to {question}", "valid_to": valid_to, "embedding": vector,
+            "embedding_model": model}
+
+
+ROWS = [
+    _row("brooklyn", "Open Sundays?", [1.0, 0.0, 0.0]),
+    _row("default", "Open Sundays?", [1.0, 0.0, 0.0]),
+    _row("default", "Do you do nails?", [0.0, 1.0, 0.0]),
+    _row("default", "Old holiday hours", [0.9, 0.1, 0.0], valid_to=datetime.now(timezone.utc) - timedelta(days=1)),
+    _row("default", "Parking?", [0.6, 0.8, 0.0]),
+]
+
+
+class TestSnapshotFile:
+
+    def test_search_ranks_within_location_and_model(self, tmp_path):
+        """Test that search scans only its group and skips expired entries"""
+        write_snapshot(str(tmp_path), 7, ROWS)
+        reader = SnapshotReader(str(tmp_path))
+        with patch('api.services.kb_snapshot._current_name', return_value="kb-000000000007.snap"):
+            rows = reader.search([2.0, 0.0, 0.0], 5, MODEL, "default")
+
+        assert [r["question_text_example"] for r in rows] == ["Open Sundays?", "Parking?", "Do you do nails?"]
+        assert [round(r["sim"], 3) for r in rows] == [1.0, 0.6, 0.0]
+        assert isinstance(rows[0]["id"], uuid.UUID)
+        assert reader.current().search([1.0, 0.0, 0.0], 5, "other:model", "default") is None
+
+    def test_publish_swaps_readers_to_new_version(self, tmp_path):
+        """Test that a new table version is published and picked up, and an unchanged one is not rewritten"""
+        directory = str(tmp_path)
+        reader = SnapshotReader(directory, check_s=0)
+        with patch('api.services.kb_snapshot.crud.get_table_versions', return_value={"knowledge_base": 1}), \
+             patch('api.services.kb_snapshot.crud.iter_kb_snapshot_rows', return_value=iter(ROWS[:2])):
+            assert publish_snapshot(directory)
+            assert publish_snapshot(directory) is None
+        first = reader.current()
+
+        with patch('api.services.kb_snapshot.crud.get_table_versions', return_value={"knowledge_base": 2}), \
+             patch('api.services.kb_snapshot.crud.iter_kb_snapshot_rows', return_value=iter(ROWS)):
+            publish_snapshot(directory, keep=1)
+
+        assert (first.version, first.rows) == (1, 2)
+        assert (reader.current().version, reader.current().rows) == (2, 5)
+        # The old mapping still answers after its file was removed
+        assert first.search([1.0, 0.0, 0.0], 1, MODEL, "default")[0]["question_text_example"] == "Open Sundays?"
+        assert sorted(os.listdir(directory)) == ["CURRENT", "kb-000000000002.snap"]
+
+
+class TestSearchWithSnapshot:
+
+    def test_snapshot_answers_without_postgres(self, tmp_path):
+        write_snapshot(str(tmp_path), 3, [_row("default", "Open Sundays?", [0.1] * 1536)])
+        (tmp_path / "CURRENT").write_text("kb-000000000003.snap")
+        embedding = Embedding([0.1] * 1536, MODEL)
+
+        with patch.object(knowledge_base, "kb_snapshot", SnapshotReader(str(tmp_path))), \
+             patch('api.services.knowledge_base.embed_question', return_value=embedding), \
+             patch('api.services.knowledge_base.crud.search_kb_by_embedding') as mock_search:
+            result = search_knowledge_base_by_question("Are you open Sundays?", k=1, min_sim=0.5, mode="vector")
+
+        assert result[0]["answer_text"] == "answer to Open Sundays?"
+        mock_search.assert_not_called()
+
+    def test_missing_group_falls_back_to_postgres(self, tmp_path):
+        """Test that a location or model absent from the snapshot is searched in the database"""
+        write_snapshot(str(tmp_path), 3, [_row("default", "Open Sundays?", [0.1] * 1536)])
+        (tmp_path / "CURRENT").write_text("kb-000000000003.snap")
+        embedding = Embedding([0.1] * 1536, MODEL)
+
+        with patch.object(knowledge_base, "kb_snapshot", SnapshotReader(str(tmp_path))), \
+             patch('api.services.knowledge_base.embed_question', return_value=embedding), \
+             patch('api.services.knowledge_base.crud.search_kb_by_embedding', return_value=[]) as mock_search:
+            search_knowledge_base_by_question("Are you open Sundays?", k=1, mode="vector", location_id="brooklyn")
+
+        mock_search.assert_called_once()
+
+    def test_stale_snapshot_falls_back_to_postgres(self, tmp_path):
+        """Test that a snapshot the publisher stopped confirming is not searched"""
+        an_hour_ago = time.time() - 3600
+        with patch('api.services.kb_snapshot.time.time', return_value=an_hour_ago):
+            write_snapshot(str(tmp_path), 3, [_row("default", "Open Sundays?", [0.1] * 1536)])
+        (tmp_path / "CURRENT").write_text("kb-000000000003.snap")
+        os.utime(tmp_path / "CURRENT", (an_hour_ago, an_hour_ago))
+        reader = SnapshotReader(str(tmp_path), check_s=0, max_age_s=60)
+        embedding = Embedding([0.1] * 1536, MODEL)
+
+        with patch.object(knowledge_base, "kb_snapshot", reader), \
+             patch('api.services.knowledge_base.embed_question', return_value=embedding), \
+             patch('api.services.knowledge_base.crud.search_kb_by_embedding', return_value=[]) as mock_search:
+            search_knowledge_base_by_question("Are you open Sundays?", k=1, mode="vector")
+            mock_search.assert_called_once()
+
+            # Confirmed again by the publisher: searched from the snapshot
+            os.utime(tmp_path / "CURRENT")
+            result = search_knowledge_base_by_question("Are you open Sundays?", k=1, min_sim=0.5, mode="vector")
+
+        assert result[0]["answer_text"] == "answer to Open Sundays?"
+        mock_search.assert_called_once()
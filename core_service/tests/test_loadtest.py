@@ -0,0 +1,106 @@
+import random
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from core_service.benchmarks.loadtest import (
+    MISS_PREFIX,
+    FakeEmbeddingProvider,
+    LatencyRecorder,
+    build_call_plan,
+    cleanup,
+    percentile,
+)
+from database.models import Customer, Followup, HelpRequest, SupervisorResponse
+
+
+class TestFakeEmbeddingProvider:
+
+    def test_embedding_is_deterministic_unit_vector(self):
+        """Test that the same text always maps to the same normalized vector"""
+        provider = FakeEmbeddingProvider()
+        first = provider.embed("Do you accept walk-ins?")
+        second = provider.embed("Do you accept walk-ins?")
+
+        assert first == second
+        assert len(first) == 1536
+        assert sum(v * v for v in first) == pytest.approx(1.0)
+
+    def test_different_text_is_dissimilar(self):
+        """Test that unrelated questions land far apart (KB misses)"""
+        provider = FakeEmbeddingProvider()
+        a = provider.embed("Do you accept walk-ins?")
+        b = provider.embed("[loadtest] unanswered question 1")
+
+        assert abs(sum(x * y for x, y in zip(a, b))) < 0.2
+
+
+class TestLoadTestReporting:
+
+    def test_percentile_nearest_rank(self):
+        """Test nearest-rank percentiles"""
+        values = [float(v) for v in range(1, 101)]
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 95) == 95.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([], 99) == 0.0
+
+    def test_recorder_summary(self):
+        """Test per-stage summary with throughput and error counts"""
+        recorder = LatencyRecorder()
+        for duration in (0.01, 0.02, 0.03, 0.04):
+            recorder.record("embedding", duration)
+        recorder.record_error("escalation_insert")
+
+        report = recorder.summary(wall_time_s=2.0)
+
+        assert report["embedding"]["count"] == 4
+        assert report["embedding"]["throughput_per_s"] == 2.0
+        assert report["embedding"]["p50_ms"] == pytest.approx(20.0)
+        assert report["embedding"]["max_ms"] == pytest.approx(40.0)
+        assert report["escalation_insert"]["errors"] == 1
+
+    def test_call_plan_respects_hit_ratio(self):
+        """Test that the call plan mixes KB questions and misses per the ratio"""
+        questions = ["q1", "q2", "q3"]
+        plan = build_call_plan(questions, calls=1000, hit_ratio=0.7, rng=random.Random(1))
+
+        hits = [q for q in plan if q in questions]
+        misses = [q for q in plan if q.startswith(MISS_PREFIX)]
+        assert len(hits) + len(misses) == 1000
+        assert 0.65 < len(hits) / 1000 < 0.75
+
+
+class TestCleanup:
+
+    def test_removes_escalations_of_the_run(self, test_engine, test_session, sample_customer):
+        """Test that help requests raised by the load-test customer go too, not only unanswered misses"""
+        load_customer = Customer(display_name="Load Test Customer")
+        test_session.add(load_customer)
+        test_session.commit()
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        seeded = HelpRequest(customer_id=load_customer.id, question_text="Do you accept walk-ins?",
+                             status="resolved", expires_at=expires_at)
+        miss = HelpRequest(customer_id=load_customer.id, question_text=f"{MISS_PREFIX} unanswered question 1",
+                           status="pending", expires_at=expires_at)
+        real = HelpRequest(customer_id=sample_customer.id, question_text="Do you accept walk-ins?",
+                           status="pending", expires_at=expires_at)
+        test_session.add_all([seeded, miss, real])
+        test_session.commit()
+        test_session.add_all([
+            SupervisorResponse(help_request_id=seeded.id, answer_text="Yes"),
+            Followup(help_request_id=seeded.id, customer_id=load_customer.id, channel="sms", status="sent"),
+        ])
+        test_session.commit()
+        TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+        with patch('core_service.benchmarks.loadtest.SessionLocal', TestSessionLocal):
+            cleanup(load_customer.id)
+
+        test_session.expire_all()
+        assert [r.id for r in test_session.query(HelpRequest).all()] == [real.id]
+        assert test_session.query(SupervisorResponse).count() == 0
+        assert test_session.query(Followup).count() == 0
+        assert test_session.query(Customer).count() == 1
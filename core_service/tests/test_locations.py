@@ -0,0 +1,68 @@
+from unittest.mock import patch
+from sqlalchemy.orm import sessionmaker
+
+from api.services import locations
+from api.services.locations import get_location_profile, location_id_from_metadata
+from database.crud.knowledge_base_crud import list_kb
+from database.models import KnowledgeBaseEntry, Location
+
+
+class TestLocationResolution:
+
+    def setup_method(self):
+        locations._profiles.clear()
+
+    def test_location_from_room_metadata(self):
+        """Test that the room metadata names the location, defaulting when absent or malformed"""
+        assert location_id_from_metadata('{"location_id": "brooklyn"}') == "brooklyn"
+        assert location_id_from_metadata("") == "default"
+        assert location_id_from_metadata("not json") == "default"
+        assert location_id_from_metadata('["brooklyn"]') == "default"
+
+    def test_profiles_are_cached_per_location(self):
+        """Test that each location is read from the database once per TTL"""
+        brooklyn = Location(id="brooklyn", name="Beauty Palace Brooklyn", city="Brooklyn")
+
+        with patch('api.services.locations.crud.get_location', return_value=brooklyn) as mock_get:
+            first = get_location_profile("brooklyn")
+            second = get_location_profile("brooklyn")
+
+        assert first == second == {"id": "brooklyn", "name": "Beauty Palace Brooklyn", "city": "Brooklyn"}
+        mock_get.assert_called_once_with("brooklyn")
+
+    def test_unknown_location_uses_default(self):
+        """Test that a misconfigured room still gets the default location's agent"""
+        with patch('api.services.locations.crud.get_location', return_value=None):
+            profile = get_location_profile("nowhere")
+
+        assert profile == locations.DEFAULT_PROFILE
+
+    def test_database_error_keeps_cached_profile(self):
+        """Test that a failed refresh serves the last known profile"""
+        brooklyn = Location(id="brooklyn", name="Beauty Palace Brooklyn", city="Brooklyn")
+        with patch('api.services.locations.crud.get_location', return_value=brooklyn):
+            get_location_profile("brooklyn")
+        locations._profiles["brooklyn"] = (0.0, locations._profiles["brooklyn"][1])
+
+        with patch('api.services.locations.crud.get_location', side_effect=RuntimeError("down")):
+            profile = get_location_profile("brooklyn")
+
+        assert profile["name"] == "Beauty Palace Brooklyn"
+
+
+class TestLocationScoping:
+
+    def test_list_kb_filters_by_location(self, test_engine, test_session):
+        """Test that a location's listing excludes other locations' entries"""
+        for location_id in ("default", "brooklyn"):
+            test_session.add(KnowledgeBaseEntry(location_id=location_id, question_text_example=f"Q {location_id}",
+                                                answer_text="A", embedding=[0.1] * 1536))
+        test_session.commit()
+        TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+        with patch('database.crud.knowledge_base_crud.SessionLocal', TestSessionLocal):
+            brooklyn = list_kb(location_id="brooklyn")
+            everything = list_kb()
+
+        assert [e.question_text_example for e in brooklyn] == ["Q brooklyn"]
+        assert len(everything) == 2
@@ -0,0 +1,160 @@
+import pytest
+from unittest.mock import patch
+
+from prometheus_client import REGISTRY
+
+from core_service.observability.tracing import stage
+from api.services.knowledge_base import search_knowledge_base_by_question
+from api.services.llm_client import Embedding
+
+
+def _sample(name, labels=None):
+    return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+
+class TestStageTiming:
+
+    def test_stage_records_histogram(self):
+        """Test that a stage observes its duration under the stage label"""
+        before = _sample("kb_search_stage_seconds_count", {"stage": "unit_test"})
+
+        with stage("unit_test", room="room-1", call_id=None) as span:
+            span.set_attribute("candidates", 3)
+
+        assert _sample("kb_search_stage_seconds_count", {"stage": "unit_test"}) == before + 1
+        assert span.duration_s is not None and span.duration_s >= 0
+        # None-valued attributes are dropped so they never reach the exporter
+        assert span.attributes == {"room": "room-1", "candidates": 3}
+
+    def test_stage_records_on_error(self):
+        """Test that a failing stage is still timed and re-raises"""
+        before = _sample("kb_search_stage_seconds_count", {"stage": "unit_test_error"})
+
+        with pytest.raises(ValueError):
+            with stage("unit_test_error") as span:
+                raise ValueError("boom")
+
+        assert _sample("kb_search_stage_seconds_count", {"stage": "unit_test_error"}) == before + 1
+        assert span.attributes["error"] == "ValueError"
+
+
+class TestSearchInstrumentation:
+
+    def test_search_records_stages_and_similarity(self):
+        """Test that search times embedding and vector search and records the top similarity"""
+        rows = [
+            {"id": "1", "question_text_example": "q", "answer_text": "a", "sim": 0.82},
+            {"id": "2", "question_text_example": "q2", "answer_text": "a2", "sim": 0.4},
+        ]
+        embedding_before = _sample("kb_search_stage_seconds_count", {"stage": "embedding"})
+        search_before = _sample("kb_search_stage_seconds_count", {"stage": "vector_search"})
+        similarity_before = _sample("kb_search_top_similarity_count")
+
+        embedding = Embedding([0.1] * 1536, "openai:text-embedding-3-small")
+        with patch('api.services.knowledge_base.embed_question', return_value=embedding), \
+             patch('api.services.knowledge_base.crud.search_kb_by_embedding', return_value=rows):
+            result = search_knowledge_base_by_question("Do you do nails?", k=2, min_sim=0.5)
+
+        assert [r["id"] for r in result] == ["1"]
+        assert _sample("kb_search_stage_seconds_count", {"stage": "embedding"}) == embedding_before + 1
+        assert _sample("kb_search_stage_seconds_count", {"stage": "vector_search"}) == search_before + 1
+        assert _sample("kb_search_top_similarity_count") == similarity_before + 1
+
+
+class TestMetricsEndpoint:
+
+    def test_metrics_endpoint(self, client):
+        """Test GET /metrics exposes Prometheus text format"""
+        client.get("/healthz")
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "http_request_duration_seconds" in response.text
+
+    def test_middleware_uses_route_template(self, client):
+        """Test that request latency is labelled with the route template, not the raw path"""
+        labels = {"method": "GET", "route": "/api/knowledge-base/{entry_id}", "status": "404"}
+        before = _sample("http_request_duration_seconds_count", labels)
+
+        with patch('api.routes.knowledge_base.crud.list_kb', return_value=[]):
+            response = client.get("/api/knowledge-base/does-not-exist")
+            client.get("/api/knowledge-base/knowledge-base")  # Value equal to an earlier segment
+
+        assert response.status_code == 404
+        assert _sample("http_request_duration_seconds_count", labels) == before + 2
+
+
+class TestDBInstrumentation:
+
+    def test_request_stats_count_queries(self, test_engine):
+        """Test that statements executed inside a request context are counted"""
+        from sqlalchemy import text
+        from core_service.observability.db import instrument_engine, start_request_stats
+
+        instrument_engine(test_engine)
+        instrument_engine(test_engine)  # idempotent
+        stats = start_request_stats()
+
+        with test_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+
+        assert stats.query_count == 2
+        assert stats.total_seconds >= 0
+
+    def test_failed_statements_are_timed(self, test_engine):
+        """Test that a failing statement (e.g. a statement_timeout) still counts toward request and fingerprint stats"""
+        from sqlalchemy import text
+        from sqlalchemy.exc import OperationalError
+        from core_service.observability import db
+
+        db.instrument_engine(test_engine)
+        db.reset_query_stats()
+        stats = db.start_request_stats()
+
+        with test_engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+            conn.rollback()
+            conn.execute(text("SELECT 1"))
+
+        assert stats.query_count == 2
+        calls = {s["fingerprint"]: s["calls"] for s in db.query_stats()}
+        assert calls["SELECT * FROM no_such_table"] == 1
+        assert calls["SELECT ?"] == 1
+
+    def test_statements_grouped_by_fingerprint(self, test_engine):
+        """Test that executions differing only in literals share one fingerprint"""
+        from sqlalchemy import text
+        from core_service.observability import db
+
+        db.instrument_engine(test_engine)
+        db.reset_query_stats()
+        with test_engine.connect() as conn:
+            for n in (1, 2, 3):
+                conn.execute(text(f"SELECT {n} WHERE 'a' IN ('a', 'b')"))
+            conn.execute(text("SELECT :x"), {"x": 4})
+
+        stats = {s["fingerprint"]: s for s in db.query_stats()}
+        assert stats["SELECT ? WHERE ? IN (?)"]["calls"] == 3
+        assert stats["SELECT ?"]["calls"] == 1
+        assert db.fingerprint("INSERT INTO t (a) VALUES (%(a_m0)s), (%(a_m1)s) -- bulk") == "INSERT INTO t (a) VALUES (?)"
+
+    def test_slow_select_plan_captured_once_per_cooldown(self, test_engine):
+        """Test that a slow read is EXPLAINed in the background and repeats within the cooldown are not"""
+        from core_service.observability import db
+
+        db.reset_query_stats()
+        plan = ["Seq Scan on knowledge_base  (cost=0.00..1.10 rows=10 width=64) (actual time=0.010..0.012 rows=10 loops=1)"]
+        statement = "SELECT * FROM knowledge_base WHERE location_id = %(location_id_1)s"
+        with patch.object(db, "_explain_plan", return_value=plan) as mock_explain:
+            for _ in range(2):
+                db._maybe_explain(test_engine, db.fingerprint(statement), statement, {"location_id_1": "default"}, 0.4)
+            db._explain_executor.submit(lambda: None).result()
+
+        mock_explain.assert_called_once()
+        [captured] = db.slow_queries()
+        assert captured["seq_scans"] == ["knowledge_base"]
+        assert captured["duration_ms"] == 400
+        assert not db._explainable("SELECT * FROM help_requests FOR UPDATE SKIP LOCKED", False)
+        assert not db._explainable("UPDATE help_requests SET status = 'resolved'", False)
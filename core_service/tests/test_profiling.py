@@ -0,0 +1,84 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from core_service.observability import profiling
+
+
+def _spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSampler:
+
+    def test_folded_stacks_show_busy_thread(self):
+        """Test that a CPU-bound thread shows up root-first with a sample count"""
+        stop = threading.Event()
+        worker = threading.Thread(target=_spin, args=(stop,), name="spinner")
+        worker.start()
+        try:
+            folded = profiling.sample_stacks(0.1, interval_s=0.002)
+        finally:
+            stop.set()
+            worker.join()
+
+        line = next(l for l in folded.splitlines() if l.startswith("thread spinner;"))
+        stack, count = line.rsplit(" ", 1)
+        assert "_spin (test_profiling.py:" in stack.split(";")[-1]
+        assert int(count) > 0
+
+    def test_one_capture_at_a_time(self):
+        with profiling._capture_lock:
+            with pytest.raises(profiling.ProfilerBusyError):
+                profiling.sample_stacks(0.01)
+
+
+class TestAllocations:
+
+    def test_diff_against_baseline(self):
+        """Test that allocations made after the baseline lead the diff"""
+        profiling.start_tracemalloc()
+        try:
+            profiling.set_baseline()
+            blocks = [bytearray(1024) for _ in range(2000)]
+            diff = profiling.diff_allocations(limit=3)
+            top = profiling.top_allocations(limit=3)
+        finally:
+            profiling.stop_tracemalloc()
+
+        assert "test_profiling.py" in diff[0]["location"]
+        assert diff[0]["size_diff_bytes"] >= 2000 * 1024
+        assert top and len(blocks) == 2000
+
+    def test_requires_tracing(self):
+        with pytest.raises(RuntimeError):
+            profiling.top_allocations()
+
+
+class TestAdminRoutes:
+
+    def test_disabled_without_token(self, client):
+        with patch('api.routes.admin.ADMIN_TOKEN', ""):
+            assert client.get("/api/admin/profiling/threads").status_code == 404
+
+    def test_requires_bearer_token(self, client):
+        with patch('api.routes.admin.ADMIN_TOKEN', "s3cret"):
+            denied = client.get("/api/admin/profiling/threads", headers={"Authorization": "Bearer nope"})
+            tasks = client.get("/api/admin/profiling/tasks", headers={"Authorization": "Bearer s3cret"})
+            cpu = client.get("/api/admin/profiling/cpu?seconds=0.05", headers={"Authorization": "Bearer s3cret"})
+
+        assert denied.status_code == 401
+        assert tasks.status_code == 200 and any(t["stack"] is not None for t in tasks.json())
+        assert cpu.status_code == 200 and cpu.headers["content-type"].startswith("text/plain")
+
+    def test_query_stats_served_to_admins(self, client):
+        with patch('api.routes.admin.ADMIN_TOKEN', "s3cret"), \
+             patch('api.routes.admin.db_observability.query_stats', return_value=[]) as mock_stats:
+            denied = client.get("/api/admin/queries")
+            allowed = client.get("/api/admin/queries?order_by=mean&limit=5", headers={"Authorization": "Bearer s3cret"})
+
+        assert denied.status_code == 401
+        assert allowed.status_code == 200
+        mock_stats.assert_called_once_with(5, "mean")
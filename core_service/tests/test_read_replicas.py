@@ -0,0 +1,132 @@
+import contextvars
+from unittest.mock import patch
+from sqlalchemy import create_engine, text
+
+from database import session as db_session
+from database.session import ReplicaRouter, RoutingSession, pin_read_engine, primary_reads, read_only
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _router(lags, clock=None):
+    primary = create_engine("sqlite://")
+    replicas = [create_engine("sqlite://") for _ in lags]
+    router = ReplicaRouter(primary, replicas, max_lag_s=2, read_your_writes_s=5, check_interval_s=2,
+                           clock=clock or FakeClock())
+    lag_by_engine = dict(zip(replicas, lags))
+    router._measure_lag = lambda replica: lag_by_engine[replica]
+    return router
+
+
+class TestReplicaRouter:
+
+    def test_prefers_first_healthy_replica(self):
+        """Test that lagging and unreachable replicas are skipped in order"""
+        router = _router([None, 10.0, 0.5])
+
+        engine, reason = router.read_engine()
+
+        assert engine is router.replicas[2]
+        assert reason == "replica"
+
+    def test_falls_back_to_primary(self):
+        """Test that the primary serves reads when no replica is fresh enough"""
+        router = _router([10.0])
+
+        engine, reason = router.read_engine()
+
+        assert engine is router.primary
+        assert reason == "replica_lagging"
+
+    def test_read_your_writes_window(self):
+        """Test that reads stay on the primary for a while after this context writes"""
+        clock = FakeClock()
+        router = _router([0.0], clock)
+        router.record_write()
+
+        assert router.read_engine() == (router.primary, "read_your_writes")
+        clock.now += 6
+        assert router.read_engine() == (router.replicas[0], "replica")
+
+    def test_write_only_moves_the_writers_reads(self):
+        """Test that a commit in one context (request) leaves other contexts reading from the replica"""
+        router = _router([0.0])
+
+        def writer():
+            with db_session.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                conn.commit()
+            return router.read_engine()
+
+        with patch.object(db_session, "router", router):
+            assert contextvars.copy_context().run(writer) == (router.primary, "read_your_writes")
+            assert contextvars.copy_context().run(router.read_engine) == (router.replicas[0], "replica")
+
+    def test_lag_is_cached(self):
+        """Test that replica health is measured at most once per check interval"""
+        router = _router([0.0])
+        calls = []
+        measure = router._measure_lag
+        router._measure_lag = lambda replica: calls.append(replica) or measure(replica)
+
+        router.read_engine()
+        router.read_engine()
+
+        assert len(calls) == 1
+
+
+class TestReplicaHealth:
+
+    def test_replica_without_streaming_receiver_is_unhealthy(self):
+        """Test that a disconnected replica (NULL lag) is skipped rather than treated as fresh"""
+        replica = create_engine("sqlite://")
+        router = ReplicaRouter(create_engine("sqlite://"), [replica], clock=FakeClock())
+
+        with patch.object(db_session, "REPLICA_LAG_SQL", "SELECT NULL"):
+            assert router._measure_lag(replica) is None
+            assert router.read_engine() == (router.primary, "replica_unavailable")
+
+        assert "pg_stat_wal_receiver" in db_session.REPLICA_LAG_SQL
+
+
+class TestRoutingSession:
+
+    def test_pinned_reads_share_one_database(self):
+        """Test that an ETag lookup and the row read of one request cannot hit different replicas"""
+        clock = FakeClock()
+        router = _router([0.0, 0.0], clock)
+        choices = iter([router.replicas[0], router.replicas[1]])
+        router.read_engine = lambda: (next(choices), "replica")
+
+        def request():
+            with patch.object(db_session, "router", router):
+                pin_read_engine()
+                return [read_only(RoutingSession(bind=router.primary)).get_bind() for _ in range(2)]
+
+        assert contextvars.copy_context().run(request) == [router.replicas[0]] * 2
+        assert contextvars.copy_context().run(request) == [router.replicas[1]] * 2  # Next request chooses again
+
+    def test_only_read_only_sessions_are_routed(self):
+        """Test that writes and unmarked sessions stay on the primary"""
+        router = _router([0.0])
+        with router.replicas[0].connect() as conn:
+            conn.execute(text("CREATE TABLE marker (name TEXT)"))
+            conn.execute(text("INSERT INTO marker VALUES ('replica')"))
+            conn.commit()
+
+        with patch.object(db_session, "router", router):
+            reader = read_only(RoutingSession(bind=router.primary))
+            marker = reader.execute(text("SELECT name FROM marker")).scalar()
+            writer_bind = RoutingSession(bind=router.primary).get_bind()
+            with primary_reads():
+                pinned_bind = read_only(RoutingSession(bind=router.primary)).get_bind()
+
+        assert marker == "replica"
+        assert writer_bind is router.primary
+        assert pinned_bind is router.primary
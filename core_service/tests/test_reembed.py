@@ -0,0 +1,110 @@
+import pytest
+from unittest.mock import MagicMock, patch
+
+from api.services.embedding_providers import OpenAIEmbeddingProvider, create_provider
+from api.services.knowledge_base import _embedding_fields
+from api.services.llm_client import Embedding
+from api.services.resilience import RateLimiter
+from database.crud import knowledge_base_crud
+from database.crud.knowledge_base_crud import embedding_columns_for_tag
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestRateLimiter:
+
+    def test_burst_then_paced(self):
+        """Test that a full bucket allows a burst, then callers wait for refills"""
+        clock = FakeClock()
+        limiter = RateLimiter(rate_per_s=2, burst=2, clock=clock, sleep=clock.sleep)
+
+        assert limiter.acquire() == 0
+        assert limiter.acquire() == 0
+        assert limiter.acquire() == pytest.approx(0.5)
+        assert clock.now == pytest.approx(0.5)
+
+    def test_weighted_acquire_larger_than_burst_is_rejected(self):
+        """Test that a request that could never fit in the bucket fails instead of blocking forever"""
+        limiter = RateLimiter(rate_per_s=10, burst=100)
+
+        with pytest.raises(ValueError):
+            limiter.acquire(101)
+
+
+class TestEmbeddingSlots:
+
+    def test_shadow_tag_reads_embedding_next(self):
+        """Test that queries tagged with the shadow slot's model search the shadow columns"""
+        with patch.object(knowledge_base_crud, '_shadow_slot_tag', return_value="openai:text-embedding-3-large@1536"):
+            assert embedding_columns_for_tag("openai:text-embedding-3-large@1536") == ("embedding_next", "embedding_next_model")
+            assert embedding_columns_for_tag("openai:text-embedding-3-small") == ("embedding", "embedding_model")
+            assert embedding_columns_for_tag(None) == ("embedding", "embedding_model")
+
+    def test_missing_slots_table_uses_live_columns(self):
+        """Test that databases without kb_embedding_slots keep using the live slot"""
+        knowledge_base_crud._slots_cache["expires_at"] = 0.0
+
+        assert embedding_columns_for_tag("openai:text-embedding-3-small") == ("embedding", "embedding_model")
+
+
+class TestTargetProvider:
+
+    def test_large_model_reduced_to_column_width_is_tagged(self):
+        """Test that a wider model truncated to the stored width gets its own tag"""
+        provider = create_provider("openai", api_key="test", dimensions=1536, model="text-embedding-3-large")
+
+        assert isinstance(provider, OpenAIEmbeddingProvider)
+        assert provider.native_dimensions == 3072
+        assert provider.tag == "openai:text-embedding-3-large@1536"
+
+    def test_swap_statements_exchange_slots(self):
+        """Test that the cutover renames both vector and tag columns and the indexes"""
+        from jobs.reembed_knowledge_base import SWAP_STATEMENTS
+
+        sql = "\n".join(SWAP_STATEMENTS)
+        assert "RENAME COLUMN embedding_next TO embedding" in sql
+        assert "RENAME COLUMN embedding_next_model TO embedding_model" in sql
+        assert "knowledge_base_next_vec_idx RENAME TO knowledge_base_vec_idx" in sql
+
+
+class TestAfterCutover:
+
+    OLD_TAG = "openai:text-embedding-3-small"
+    NEW_TAG = "openai:text-embedding-3-large@1536"
+
+    def test_old_model_writes_go_to_its_slot(self):
+        """Test that a process not yet restarted keeps the live slot free of its vectors' tag"""
+        embedding = Embedding([0.5] * 4, self.OLD_TAG)
+        with patch('api.services.knowledge_base.crud.embedding_columns_for_tag',
+                   return_value=("embedding_next", "embedding_next_model")), \
+             patch('api.services.knowledge_base.embed_question', return_value=embedding), \
+             patch('api.services.knowledge_base.embed_question_fallback', return_value=None):
+            fields = _embedding_fields("Do you do nails?")
+
+        assert fields["embedding_next_model"] == self.OLD_TAG
+        assert fields["embedding_model"] is None  # Hidden from live-model searches until repaired
+        assert fields["embedding"] == [0.5] * 4
+
+    def test_run_repairs_live_slot_once_cut_over(self):
+        """Test that running the job for the live model re-embeds untagged live vectors"""
+        from jobs import reembed_knowledge_base
+
+        provider = MagicMock(tag=self.NEW_TAG)
+        with patch.object(reembed_knowledge_base, 'SessionLocal', MagicMock()), \
+             patch.object(reembed_knowledge_base, '_slot_tags', return_value={"embedding": self.NEW_TAG}), \
+             patch.object(reembed_knowledge_base, '_fill_pass', side_effect=[3, 0]) as mock_fill:
+            written = reembed_knowledge_base.run(provider)
+
+        assert written == 3
+        assert mock_fill.call_count == 2
+        assert mock_fill.call_args.kwargs["vector_column"] == "embedding"
+        assert mock_fill.call_args.kwargs["tag_column"] == "embedding_model"
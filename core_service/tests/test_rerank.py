@@ -0,0 +1,115 @@
+import threading
+from unittest.mock import patch
+
+from api.services import knowledge_base
+from api.services.knowledge_base import search_knowledge_base_by_question
+from api.services.llm_client import Embedding
+from api.services.reranker import Reranker, ScoreCache
+
+
+def _row(entry_id, sim):
+    return {"id": entry_id, "question_text_example": f"q{entry_id}", "answer_text": f"a{entry_id}", "sim": sim}
+
+
+class FakeScorer:
+    """Scores passages from a dict keyed by entry id (passages start with q<id>)"""
+
+    def __init__(self, scores, release=None):
+        self.scores = scores
+        self.release = release
+        self.calls = []
+
+    def score(self, query, passages):
+        self.calls.append(list(passages))
+        if self.release is not None:
+            self.release.wait(timeout=2)
+        return [self.scores[p.split("\n")[0][1:]] for p in passages]
+
+
+class TestReranker:
+
+    def test_reorders_and_drops_weak_candidates(self):
+        """Test that candidates are sorted by relevance and filtered by min_score"""
+        reranker = Reranker(FakeScorer({"1": 0.2, "2": 0.9, "3": 0.6}), min_score=0.5)
+
+        ranked = reranker.rerank("Sunday hours?", [_row("1", 0.6), _row("2", 0.5), _row("3", 0.45)])
+
+        assert [(r["id"], r["rerank_score"]) for r in ranked] == [("2", 0.9), ("3", 0.6)]
+
+    def test_rejects_when_nothing_is_relevant(self):
+        """Test that an empty list (escalate) is returned when no candidate passes"""
+        reranker = Reranker(FakeScorer({"1": 0.1}), min_score=0.5)
+
+        assert reranker.rerank("Do you sell cars?", [_row("1", 0.55)]) == []
+
+    def test_scores_are_cached_per_query_and_entry(self):
+        """Test that only unseen (query, entry) pairs reach the model"""
+        scorer = FakeScorer({"1": 0.8, "2": 0.3})
+        reranker = Reranker(scorer)
+
+        reranker.score("Sunday  hours?", [_row("1", 0.6)])
+        reranker.score("sunday hours?", [_row("1", 0.6), _row("2", 0.5)])
+
+        assert scorer.calls == [["q1\na1"], ["q2\na2"]]
+
+    def test_budget_exceeded_keeps_similarity_decision(self):
+        """Test that a slow model yields no decision, and its late scores still fill the cache"""
+        release = threading.Event()
+        reranker = Reranker(FakeScorer({"1": 0.8}, release=release), budget_ms=20)
+
+        assert reranker.rerank("Sunday hours?", [_row("1", 0.6)]) is None
+        release.set()
+        for _ in range(100):
+            if len(reranker.cache):
+                break
+            release.wait(0.01)
+        assert reranker.score("Sunday hours?", [_row("1", 0.6)]) == [0.8]
+
+    def test_gray_zone_bounds(self):
+        """Test that only borderline similarities are reranked, and only with a model"""
+        reranker = Reranker(FakeScorer({}), gray_low=0.4, gray_high=0.65)
+
+        assert [reranker.in_gray_zone(s) for s in (0.39, 0.4, 0.6, 0.65, None)] == [False, True, True, False, False]
+        assert not Reranker(None).in_gray_zone(0.5)
+
+
+class TestScoreCache:
+
+    def test_evicts_least_recently_used(self):
+        cache = ScoreCache(max_size=2)
+        cache.put(("q", "1", "x"), 0.1)
+        cache.put(("q", "2", "x"), 0.2)
+        cache.get(("q", "1", "x"))
+        cache.put(("q", "3", "x"), 0.3)
+
+        assert cache.get(("q", "2", "x")) is None
+        assert cache.get(("q", "1", "x")) == 0.1
+
+
+class TestSearchWithRerank:
+
+    def _search(self, reranker, rows):
+        embedding = Embedding([0.1] * 1536, "openai:text-embedding-3-small")
+        with patch.object(knowledge_base, "reranker", reranker), \
+             patch('api.services.knowledge_base.embed_question', return_value=embedding), \
+             patch('api.services.knowledge_base.crud.search_kb_by_embedding', return_value=rows) as mock_search:
+            result = search_knowledge_base_by_question("Are you open Sundays?", k=1, min_sim=0.5)
+        return result, mock_search.call_args.kwargs["k"]
+
+    def test_gray_zone_match_below_cutoff_is_answered(self):
+        """Test that the reranker can promote a paraphrase the cutoff would escalate"""
+        reranker = Reranker(FakeScorer({"1": 0.3, "2": 0.9}), candidates=5)
+
+        result, k = self._search(reranker, [_row("1", 0.47), _row("2", 0.45)])
+
+        assert k == 5
+        assert [r["id"] for r in result] == ["2"]
+
+    def test_confident_match_skips_rerank(self):
+        """Test that matches above the gray zone never pay for the model"""
+        scorer = FakeScorer({"1": 0.0})
+
+        result, _ = self._search(Reranker(scorer), [_row("1", 0.9)])
+
+        assert [r["id"] for r in result] == ["1"]
+        assert scorer.calls == []
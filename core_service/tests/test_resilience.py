@@ -0,0 +1,147 @@
+import time
+import pytest
+from unittest.mock import Mock, patch
+
+from api.services.resilience import CircuitBreaker, DeadlineExceededError, LatencyTracker, hedged_call
+from api.services.llm_client import EmbeddingUnavailableError, LLMClient
+from api.services.embedding_providers import HashingEmbeddingProvider
+from api.services.knowledge_base import search_knowledge_base_by_question
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that the breaker opens after the failure threshold and rejects calls"""
+        states = []
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout_s=10, on_state_change=states.append, clock=FakeClock())
+
+        for _ in range(3):
+            assert breaker.allow_request()
+            breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+        assert states == [CircuitBreaker.OPEN]
+
+    def test_half_open_allows_single_trial(self):
+        """Test that after the reset timeout one trial call is allowed and success closes the circuit"""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=10, clock=clock)
+        breaker.record_failure()
+
+        clock.now = 11
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request()
+        assert not breaker.allow_request()  # only one trial in flight
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow_request()
+
+    def test_half_open_failure_reopens(self):
+        """Test that a failed trial re-opens the circuit"""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=10, clock=clock)
+        breaker.record_failure()
+        clock.now = 11
+        assert breaker.allow_request()
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+
+class TestHedgedCall:
+
+    def test_hedge_wins_when_first_attempt_is_slow(self):
+        """Test that a duplicate request is launched after the hedge delay and the faster one wins"""
+        calls = []
+        hedges = []
+
+        def fn():
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                time.sleep(0.5)
+                return "slow"
+            return "fast"
+
+        result = hedged_call(fn, deadline_s=2.0, hedge_delay_s=0.05, max_attempts=2, on_hedge=lambda: hedges.append(1))
+
+        assert result == "fast"
+        assert len(hedges) == 1
+
+    def test_retries_after_failure(self):
+        """Test that a failed attempt is retried immediately"""
+        fn = Mock(side_effect=[RuntimeError("boom"), "ok"])
+        assert hedged_call(fn, deadline_s=1.0, hedge_delay_s=0.5, max_attempts=2) == "ok"
+
+    def test_raises_last_error_when_all_attempts_fail(self):
+        """Test that the last error is raised once attempts are exhausted"""
+        fn = Mock(side_effect=RuntimeError("boom"))
+        with pytest.raises(RuntimeError, match="boom"):
+            hedged_call(fn, deadline_s=1.0, hedge_delay_s=0.5, max_attempts=2)
+
+    def test_deadline_exceeded(self):
+        """Test that slow attempts are abandoned at the deadline"""
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceededError):
+            hedged_call(lambda: time.sleep(0.5), deadline_s=0.1, hedge_delay_s=0.05, max_attempts=2)
+        assert time.monotonic() - start < 0.4
+
+
+class TestLatencyTracker:
+
+    def test_percentile_defaults_until_warm(self):
+        """Test that the default delay is used until enough samples exist"""
+        tracker = LatencyTracker()
+        assert tracker.percentile(95, default=0.5) == 0.5
+
+        for i in range(1, 101):
+            tracker.record(i / 100)
+        assert tracker.percentile(95, default=0.5) == pytest.approx(0.95)
+
+
+class TestLLMClientResilience:
+
+    def _failing_provider(self):
+        provider = Mock(tag="openai:text-embedding-3-small", model="text-embedding-3-small")
+        provider.embed.side_effect = RuntimeError("provider down")
+        return provider
+
+    def test_breaker_fails_fast_to_fallback(self):
+        """Test that once the breaker opens the primary is no longer called"""
+        primary = self._failing_provider()
+        with patch.dict('os.environ', {"EMBEDDING_BREAKER_FAILURES": "2", "EMBEDDING_MAX_ATTEMPTS": "1"}):
+            client = LLMClient(provider=primary, fallback_provider=HashingEmbeddingProvider())
+
+        for _ in range(2):
+            assert client.embed("Do you do nails?").is_fallback
+        assert client.breaker.state == CircuitBreaker.OPEN
+
+        calls_before = primary.embed.call_count
+        embedding = client.embed("Do you do nails?")
+        assert embedding.is_fallback
+        assert primary.embed.call_count == calls_before
+
+    def test_unavailable_error_without_fallback(self):
+        """Test that a typed error is raised when no fallback exists"""
+        with patch.dict('os.environ', {"EMBEDDING_FALLBACK_PROVIDER": "", "EMBEDDING_MAX_ATTEMPTS": "1"}):
+            client = LLMClient(provider=self._failing_provider())
+
+        with pytest.raises(EmbeddingUnavailableError):
+            client.embed("Do you do nails?")
+
+    def test_search_degrades_instead_of_raising(self):
+        """Test that KB search degrades (no vector search, no exception) when embeddings are unavailable"""
+        with patch('api.services.knowledge_base.embed_question', side_effect=EmbeddingUnavailableError("down")), \
+             patch('api.services.knowledge_base.crud.search_kb_lexical', return_value=[]), \
+             patch('api.services.knowledge_base.crud.search_kb_by_embedding') as mock_search:
+            assert search_knowledge_base_by_question("Do you do nails?") == []
+        mock_search.assert_not_called()
@@ -0,0 +1,78 @@
+import asyncio
+from unittest.mock import patch
+
+from api.services.resolutions import HELP_REQUEST_RESOLVED_CHANNEL, ResolutionListener, _listen_dsn
+
+
+class FakeConnection:
+    """Stands in for an asyncpg connection: records listeners and replays NOTIFYs"""
+
+    def __init__(self):
+        self.listeners = {}
+        self.closed = False
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def add_termination_listener(self, callback):
+        self.on_terminated = callback
+
+    def is_closed(self):
+        return self.closed
+
+    def notify(self, payload):
+        self.listeners[HELP_REQUEST_RESOLVED_CHANNEL](self, 1, HELP_REQUEST_RESOLVED_CHANNEL, payload)
+
+
+def _listener():
+    conn = FakeConnection()
+
+    async def connect(dsn):
+        return conn
+
+    return ResolutionListener("postgresql://db", connect=connect), conn
+
+
+class TestResolutionListener:
+
+    def test_notify_wakes_the_waiting_call(self):
+        """Test that a NOTIFY for the escalated request delivers its answer"""
+        listener, conn = _listener()
+        answers = {}
+
+        async def scenario():
+            with patch('api.services.resolutions._load_answer', side_effect=lambda i: answers.get(i)):
+                waiting = asyncio.create_task(listener.wait_for_answer("hr-1", timeout_s=2))
+                await asyncio.sleep(0.05)
+                answers["hr-1"] = "We open at 10 on Sundays"
+                conn.notify("other-request")
+                conn.notify("hr-1")
+                return await waiting
+
+        assert asyncio.run(scenario()) == "We open at 10 on Sundays"
+        assert listener._waiters == {}
+
+    def test_answer_committed_before_listening_is_found(self):
+        """Test that a resolution that raced the LISTEN is not missed"""
+        listener, _ = _listener()
+
+        async def scenario():
+            with patch('api.services.resolutions._load_answer', return_value="Yes, walk-ins welcome"):
+                return await listener.wait_for_answer("hr-1", timeout_s=1)
+
+        assert asyncio.run(scenario()) == "Yes, walk-ins welcome"
+
+    def test_no_answer_within_timeout(self):
+        listener, _ = _listener()
+
+        async def scenario():
+            with patch('api.services.resolutions._load_answer', return_value=None):
+                return await listener.wait_for_answer("hr-1", timeout_s=0.05)
+
+        assert asyncio.run(scenario()) is None
+
+    def test_disabled_without_postgres(self):
+        """Test that non-Postgres databases fall back to text-only delivery"""
+        assert _listen_dsn("sqlite:///:memory:") is None
+        assert _listen_dsn("postgresql+psycopg2://u:p@db:5432/salon") == "postgresql://u:p@db:5432/salon"
+        assert asyncio.run(ResolutionListener(None).wait_for_answer("hr-1", timeout_s=1)) is None
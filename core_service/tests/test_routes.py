@@ -21,6 +21,7 @@ class TestHelpRequestRoutes:
         # Mock the CRUD function return value
         mock_help_request = MagicMock()
         mock_help_request.id = uuid.uuid4()
+        mock_help_request.location_id = "default"
         mock_help_request.customer_id = uuid.uuid4()
         mock_help_request.question_text = "How do I reset my password?"
         mock_help_request.status = "pending"
@@ -38,7 +39,7 @@ class TestHelpRequestRoutes:
         assert data[0]["status"] == "pending"
         
         # Verify CRUD function was called without status filter
-        mock_list_help_requests.assert_called_once_with(status=None)
+        mock_list_help_requests.assert_called_once_with(status=None, location_id=None)
 
     @patch('database.crud.list_help_requests')
     def test_list_help_requests_with_status_filter(self, mock_list_help_requests, client):
@@ -48,12 +49,12 @@ class TestHelpRequestRoutes:
         # Test with pending status
         response = client.get("/api/help-requests?status=pending")
         assert response.status_code == 200
-        mock_list_help_requests.assert_called_with(status="pending")
+        mock_list_help_requests.assert_called_with(status="pending", location_id=None)
         
         # Test with resolved status
         response = client.get("/api/help-requests?status=resolved")
         assert response.status_code == 200
-        mock_list_help_requests.assert_called_with(status="resolved")
+        mock_list_help_requests.assert_called_with(status="resolved", location_id=None)
 
     @patch('database.crud.create_help_request')
     def test_create_help_request(self, mock_create_help_request, client):
@@ -61,6 +62,7 @@ class TestHelpRequestRoutes:
         # Mock the CRUD function return value
         mock_help_request = MagicMock()
         mock_help_request.id = uuid.uuid4()
+        mock_help_request.location_id = "default"
         mock_help_request.customer_id = uuid.uuid4()
         mock_help_request.question_text = "How do I change my email?"
         mock_help_request.status = "pending"
@@ -101,6 +103,7 @@ class TestKnowledgeBaseRoutes:
         # Mock the CRUD function return value
         mock_kb_entry = MagicMock()
         mock_kb_entry.id = uuid.uuid4()
+        mock_kb_entry.location_id = "default"
         mock_kb_entry.question_text_example = "How to reset password?"
         mock_kb_entry.answer_text = "Go to settings and click reset password"
         mock_kb_entry.created_at = datetime.now(timezone.utc)
@@ -125,6 +128,7 @@ class TestKnowledgeBaseRoutes:
         # Mock the CRUD function return value
         mock_kb_entry = MagicMock()
         mock_kb_entry.id = uuid.uuid4()
+        mock_kb_entry.location_id = "default"
         mock_kb_entry.question_text_example = "How to login?"
         mock_kb_entry.answer_text = "Use your email and password"
         mock_kb_entry.created_at = datetime.now(timezone.utc)
@@ -0,0 +1,80 @@
+import gzip
+import uuid
+import pytest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+from pydantic import ValidationError
+
+from api.middleware import _Compressor, choose_encoding
+from api.responses import HELP_REQUEST_LIST, list_response
+
+
+def _kb_entry(i):
+    now = datetime(2025, 1, 2, tzinfo=timezone.utc)
+    return SimpleNamespace(id=uuid.uuid4(), location_id="default", question_text_example=f"Question {i}?",
+                           answer_text="An answer long enough to be worth compressing. " * 3,
+                           created_at=now, updated_at=now)
+
+
+class TestListResponse:
+
+    def test_matches_pydantic_wire_format(self):
+        """Test that bulk-rendered rows keep Pydantic's JSON format for datetimes and UUIDs"""
+        request_id = uuid.uuid4()
+        row = {"id": request_id, "location_id": "default", "customer_id": uuid.uuid4(), "question_text": "Q", "status": "pending",
+               "created_at": datetime(2025, 1, 2, tzinfo=timezone.utc),
+               "expires_at": datetime(2025, 1, 3, tzinfo=timezone.utc)}
+
+        response = list_response(HELP_REQUEST_LIST, [row])
+
+        assert response.body.startswith(f'[{{"id":"{request_id}"'.encode())
+        assert b'"created_at":"2025-01-02T00:00:00Z"' in response.body
+        assert b'"answer_text":null' in response.body
+
+    def test_rows_are_validated(self):
+        """Test that rows missing required fields are rejected, not silently rendered"""
+        with pytest.raises(ValidationError):
+            list_response(HELP_REQUEST_LIST, [{"id": uuid.uuid4()}])
+
+
+class TestCompression:
+
+    def test_choose_encoding(self):
+        """Test Accept-Encoding parsing, including q=0 refusals"""
+        assert choose_encoding("gzip, deflate") == "gzip"
+        assert choose_encoding("gzip;q=0, identity") is None
+        assert choose_encoding("") is None
+
+    def test_streamed_gzip_chunks_form_one_stream(self):
+        """Test that chunk-by-chunk compression decodes to the original body"""
+        compressor = _Compressor("gzip", gzip_level=6, brotli_quality=4)
+        body = compressor.compress(b'{"a":1}\n', finish=False) + compressor.compress(b'{"a":2}\n', finish=True)
+
+        assert gzip.decompress(body) == b'{"a":1}\n{"a":2}\n'
+
+    def test_large_listing_is_compressed(self, client):
+        """Test that a large listing is gzip-encoded and a small response is not"""
+        entries = [_kb_entry(i) for i in range(50)]
+
+        with patch('api.routes.knowledge_base.crud.list_kb', return_value=entries), \
+             patch('api.middleware.brotli', None):
+            response = client.get("/api/knowledge-base", headers={"Accept-Encoding": "gzip"})
+            health = client.get("/healthz", headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert len(response.json()) == 50
+        assert "content-encoding" not in health.headers
+
+    def test_streaming_export_is_compressed(self, client):
+        """Test that streamed NDJSON is compressed without a Content-Length"""
+        rows = [{"id": str(i), "status": "pending", "question_text": "x" * 100} for i in range(50)]
+
+        with patch('api.services.help_requests.crud.iter_help_request_history', return_value=iter(rows)), \
+             patch('api.middleware.brotli', None):
+            response = client.get("/api/help-requests/export", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert len(response.text.splitlines()) == 50
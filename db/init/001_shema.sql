@@ -77,5 +77,5 @@ CREATE INDEX IF NOT EXISTS help_requests_pending_exp_idx
 -- ANN index for semantic KB search
 CREATE INDEX IF NOT EXISTS knowledge_base_vec_idx
   ON knowledge_base
-  USING ivfflat (embedding vector_cosine)
-  WITH (lists = 100)
\ No newline at end of file
+  USING ivfflat (embedding vector_cosine_ops)
+  WITH (lists = 100);
\ No newline at end of file
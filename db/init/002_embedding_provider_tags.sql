@@ -0,0 +1,16 @@
+-- Provider-tagged embeddings: vectors from different providers are never compared.
+-- Safe to run against an existing database.
+ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS embedding_model TEXT;
+ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS fallback_embedding vector(1536);
+ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS fallback_embedding_model TEXT;
+
+-- Rows written before tagging were all produced by OpenAI text-embedding-3-small
+UPDATE knowledge_base
+SET embedding_model = 'openai:text-embedding-3-small'
+WHERE embedding_model IS NULL AND embedding IS NOT NULL;
+
+-- ANN index for degraded-mode search on the local (fallback) provider's vectors
+CREATE INDEX IF NOT EXISTS knowledge_base_fallback_vec_idx
+  ON knowledge_base
+  USING ivfflat (fallback_embedding vector_cosine_ops)
+  WITH (lists = 100);
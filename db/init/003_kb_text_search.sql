@@ -0,0 +1,16 @@
+-- Lexical retrieval over the knowledge base. Safe to run against an existing database.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Full-text index; the expression must match KB_TSVECTOR_SQL in knowledge_base_crud.py
+CREATE INDEX IF NOT EXISTS knowledge_base_fts_idx
+  ON knowledge_base
+  USING gin (to_tsvector('english', question_text_example || ' ' || answer_text));
+
+-- Trigram indexes: back the dashboard's ILIKE '%q%' search and fuzzy question matching
+CREATE INDEX IF NOT EXISTS knowledge_base_question_trgm_idx
+  ON knowledge_base
+  USING gin (question_text_example gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS knowledge_base_answer_trgm_idx
+  ON knowledge_base
+  USING gin (answer_text gin_trgm_ops);
@@ -0,0 +1,21 @@
+-- Deduplication key for bulk knowledge base imports.
+-- Safe to run against an existing database.
+
+-- Keys follow api/services/knowledge_base.normalize_question_key:
+-- lowercase, runs of non-alphanumerics collapsed to one space, trimmed
+UPDATE knowledge_base
+SET normalized_key = btrim(regexp_replace(lower(question_text_example), '[^a-z0-9]+', ' ', 'g'))
+WHERE normalized_key IS NULL;
+
+-- Keep only the newest entry's key when older entries ask the same question
+UPDATE knowledge_base kb
+SET normalized_key = NULL
+WHERE EXISTS (
+  SELECT 1 FROM knowledge_base newer
+  WHERE newer.normalized_key = kb.normalized_key
+    AND (newer.created_at, newer.id) > (kb.created_at, kb.id)
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS knowledge_base_normalized_key_uidx
+  ON knowledge_base (normalized_key)
+  WHERE normalized_key IS NOT NULL;
@@ -0,0 +1,30 @@
+-- Shadow embedding slot for zero-downtime model upgrades (jobs/reembed_knowledge_base.py).
+-- Safe to run against an existing database.
+ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS embedding_next vector(1536);
+ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS embedding_next_model TEXT;
+
+-- Rebuilt by the job once the slot is filled (ivfflat centroids need data)
+CREATE INDEX IF NOT EXISTS knowledge_base_next_vec_idx
+  ON knowledge_base
+  USING ivfflat (embedding_next vector_cosine_ops)
+  WITH (lists = 100);
+
+-- Which provider tag each slot holds; searches use it to pick the column for a query's tag
+CREATE TABLE IF NOT EXISTS kb_embedding_slots (
+  column_name TEXT PRIMARY KEY CHECK (column_name IN ('embedding', 'embedding_next')),
+  model_tag TEXT,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+INSERT INTO kb_embedding_slots (column_name, model_tag)
+VALUES ('embedding', NULL), ('embedding_next', NULL)
+ON CONFLICT (column_name) DO NOTHING;
+
+-- Re-embedding progress, committed with each batch so a restarted job resumes where it stopped
+CREATE TABLE IF NOT EXISTS kb_reembed_jobs (
+  target_tag TEXT PRIMARY KEY,
+  last_id UUID,
+  processed INTEGER NOT NULL DEFAULT 0,
+  status TEXT NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'filled', 'cut_over')),
+  started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,36 @@
+-- Per-table change counters for HTTP ETags (core_service/api/caching.py).
+-- Safe to run against an existing database.
+CREATE TABLE IF NOT EXISTS table_versions (
+  table_name TEXT PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO table_versions (table_name)
+VALUES ('help_requests'), ('supervisor_responses'), ('knowledge_base')
+ON CONFLICT (table_name) DO NOTHING;
+
+-- Statement-level, so a bulk write bumps the counter once
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO table_versions (table_name, version) VALUES (TG_TABLE_NAME, 1)
+  ON CONFLICT (table_name)
+  DO UPDATE SET version = table_versions.version + 1, updated_at = now();
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS help_requests_version_trg ON help_requests;
+CREATE TRIGGER help_requests_version_trg
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON help_requests
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS supervisor_responses_version_trg ON supervisor_responses;
+CREATE TRIGGER supervisor_responses_version_trg
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON supervisor_responses
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS knowledge_base_version_trg ON knowledge_base;
+CREATE TRIGGER knowledge_base_version_trg
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON knowledge_base
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
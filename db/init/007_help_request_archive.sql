@@ -0,0 +1,63 @@
+-- Archive tables for finished help requests, their supervisor responses and followups.
+-- Safe to run against an existing database.
+--
+-- The hot tables keep pending and recent requests only, so the dashboard listings, the
+-- pending-expiry scan and the agent's inserts stay fast however much history is kept.
+-- archive_help_requests() moves old resolved/expired/cancelled requests out; it is run by
+-- the expiry-job service in docker-compose.yml and by core_service/jobs/archive_help_requests.py.
+--
+-- Archive tables mirror the hot tables column for column (rows are moved with SELECT *):
+-- a migration adding a column to a hot table must add it to its archive table too.
+
+CREATE TABLE IF NOT EXISTS help_requests_archive (LIKE help_requests INCLUDING DEFAULTS INCLUDING INDEXES);
+CREATE TABLE IF NOT EXISTS supervisor_responses_archive (LIKE supervisor_responses INCLUDING DEFAULTS INCLUDING INDEXES);
+CREATE TABLE IF NOT EXISTS followups_archive (LIKE followups INCLUDING DEFAULTS INCLUDING INDEXES);
+
+-- History exports scan the archive by creation time
+CREATE INDEX IF NOT EXISTS help_requests_archive_created_idx ON help_requests_archive (created_at, id);
+CREATE INDEX IF NOT EXISTS followups_archive_help_request_idx ON followups_archive (help_request_id);
+
+-- KB entries keep pointing at the request they were learned from after it is archived
+ALTER TABLE knowledge_base DROP CONSTRAINT IF EXISTS knowledge_base_source_help_request_id_fkey;
+
+-- Move one batch of finished requests created more than `retention` ago; returns the number moved.
+-- Requests with an unsent followup stay until it is sent.
+CREATE OR REPLACE FUNCTION archive_help_requests(
+  retention INTERVAL DEFAULT INTERVAL '30 days',
+  batch_size INTEGER DEFAULT 5000
+) RETURNS INTEGER AS $$
+DECLARE
+  ids UUID[];
+  moved INTEGER;
+BEGIN
+  SELECT array_agg(id) INTO ids
+  FROM (
+    SELECT h.id
+    FROM help_requests h
+    WHERE h.status IN ('resolved', 'expired', 'cancelled')
+      AND h.created_at < now() - retention
+      AND NOT EXISTS (
+        SELECT 1 FROM followups f WHERE f.help_request_id = h.id AND f.status = 'pending'
+      )
+    ORDER BY h.created_at
+    LIMIT batch_size
+    FOR UPDATE SKIP LOCKED
+  ) batch;
+
+  IF ids IS NULL THEN
+    RETURN 0;
+  END IF;
+
+  WITH moved_rows AS (DELETE FROM followups WHERE help_request_id = ANY (ids) RETURNING *)
+  INSERT INTO followups_archive SELECT * FROM moved_rows;
+
+  WITH moved_rows AS (DELETE FROM supervisor_responses WHERE help_request_id = ANY (ids) RETURNING *)
+  INSERT INTO supervisor_responses_archive SELECT * FROM moved_rows;
+
+  WITH moved_rows AS (DELETE FROM help_requests WHERE id = ANY (ids) RETURNING *)
+  INSERT INTO help_requests_archive SELECT * FROM moved_rows;
+  GET DIAGNOSTICS moved = ROW_COUNT;
+
+  RETURN moved;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,5 @@
+#!/bin/bash
+# Let the compose "replica" profile stream WAL from this server (postgres-replica in docker-compose.yml).
+# Runs once, on first container start. wal_level=replica and max_wal_senders are already Postgres defaults.
+set -e
+echo "host replication ${POSTGRES_USER} all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,100 @@
+-- Locations (tenants). Every customer, help request and knowledge base entry belongs to one.
+-- Safe to run against an existing database: existing rows go to the 'default' location.
+--
+-- knowledge_base becomes LIST-partitioned by location_id, one partition per location, so a
+-- search only scans (and only uses the vector indexes of) its own location's entries.
+-- Indexes defined on knowledge_base are created on every partition automatically.
+
+CREATE TABLE IF NOT EXISTS locations (
+  id TEXT PRIMARY KEY CHECK (id ~ '^[a-z0-9_]{1,40}$'),  -- also the partition name suffix
+  name TEXT NOT NULL,
+  city TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO locations (id, name, city)
+VALUES ('default', 'Beauty Palace', 'New York City')
+ON CONFLICT (id) DO NOTHING;
+
+-- customers: the same phone number may be a customer of several locations
+ALTER TABLE customers ADD COLUMN IF NOT EXISTS location_id TEXT NOT NULL DEFAULT 'default' REFERENCES locations(id);
+ALTER TABLE customers DROP CONSTRAINT IF EXISTS customers_phone_e164_key;
+CREATE UNIQUE INDEX IF NOT EXISTS customers_location_phone_uidx ON customers (location_id, phone_e164);
+
+-- help_requests and their archive (archive_help_requests() moves rows with SELECT *, so both get
+-- the column in the same position)
+ALTER TABLE help_requests ADD COLUMN IF NOT EXISTS location_id TEXT NOT NULL DEFAULT 'default' REFERENCES locations(id);
+ALTER TABLE help_requests_archive ADD COLUMN IF NOT EXISTS location_id TEXT NOT NULL DEFAULT 'default';
+CREATE INDEX IF NOT EXISTS hr_location_status_created_idx ON help_requests (location_id, status, created_at DESC);
+
+-- knowledge_base: convert to a partitioned table, keeping the existing table as the 'default' partition
+DO $$
+DECLARE
+  index_defs TEXT[];
+  index_def TEXT;
+  index_name TEXT;
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = 'knowledge_base'::regclass) = 'p' THEN
+    RETURN;
+  END IF;
+
+  -- Secondary indexes are recreated on the parent (same names and definitions, so
+  -- migrate_embedding_storage.py and the re-embed cutover keep finding them) and
+  -- rebuilt on the partition when it is attached
+  SELECT array_agg(indexdef) INTO index_defs
+  FROM pg_indexes
+  WHERE schemaname = current_schema() AND tablename = 'knowledge_base'
+    AND indexname NOT IN ('knowledge_base_pkey', 'knowledge_base_normalized_key_uidx');
+  FOR index_name IN
+    SELECT indexname FROM pg_indexes
+    WHERE schemaname = current_schema() AND tablename = 'knowledge_base' AND indexname <> 'knowledge_base_pkey'
+  LOOP
+    EXECUTE format('DROP INDEX %I', index_name);
+  END LOOP;
+  ALTER TABLE knowledge_base DROP CONSTRAINT knowledge_base_pkey;
+  DROP TRIGGER IF EXISTS knowledge_base_version_trg ON knowledge_base;
+
+  ALTER TABLE knowledge_base RENAME TO knowledge_base_default;
+  ALTER TABLE knowledge_base_default ADD COLUMN location_id TEXT NOT NULL DEFAULT 'default';
+
+  CREATE TABLE knowledge_base (LIKE knowledge_base_default INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+    PARTITION BY LIST (location_id);
+  -- Unique keys of a partitioned table must include the partition key
+  ALTER TABLE knowledge_base ADD PRIMARY KEY (location_id, id);
+  ALTER TABLE knowledge_base ADD FOREIGN KEY (location_id) REFERENCES locations(id);
+  CREATE UNIQUE INDEX knowledge_base_normalized_key_uidx
+    ON knowledge_base (location_id, normalized_key)
+    WHERE normalized_key IS NOT NULL;
+  FOREACH index_def IN ARRAY COALESCE(index_defs, '{}') LOOP
+    EXECUTE index_def;
+  END LOOP;
+
+  ALTER TABLE knowledge_base ATTACH PARTITION knowledge_base_default FOR VALUES IN ('default');
+
+  CREATE TRIGGER knowledge_base_version_trg
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON knowledge_base
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+END;
+$$;
+
+-- The primary key leads with location_id, so lookups by id alone (get_kb/update_kb, the
+-- re-embed and storage migration jobs' per-row updates and keyset batches) need their own index
+CREATE INDEX IF NOT EXISTS knowledge_base_id_idx ON knowledge_base (id);
+
+-- A new location gets its knowledge base partition (with all vector/text indexes) on insert.
+-- ivfflat indexes built on an empty partition have poor recall: after loading a location's
+-- knowledge base, run REINDEX TABLE knowledge_base_<location id>.
+CREATE OR REPLACE FUNCTION create_location_kb_partition() RETURNS trigger AS $$
+BEGIN
+  EXECUTE format(
+    'CREATE TABLE IF NOT EXISTS %I PARTITION OF knowledge_base FOR VALUES IN (%L)',
+    'knowledge_base_' || NEW.id, NEW.id
+  );
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS locations_kb_partition_trg ON locations;
+CREATE TRIGGER locations_kb_partition_trg
+  AFTER INSERT ON locations
+  FOR EACH ROW EXECUTE FUNCTION create_location_kb_partition();
@@ -0,0 +1,13 @@
+-- Supervisor work queue: a pending help request is claimed by one supervisor at a time
+-- for a renewable lease (core_service/database/crud/help_requests_crud.py:claim_next_help_request).
+-- Safe to run against an existing database.
+ALTER TABLE help_requests ADD COLUMN IF NOT EXISTS claimed_by TEXT;
+ALTER TABLE help_requests ADD COLUMN IF NOT EXISTS claim_expires_at TIMESTAMPTZ;
+-- Archive tables mirror the hot tables column for column (007_help_request_archive.sql)
+ALTER TABLE help_requests_archive ADD COLUMN IF NOT EXISTS claimed_by TEXT;
+ALTER TABLE help_requests_archive ADD COLUMN IF NOT EXISTS claim_expires_at TIMESTAMPTZ;
+
+-- Most urgent claimable request of a location (help_requests_pending_exp_idx serves all locations)
+CREATE INDEX IF NOT EXISTS help_requests_location_pending_exp_idx
+  ON help_requests (location_id, expires_at)
+  WHERE status = 'pending' AND resolved_at IS NULL;
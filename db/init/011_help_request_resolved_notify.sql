@@ -0,0 +1,18 @@
+-- Agent workers LISTEN on help_request_resolved to speak a supervisor's answer while the
+-- caller is still on the line (core_service/api/services/resolutions.py).
+-- NOTIFY is delivered when the resolving transaction commits, for single and batch resolves alike.
+-- The payload is the help request id only; listeners read the answer from supervisor_responses.
+
+CREATE OR REPLACE FUNCTION notify_help_request_resolved() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('help_request_resolved', NEW.id::text);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS help_requests_resolved_notify_trg ON help_requests;
+CREATE TRIGGER help_requests_resolved_notify_trg
+  AFTER UPDATE OF status ON help_requests
+  FOR EACH ROW
+  WHEN (NEW.status = 'resolved' AND OLD.status IS DISTINCT FROM 'resolved')
+  EXECUTE FUNCTION notify_help_request_resolved();
@@ -0,0 +1,28 @@
+-- Entries created through POST /api/knowledge-base/ or supervisor resolution
+-- before they set normalized_key were invisible to import deduplication.
+-- Safe to run against an existing database.
+
+-- Same expression as 004_kb_normalized_key.sql (api/services/knowledge_base.normalize_question_key).
+-- The newest keyless entry per question takes the key, unless another entry of its location holds it.
+WITH candidates AS (
+  SELECT location_id, id, normalized_key, row_number() OVER (
+    PARTITION BY location_id, normalized_key ORDER BY created_at DESC, id DESC
+  ) AS rank
+  FROM (
+    SELECT location_id, id, created_at,
+           btrim(regexp_replace(lower(question_text_example), '[^a-z0-9]+', ' ', 'g')) AS normalized_key
+    FROM knowledge_base
+    WHERE normalized_key IS NULL
+  ) keyless
+  WHERE normalized_key <> ''
+)
+UPDATE knowledge_base kb
+SET normalized_key = c.normalized_key
+FROM candidates c
+WHERE kb.location_id = c.location_id
+  AND kb.id = c.id
+  AND c.rank = 1
+  AND NOT EXISTS (
+    SELECT 1 FROM knowledge_base held
+    WHERE held.location_id = c.location_id AND held.normalized_key = c.normalized_key
+  );
@@ -0,0 +1,12 @@
+-- Claims are renewed by heartbeats every few seconds (010_help_request_claims.sql), and
+-- no listing or detail response shows claimed_by / claim_expires_at, so claim, heartbeat
+-- and release UPDATEs must not bump the help_requests ETag counter
+-- (006_table_versions.sql). A column added to HelpRequestOut must be added here too.
+-- Safe to run against an existing database.
+DROP TRIGGER IF EXISTS help_requests_version_trg ON help_requests;
+CREATE TRIGGER help_requests_version_trg
+  AFTER INSERT OR DELETE OR TRUNCATE
+     OR UPDATE OF id, location_id, call_id, customer_id, question_text, normalized_key,
+                  status, created_at, expires_at, resolved_at, cancel_reason
+  ON help_requests
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();